@@ -2,7 +2,8 @@ from fastapi import APIRouter
 from .endpoints import (
     submission_router, assignment_router, user_router,
     student_router, instructor_router, course_router,
-    settings_router, auth_router, lms_router
+    settings_router, auth_router, lms_router,
+    grading_router, database_router
 )
 
 api_router = APIRouter()
@@ -15,3 +16,5 @@ api_router.include_router(course_router.router, tags=["course"])
 api_router.include_router(settings_router.router, tags=["settings"])
 api_router.include_router(auth_router.router, tags=["auth"])
 api_router.include_router(lms_router.router, tags=["lms"])
+api_router.include_router(grading_router.router, tags=["grading"])
+api_router.include_router(database_router.router, tags=["database"])
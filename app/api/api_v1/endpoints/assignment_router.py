@@ -2,18 +2,18 @@ from pydantic import BaseModel, PositiveInt
 from datetime import datetime
 from typing import List, Union, Optional
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from app.models import AssignmentModel, StudentModel, InstructorModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import AssignmentModel, UserModel, StudentModel, InstructorModel
 from app.schemas import (
     InstructorAssignmentSchema, StudentAssignmentSchema, AssignmentSchema,
-    UpdateAssignmentSchema, GradeReportSchema, IdentifiableSubmissionGradeSchema
+    UpdateAssignmentSchema, GradeReportSchema, IdentifiableSubmissionGradeSchema, GradingJobSchema
 )
 from app.schemas._unset import UNSET
 from app.services import (
     AssignmentService, InstructorAssignmentService, StudentAssignmentService,
-    UserService, LmsSyncService, GradingService, SubmissionService
+    LmsSyncService, GradingService, GradingJobService, SubmissionService
 )
-from app.core.dependencies import get_db, PermissionDependency, RequireLoginPermission, AssignmentModifyPermission, UserIsInstructorPermission
+from app.core.dependencies import get_db, get_current_user, PermissionDependency, RequireLoginPermission, AssignmentModifyPermission, UserIsInstructorPermission
 from app.services.course_service import CourseService
 
 router = APIRouter()
@@ -47,7 +47,7 @@ class ManualGradingBody(BaseModel):
 @router.patch("/assignments/{assignment_name}", response_model=AssignmentSchema)
 async def update_assignment_fields(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     assignment_name: str,
     assignment_body: UpdateAssignmentBody,
     perm: None = Depends(PermissionDependency(AssignmentModifyPermission))
@@ -71,12 +71,10 @@ async def update_assignment_fields(
 async def get_assignments(
     *,
     request: Request,
-    db: Session = Depends(get_db),
-    perm: None = Depends(PermissionDependency(RequireLoginPermission))
+    db: AsyncSession = Depends(get_db),
+    perm: None = Depends(PermissionDependency(RequireLoginPermission)),
+    user: UserModel = Depends(get_current_user)
 ):
-    onyen = request.user.onyen
-
-    user = await UserService(db).get_user_by_onyen(onyen)
     assignments = await AssignmentService(db).get_assignments()
     course = await CourseService(db).get_course()
 
@@ -86,31 +84,33 @@ async def get_assignments(
             for assignment in assignments
         ]
     elif isinstance(user, StudentModel):
-        return [
-            await StudentAssignmentService(db, user, assignment, course).get_student_assignment_schema()
-            for assignment in assignments
-        ]
+        return await AssignmentService(db).get_student_assignment_schemas(user, assignments, course)
     else:
         return assignments
     
+""" Grading runs in the background. Poll the returned job for progress. """
 @router.post(
     "/assignments/{assignment_name}/grade",
-    response_model=GradeReportSchema
+    response_model=GradingJobSchema,
+    status_code=202
 )
 async def grade_assignment(
     *,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     assignment_name: str,
     grading_body: OtterGradingBody,
     perm: None = Depends(PermissionDependency(UserIsInstructorPermission))
 ):
+    grading_job_service = GradingJobService(db)
     assignment = await AssignmentService(db).get_assignment_by_name(assignment_name)
-    return await GradingService(db).grade_assignment(
+    job = await grading_job_service.create_grading_job(
         assignment,
         grading_body.master_notebook_content,
         grading_body.otter_config_content
     )
+    GradingJobService.start_grading_job(job.id)
+    return await grading_job_service.get_grading_job_schema(job)
 
 @router.post(
     "/assignments/{assignment_name}/grade_manual",
@@ -119,7 +119,7 @@ async def grade_assignment(
 async def grade_assignment_manual(
     *,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     assignment_name: str,
     grading_body: ManualGradingBody,
     perm: None = Depends(PermissionDependency(UserIsInstructorPermission))
@@ -1,11 +1,11 @@
 from typing import List, Annotated
 from pydantic import BaseModel
 from fastapi import APIRouter, Request, Depends, Header
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import RefreshTokenSchema, UserRoleSchema, UserPermissionSchema
 from app.services import UserService, JwtService, AppstoreService, GiteaService
-from app.models.user import UserType
-from app.core.dependencies import get_db, PermissionDependency, RequireLoginPermission
+from app.models.user import UserType, UserModel
+from app.core.dependencies import get_db, get_current_user, PermissionDependency, RequireLoginPermission
 from app.core.exceptions import UserNotFoundException, AppstoreUserDoesNotMatchException
 
 router = APIRouter()
@@ -33,7 +33,7 @@ class RefreshBody(BaseModel):
 @router.post("/login", response_model=RefreshTokenSchema)
 async def login(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     login_body: LoginBody
 ):
     token = await UserService(db).login(login_body.onyen, login_body.autogen_password)
@@ -42,7 +42,7 @@ async def login(
 @router.post("/login/appstore", response_model=RefreshTokenSchema, description="Authenticate via Appstore session (DOES NOT WORK IN SWAGGER UI)")
 async def appstore_login(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     appstore_access_token: Annotated[str, Header(description="Your sessionid for Appstore")],
     login_body: AppstoreLoginBody
 ):
@@ -56,7 +56,7 @@ async def appstore_login(
 async def set_gitea_ssh(
     *,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     ssh_body: SetGiteaSSHBody,
 ):
     await GiteaService(db).set_ssh_key(request.user.onyen, ssh_body.name, ssh_body.key)
@@ -65,7 +65,7 @@ async def set_gitea_ssh(
 async def set_gitea_ssh(
     *,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     ssh_body: DeleteGiteaSSHBody,
 ):
     await GiteaService(db).remove_ssh_key(request.user.onyen, ssh_body.name)
@@ -73,7 +73,7 @@ async def set_gitea_ssh(
 @router.post("/refresh", response_model=str)
 async def refresh(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     refresh_body: RefreshBody
 ):
     token = await JwtService().refresh_access_token(refresh_body.refresh_token)
@@ -83,11 +83,10 @@ async def refresh(
 async def get_role(
     *,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(RequireLoginPermission)),
+    user: UserModel = Depends(get_current_user)
 ):
-    onyen = request.user.onyen
-    user = await UserService(db).get_user_by_onyen(onyen)
     return UserRoleSchema(
         name=user.role.name,
         permissions=[UserPermissionSchema(name=p.value) for p in user.role.permissions]
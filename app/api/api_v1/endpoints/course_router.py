@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlalchemy import paginate
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import CourseModel, InstructorModel
 from app.services import CourseService
@@ -15,7 +15,7 @@ router = APIRouter()
 @router.get("/course", response_model=CourseWithInstructorsSchema)
 async def get_course(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(CourseListPermission, InstructorListPermission)),
     request: Request
 ):
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from app.database import async_engine
+from app.schemas import DatabasePoolMetricsSchema
+from app.core.dependencies import PermissionDependency, UserIsInstructorPermission
+
+router = APIRouter()
+
+@router.get("/database/metrics", response_model=DatabasePoolMetricsSchema)
+async def get_database_metrics(
+    *,
+    perm: None = Depends(PermissionDependency(UserIsInstructorPermission))
+):
+    return async_engine.pool.get_metrics()
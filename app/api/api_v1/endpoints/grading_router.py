@@ -0,0 +1,33 @@
+from typing import List
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas import GradingJobSchema
+from app.services import AssignmentService, GradingJobService
+from app.core.dependencies import get_db, PermissionDependency, UserIsInstructorPermission
+
+router = APIRouter()
+
+@router.get("/assignments/{assignment_name}/grading_jobs", response_model=List[GradingJobSchema])
+async def list_grading_jobs(
+    *,
+    db: AsyncSession = Depends(get_db),
+    perm: None = Depends(PermissionDependency(UserIsInstructorPermission)),
+    assignment_name: str
+):
+    grading_job_service = GradingJobService(db)
+    assignment = await AssignmentService(db).get_assignment_by_name(assignment_name)
+    return [
+        await grading_job_service.get_grading_job_schema(job)
+        for job in await grading_job_service.list_grading_jobs(assignment)
+    ]
+
+@router.get("/grading_jobs/{job_id}", response_model=GradingJobSchema)
+async def get_grading_job(
+    *,
+    db: AsyncSession = Depends(get_db),
+    perm: None = Depends(PermissionDependency(UserIsInstructorPermission)),
+    job_id: int
+):
+    grading_job_service = GradingJobService(db)
+    job = await grading_job_service.get_grading_job_by_id(job_id)
+    return await grading_job_service.get_grading_job_schema(job)
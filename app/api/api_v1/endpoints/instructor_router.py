@@ -1,7 +1,7 @@
 from typing import List
 from pydantic import BaseModel
 from fastapi import APIRouter, Request, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import InstructorSchema
 from app.services import InstructorService
 from app.core.dependencies import get_db, PermissionDependency, InstructorListPermission, InstructorCreatePermission
@@ -17,7 +17,7 @@ class CreateInstructorBody(BaseModel):
 @router.get("/instructors/{onyen:str}", response_model=InstructorSchema)
 async def get_instructor(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(InstructorListPermission)),
     onyen: str
 ):
@@ -27,7 +27,7 @@ async def get_instructor(
 @router.get("/instructors", response_model=List[InstructorSchema])
 async def list_instructor(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(InstructorListPermission))
 ):
     instructors = await InstructorService(db).list_instructors()
@@ -36,7 +36,7 @@ async def list_instructor(
 @router.post("/instructors", response_model=InstructorSchema)
 async def create_instructor_without_password(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(InstructorCreatePermission)),
     instructor_body: CreateInstructorBody
 ):
@@ -1,8 +1,9 @@
 from typing import List
 from pydantic import BaseModel
 from fastapi import APIRouter, Request, Depends, UploadFile, File
-from sqlalchemy.orm import Session
-from app.services import LmsSyncService, AssignmentService
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services import LmsSyncService, AssignmentService, CanvasService
+from app.schemas import CanvasRateLimitMetricsSchema, LmsSyncRunSchema
 from app.core.dependencies import (
     get_db, PermissionDependency,
     UserIsInstructorPermission
@@ -17,18 +18,26 @@ class GradeUpload(BaseModel):
 class UploadGradesBody(BaseModel):
     grades: List[GradeUpload]
 
-@router.post("/lms/downsync")
+@router.post("/lms/downsync", response_model=LmsSyncRunSchema)
 async def downsync(
     *,
-    db: Session = Depends(get_db),
+    perm: None = Depends(PermissionDependency(UserIsInstructorPermission)),
+    incremental: bool = False
+):
+    return await LmsSyncService.run_downsync(incremental=incremental)
+
+@router.get("/lms/downsync/status", response_model=LmsSyncRunSchema)
+async def get_downsync_status(
+    *,
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(UserIsInstructorPermission))
 ):
-    await LmsSyncService(db).downsync()
+    return await LmsSyncService(db).get_last_sync_run()
 
 @router.post("/lms/downsync/students")
 async def downsync_students(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(UserIsInstructorPermission))
 ):
     return await LmsSyncService(db).sync_students()
@@ -36,7 +45,14 @@ async def downsync_students(
 @router.post("/lms/downsync/assignments")
 async def downsync_assignments(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    perm: None = Depends(PermissionDependency(UserIsInstructorPermission))
+):
+    return await LmsSyncService(db).sync_assignments()
+
+@router.get("/lms/metrics", response_model=CanvasRateLimitMetricsSchema)
+async def get_lms_metrics(
+    *,
     perm: None = Depends(PermissionDependency(UserIsInstructorPermission))
 ):
-    return await LmsSyncService(db).sync_assignments()
\ No newline at end of file
+    return CanvasService.get_rate_limit_metrics()
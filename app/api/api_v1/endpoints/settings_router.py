@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Request, Depends, Header
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.dependencies import get_db
 from app.core.config import settings
 from app.schemas import SettingsSchema
@@ -9,7 +9,7 @@ router = APIRouter()
 @router.get("/settings", response_model=SettingsSchema)
 def get_settings(
     *,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return SettingsSchema(
         gitea_ssh_url=settings.GITEA_SSH_URL,
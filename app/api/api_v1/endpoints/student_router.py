@@ -1,10 +1,11 @@
 from typing import List
 from pydantic import BaseModel
 from fastapi import APIRouter, Request, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import StudentSchema
 from app.services import StudentService
-from app.core.dependencies import get_db, PermissionDependency, StudentListPermission, StudentCreatePermission, UserIsStudentPermission
+from app.models import StudentModel
+from app.core.dependencies import get_db, get_current_user, PermissionDependency, StudentListPermission, StudentCreatePermission, UserIsStudentPermission
 
 router = APIRouter()
 
@@ -17,7 +18,7 @@ class CreateStudentBody(BaseModel):
 @router.get("/students/{onyen:str}", response_model=StudentSchema)
 async def get_student(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(StudentListPermission)),
     onyen: str
 ):
@@ -27,7 +28,7 @@ async def get_student(
 @router.get("/students", response_model=List[StudentSchema])
 async def list_students(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(StudentListPermission))
 ):
     students = await StudentService(db).list_students()
@@ -36,7 +37,7 @@ async def list_students(
 @router.post("/students", response_model=StudentSchema)
 async def create_student_with_autogen_password(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(StudentCreatePermission)),
     student_body: CreateStudentBody
 ):
@@ -49,10 +50,8 @@ async def create_student_with_autogen_password(
 async def mark_fork_as_cloned(
     *,
     request: Request,
-    db: Session = Depends(get_db),
-    perm: None = Depends(PermissionDependency(UserIsStudentPermission))
+    db: AsyncSession = Depends(get_db),
+    perm: None = Depends(PermissionDependency(UserIsStudentPermission)),
+    student: StudentModel = Depends(get_current_user)
 ):
-    onyen = request.user.onyen
-    student_service = StudentService(db)
-    student = await student_service.get_user_by_onyen(onyen)
-    await student_service.set_fork_cloned(student)
+    await StudentService(db).set_fork_cloned(student)
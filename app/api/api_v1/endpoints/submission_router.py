@@ -2,11 +2,11 @@ from typing import Dict, List, Optional
 from pydantic import BaseModel
 from fastapi import APIRouter, Request, Query, Depends
 from fastapi.responses import FileResponse, StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import SubmissionSchema
 from app.services import SubmissionService, StudentService, AssignmentService, GiteaService, CourseService, LmsSyncService
-from app.models import SubmissionModel
-from app.core.dependencies import get_db, PermissionDependency, UserIsStudentPermission, SubmissionCreatePermission, SubmissionListPermission, SubmissionDownloadPermission
+from app.models import SubmissionModel, StudentModel
+from app.core.dependencies import get_db, get_current_user, PermissionDependency, UserIsStudentPermission, SubmissionCreatePermission, SubmissionListPermission, SubmissionDownloadPermission
 
 router = APIRouter()
 
@@ -19,14 +19,12 @@ class SubmissionBody(BaseModel):
 async def create_submission(
     *,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(UserIsStudentPermission, SubmissionCreatePermission)),
+    student: StudentModel = Depends(get_current_user),
     submission_body: SubmissionBody
 ):
-    onyen = request.user.onyen
-
     submission_service = SubmissionService(db)
-    student = await StudentService(db).get_user_by_onyen(onyen)
     assignment = await AssignmentService(db).get_assignment_by_id(submission_body.assignment_id)
     submission = await submission_service.create_submission(
         student,
@@ -45,7 +43,7 @@ async def create_submission(
 async def get_submissions(
     *,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(SubmissionListPermission)),
     assignment_id: int,
     student_onyen: Optional[str] = Query(default=None, description="Student's onyen. Lists all students if omitted.")
@@ -54,38 +52,31 @@ async def get_submissions(
     submission_service = SubmissionService(db)
     assignment = await AssignmentService(db).get_assignment_by_id(assignment_id)
     if student_onyen is None:
-        students = await StudentService(db).list_students()
-        return { student.onyen : [
-            await submission_service.get_submission_schema(s)
-            for s in await submission_service.get_submissions(student, assignment)
-        ] for student in students }
+        return await submission_service.list_submission_schemas_by_student(assignment)
     else:
         student = await StudentService(db).get_user_by_onyen(student_onyen)
-        return [
-            await submission_service.get_submission_schema(s)
-            for s in await submission_service.get_submissions(student, assignment)
-        ]
+        submissions = await submission_service.get_submissions(student, assignment)
+        return await submission_service.get_submission_schemas(submissions)
     
 @router.get("/submissions/self", response_model=List[SubmissionSchema])
 async def get_own_submissions(
     *,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(UserIsStudentPermission)),
+    student: StudentModel = Depends(get_current_user),
     assignment_id: int
 ):
-    onyen = request.user.onyen
     submission_service = SubmissionService(db)
-    student = await StudentService(db).get_user_by_onyen(onyen)
     assignment = await AssignmentService(db).get_assignment_by_id(assignment_id)
     submissions = await submission_service.get_submissions(student, assignment)
 
-    return [await submission_service.get_submission_schema(s) for s in submissions]
+    return await submission_service.get_submission_schemas(submissions)
 
 @router.get("/submissions/active", response_model=SubmissionSchema)
 async def get_active_submission(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(SubmissionListPermission)),
     onyen: str,
     assignment_id: int
@@ -102,7 +93,7 @@ async def get_active_submission(
 async def get_submission_by_id(
     *,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(SubmissionListPermission)),
     submission_id: int
 ):
@@ -114,26 +105,26 @@ async def download_submission_stream(db, submission: SubmissionModel):
     gitea_service = GiteaService(db)
     course_service = CourseService(db)
 
-    student = submission.student
+    student = await submission.awaitable_attrs.student
+    assignment = await submission.awaitable_attrs.assignment
     student_repo_name = await course_service.get_student_repository_name(student.onyen)
 
     archive_name = f"assn{ submission.assignment_id }-{ student.onyen }-subm{ submission.id }.zip"
-    archive_stream = await gitea_service.download_repository(
+    (chunks, size) = await gitea_service.stream_repository_archive(
         name=student_repo_name,
         owner=student.onyen,
         treeish_id=submission.commit_id,
-        path=submission.assignment.directory_path
-    )
-    return StreamingResponse(
-        archive_stream,
-        media_type="application/zip",
-        headers={"Content-Disposition": f'attachment; filename="{ archive_name }"'}
+        path=assignment.directory_path
     )
+    headers = { "Content-Disposition": f'attachment; filename="{ archive_name }"' }
+    if size is not None:
+        headers["Content-Length"] = str(size)
+    return StreamingResponse(chunks, media_type="application/zip", headers=headers)
 
 @router.get("/submissions/active/download", response_class=FileResponse)
 async def download_active_submission(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(SubmissionListPermission, SubmissionDownloadPermission)),
     onyen: str,
     assignment_id: int
@@ -146,7 +137,7 @@ async def download_active_submission(
 @router.get("/submissions/{submission_id}/download", response_class=FileResponse)
 async def download_submission(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     perm: None = Depends(PermissionDependency(SubmissionListPermission, SubmissionDownloadPermission)),
     submission_id: int
 ):
@@ -1,12 +1,13 @@
 """ User router should contain endpoints that are able to be generalized to a user, rather than a specific account type. """
 
 from fastapi import APIRouter, Request, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Union
 from app.schemas import StudentSchema, InstructorSchema
-from app.services import UserService, LDAPService
+from app.models import UserModel
+from app.services import LDAPService
 from app.services.ldap_service import LDAPUserInfoSchema
-from app.core.dependencies import get_db, PermissionDependency, UserIsSuperuserPermission, RequireLoginPermission
+from app.core.dependencies import get_db, get_current_user, PermissionDependency, UserIsSuperuserPermission, RequireLoginPermission
 
 
 router = APIRouter()
@@ -15,11 +16,10 @@ router = APIRouter()
 async def get_own_user(
     *,
     request: Request,
-    db: Session = Depends(get_db),
-    perm: None = Depends(PermissionDependency(RequireLoginPermission))
+    db: AsyncSession = Depends(get_db),
+    perm: None = Depends(PermissionDependency(RequireLoginPermission)),
+    user: UserModel = Depends(get_current_user)
 ):
-    onyen = request.user.onyen
-    user = await UserService(db).get_user_by_onyen(onyen)
     return user
 
 @router.get("/users/{pid:str}/ldap", response_model=LDAPUserInfoSchema)
@@ -29,4 +29,4 @@ async def get_ldap_user(
     perm: None = Depends(PermissionDependency(UserIsSuperuserPermission)),
     pid: str
 ):
-    return LDAPService().get_user_info(pid)
\ No newline at end of file
+    return await LDAPService().get_user_info(pid)
\ No newline at end of file
@@ -37,6 +37,8 @@ class Settings(BaseSettings):
     GITEA_SSH_URL: str
     GITEA_ASSIST_API_URL: str
     GITEA_ASSIST_AUTH_TOKEN: str
+    # Seconds to wait for a burst of assignment changes to settle before regenerating git hooks
+    GIT_HOOK_DEBOUNCE_SECONDS: float = 2
 
     # Appstore
     STUDENT_APPSTORE_HOST: str
@@ -52,6 +54,30 @@ class Settings(BaseSettings):
     CANVAS_COURSE_ID: str
     CANVAS_COURSE_START_DATE: str
     CANVAS_COURSE_END_DATE: str
+    # Number of pages of a Canvas list endpoint fetched concurrently, when pages are numbered
+    CANVAS_PAGINATION_CONCURRENCY: int = 4
+    # How long the course roster is cached for looking up Canvas users by PID
+    CANVAS_ROSTER_CACHE_TTL_SECONDS: int = 60 * 5 # 5 minutes
+    # Minimum age of the cached roster before looking up an unknown PID fetches it again
+    CANVAS_ROSTER_REFRESH_SECONDS: int = 30
+    # How often, and for how long, asynchronous Canvas jobs (e.g. bulk grade uploads) are polled
+    CANVAS_PROGRESS_POLL_SECONDS: float = 1
+    CANVAS_PROGRESS_TIMEOUT_SECONDS: int = 60 * 5 # 5 minutes
+    # Upper bound on concurrent Canvas requests. The scheduler backs off below this as the rate limit quota runs low.
+    CANVAS_MAX_CONCURRENCY: int = 8
+    # Concurrency is cut once X-Rate-Limit-Remaining drops below this (Canvas' bucket holds 700 by default)
+    CANVAS_RATE_LIMIT_LOW_WATERMARK: float = 200
+    # Retries of throttled or failed Canvas requests, with jittered exponential backoff
+    CANVAS_MAX_RETRIES: int = 5
+    CANVAS_RETRY_BASE_SECONDS: float = 0.5
+    CANVAS_RETRY_MAX_SECONDS: float = 30
+    # Number of users onboarded concurrently while syncing the roster from the LMS
+    LMS_SYNC_CONCURRENCY: int = 8
+    # How often the LMS is synced in the background (0 disables it), and whether those syncs are incremental
+    LMS_SYNC_INTERVAL_SECONDS: int = 60 * 15 # 15 minutes
+    LMS_SYNC_INCREMENTAL: bool = True
+    # Number of past LMS syncs kept for reporting their status
+    LMS_SYNC_HISTORY_SIZE: int = 100
 
     # Authentication
     JWT_SECRET_KEY: str
@@ -65,6 +91,38 @@ class Settings(BaseSettings):
     LDAP_SERVICE_ACCOUNT_BIND_DN: str
     LDAP_SERVICE_ACCOUNT_PASSWORD: str
     LDAP_TIMEOUT_SECONDS: int = 5
+    # Number of bound connections to LDAP kept open and shared by searches
+    LDAP_POOL_SIZE: int = 4
+    # Number of PIDs looked up per LDAP search when resolving many users at once
+    LDAP_SEARCH_CHUNK_SIZE: int = 100
+    # How long PID lookups are cached, for users found in LDAP and for unknown PIDs
+    LDAP_CACHE_TTL_SECONDS: int = 60 * 60 * 24 # 1 day
+    LDAP_NEGATIVE_CACHE_TTL_SECONDS: int = 60 * 15 # 15 minutes
+
+    # Grading
+    # Number of worker processes used to run the autograder (defaults to the number of CPUs)
+    GRADING_MAX_WORKERS: Optional[int] = None
+    # A submission that takes longer than this to grade is abandoned and left ungraded
+    GRADING_SUBMISSION_TIMEOUT_SECONDS: int = 60 * 10 # 10 minutes
+    # How often a running grading job records that its worker is still alive
+    GRADING_JOB_HEARTBEAT_SECONDS: int = 30
+    # A running grading job without a heartbeat for this long is assumed to be abandoned and is resumed
+    GRADING_JOB_STALE_SECONDS: int = 60 * 2 # 2 minutes
+    # Size cap of the on-disk cache of generated autograder configs
+    OTTER_CONFIG_CACHE_MAX_BYTES: int = 1024 * 1024 * 256 # 256 MiB
+
+    # Caching
+    # Directory holding on-disk caches, shared by every worker process
+    CACHE_DIRECTORY: str = "/tmp/grader-api-cache"
+    # Size cap of the on-disk cache of repository archives downloaded from Gitea
+    ARCHIVE_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024 * 2 # 2 GiB
+
+    # HTTP clients (shared by every request to the same upstream service)
+    HTTP_TIMEOUT_SECONDS: int = 10
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: int = 30
+    HTTP2_ENABLED: bool = True
 
     # Database
     POSTGRES_HOST: str
@@ -73,6 +131,14 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     SQLALCHEMY_DATABASE_URI: Optional[PostgresDsn] = None
+    # Connections each worker process keeps open
+    DB_POOL_SIZE: int = 5
+    # Connections that may be opened beyond the pool size under load, which are closed once returned
+    DB_MAX_OVERFLOW: int = 10
+    # Connections older than this are replaced, so that they aren't dropped by the server or a proxy mid-request (-1 to disable)
+    DB_POOL_RECYCLE_SECONDS: int = 60 * 30 # 30 minutes
+    # How long to wait for a connection once the pool and its overflow are exhausted, before failing
+    DB_POOL_TIMEOUT_SECONDS: int = 30
 
 
     @validator("IMPERSONATE_USER", pre=True)
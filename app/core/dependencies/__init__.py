@@ -1,2 +1,3 @@
 from .database import *
+from .user import *
 from .permission import *
\ No newline at end of file
@@ -1,15 +1,12 @@
-from typing import Generator
-from sqlalchemy.orm import Session
+from typing import AsyncGenerator
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal
 
-def get_db() -> Generator:
-    db = SessionLocal()
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    db = AsyncSessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
 
-# DANGEROUS: You must call Session.close() when using this function or you will overflow the pool. 
-def get_db_persistent() -> Session:
-    return SessionLocal()
\ No newline at end of file
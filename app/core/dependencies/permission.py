@@ -1,14 +1,16 @@
 from abc import ABC, abstractmethod
 from typing import List, Type
 
-from fastapi import Request
+from fastapi import Request, Depends
 from fastapi.openapi.models import APIKey, APIKeyIn
 from fastapi.security.base import SecurityBase
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.database import SessionLocal
-from app.models import StudentModel, InstructorModel
+from app.models import UserModel, StudentModel, InstructorModel
 from app.core.role_permissions import UserPermission
+from .database import get_db
+from .user import get_current_user_or_none
 from app.core.exceptions import (
     UnauthorizedException, MissingPermissionException, UserNotFoundException,
     NotAStudentException, NotAnInstructorException, NotASuperuserException
@@ -121,9 +123,14 @@ class PermissionDependency(SecurityBase):
         self.model: APIKey = APIKey(**{"in": APIKeyIn.header}, name="Authorization")
         self.scheme_name = self.__class__.__name__
 
-    async def __call__(self, request: Request):
-        from app.services import UserService
-        
+    # FastAPI resolves `get_db` and `get_current_user_or_none` once per request,
+    # so permissions share the endpoint's session (and its connection) and user.
+    async def __call__(
+        self,
+        request: Request,
+        db: AsyncSession = Depends(get_db),
+        user: UserModel | None = Depends(get_current_user_or_none)
+    ):
         if settings.DISABLE_AUTHENTICATION and settings.IMPERSONATE_USER is not None:
             if request.user.onyen is None:
                 raise UserNotFoundException(f'The impersonated user "{ settings.IMPERSONATE_USER }" does not exist.')
@@ -131,12 +138,6 @@ class PermissionDependency(SecurityBase):
             # If authentication is disabled, we treat the anonymous user as if they have every permission.
             return
 
-        with SessionLocal() as session:
-            try:
-                user = await UserService(session).get_user_by_onyen(request.user.onyen)
-            except UserNotFoundException:
-                user = None
-            
-            for permission in self.permissions:
-                cls = permission(session, user)
-                await cls.verify_permission(request=request)
\ No newline at end of file
+        for permission in self.permissions:
+            cls = permission(db, user)
+            await cls.verify_permission(request=request)
\ No newline at end of file
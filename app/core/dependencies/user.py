@@ -0,0 +1,31 @@
+from fastapi import Request, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import UserModel
+from app.core.exceptions import UserNotFoundException
+from .database import get_db
+
+"""
+The authenticated user, or None if the request isn't authenticated or the user doesn't exist.
+The user is loaded at most once per request and kept on `request.state`, so that permissions
+and endpoints share the same instance (loaded in the request's session).
+"""
+async def get_current_user_or_none(request: Request, db: AsyncSession = Depends(get_db)) -> UserModel | None:
+    from app.services import UserService
+
+    if not hasattr(request.state, "current_user"):
+        onyen = request.user.onyen
+        user = None
+        if onyen is not None:
+            try:
+                user = await UserService(db).get_user_by_onyen(onyen)
+            except UserNotFoundException:
+                pass
+        request.state.current_user = user
+    return request.state.current_user
+
+""" The authenticated user. Depend on it after the endpoint's `PermissionDependency`, which checks who the user is. """
+async def get_current_user(user: UserModel | None = Depends(get_current_user_or_none)) -> UserModel:
+    if user is None:
+        raise UserNotFoundException()
+    return user
@@ -18,4 +18,9 @@ class StudentGradedMultipleTimesException(CustomException):
 class SubmissionMismatchException(CustomException):
     code = 400
     error_code = "GRADING__SUBMISSION_MISMATCH"
-    message = "submission is not associated with the assignment being graded"
\ No newline at end of file
+    message = "submission is not associated with the assignment being graded"
+
+class GradingJobNotFoundException(CustomException):
+    code = 404
+    error_code = "GRADING__JOB_NOT_FOUND"
+    message = "grading job not found"
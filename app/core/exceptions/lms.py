@@ -49,4 +49,14 @@ class LMSBackendException(CustomException):
 
     def __init__(self, message: str | None = None, response: Response | None = None):
         super().__init__(message)
-        self.response = response
\ No newline at end of file
+        self.response = response
+
+class LMSSyncInProgressException(CustomException):
+    code = 409
+    error_code = "LMS__SYNC_IN_PROGRESS"
+    message = "the LMS is already being synced, try again once it's done"
+
+class LMSSyncNotFoundException(CustomException):
+    code = 404
+    error_code = "LMS__SYNC_NOT_FOUND"
+    message = "the LMS has not been synced yet"
@@ -0,0 +1,47 @@
+import asyncio
+import httpx
+from app.core.config import settings
+
+class HttpClientRegistry:
+    """
+    Holds one pooled client per upstream service, so that connections (and TLS sessions) are
+    reused across requests instead of being thrown away with every service instance.
+    Clients are created on first use and closed when the app shuts down.
+    """
+    def __init__(self):
+        self._clients: dict[str, tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+    def get(self, name: str, base_url: str, headers: dict[str, str] = {}) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if name in self._clients:
+            client_loop, client = self._clients[name]
+            # A client's connections belong to the event loop they were opened on, e.g. when
+            # scripts call `asyncio.run` more than once.
+            if client_loop is loop and not client.is_closed:
+                return client
+
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={
+                "User-Agent": f"eduhelx_grader_api",
+                **headers
+            },
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            http2=settings.HTTP2_ENABLED
+        )
+        self._clients[name] = (loop, client)
+        return client
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        clients, self._clients = self._clients, {}
+        for (client_loop, client) in clients.values():
+            if client_loop is loop:
+                await client.aclose()
+
+http_clients = HttpClientRegistry()
@@ -51,7 +51,7 @@ class AuthBackend(AuthenticationBackend):
         return True, current_user
     
     async def handle_impersonated_auth(self):
-        from app.database import SessionLocal
+        from app.database import AsyncSessionLocal
         from app.services import UserService
         from app.core.exceptions import UserNotFoundException
 
@@ -60,7 +60,7 @@ class AuthBackend(AuthenticationBackend):
         if settings.IMPERSONATE_USER is None:
             return False, current_user
         
-        with SessionLocal() as session:
+        async with AsyncSessionLocal() as session:
             try:
                 user = await UserService(session).get_user_by_onyen(settings.IMPERSONATE_USER)
                 current_user.id = user.id
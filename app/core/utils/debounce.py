@@ -0,0 +1,37 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+class DebouncedJob:
+    """
+    Coalesces bursts of triggers into a single run of `job`, once no trigger has arrived for `delay_seconds`.
+    Triggers that arrive while the job is running mark it dirty, so that it runs once more afterwards
+    and never misses a change. Runs in the background of the event loop that triggered it.
+    """
+    def __init__(self, job: Callable[[], Awaitable[None]], delay_seconds: float):
+        self.job = job
+        self.delay_seconds = delay_seconds
+        self._dirty = False
+        self._last_triggered: float = 0
+        self._task: asyncio.Task | None = None
+
+    def trigger(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._dirty = True
+        self._last_triggered = loop.time()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._dirty:
+            # Wait out the burst.
+            while (remaining := self._last_triggered + self.delay_seconds - loop.time()) > 0:
+                await asyncio.sleep(remaining)
+            self._dirty = False
+            try:
+                await self.job()
+            except Exception:
+                logger.exception(f"debounced job { self.job.__name__ } failed")
@@ -0,0 +1,101 @@
+import os
+import hashlib
+import tempfile
+from typing import BinaryIO, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+class DiskLRUCache:
+    """
+    A size-capped cache of byte blobs on disk, shared by every process pointed at the same directory.
+    The filesystem is the only index: an entry's mtime is bumped whenever it's read, and the least
+    recently used entries are evicted once the directory grows past `max_size_bytes`.
+    """
+    def __init__(self, directory: Path | str, max_size_bytes: int):
+        self.directory = Path(directory)
+        self.max_size_bytes = max_size_bytes
+
+    """ Derives a cache key from the given parts. Parts are length-prefixed so that their boundaries can't collide. """
+    @staticmethod
+    def make_key(*parts: str | bytes) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, str): part = part.encode()
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        f = self.open(key)
+        if f is None: return None
+        with f:
+            return f.read()
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_size_bytes:
+            return
+        with self.writer(key) as f:
+            f.write(value)
+        f.close()
+
+    """
+    Opens an entry for reading. The returned file stays readable even if the entry
+    is evicted while it's open. The caller must close it.
+    """
+    def open(self, key: str) -> BinaryIO | None:
+        entry_path = self._get_entry_path(key)
+        try:
+            f = open(entry_path, "rb")
+        except FileNotFoundError:
+            # Never cached, or evicted by another process in the meantime.
+            return None
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            pass
+        return f
+
+    """
+    Writes an entry incrementally, e.g. while streaming it from elsewhere. The entry is only
+    stored if the block exits without an exception. The file is left open so that the caller
+    can seek back and read the entry it just wrote, and the caller must close it.
+    """
+    @contextmanager
+    def writer(self, key: str) -> Iterator[BinaryIO]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so that readers never see a partially-written entry.
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        f = os.fdopen(fd, "w+b")
+        try:
+            yield f
+            f.flush()
+        except BaseException as e:
+            f.close()
+            Path(temp_path).unlink(missing_ok=True)
+            raise e
+
+        if f.tell() > self.max_size_bytes:
+            # Too large to ever fit; the caller can still read it from the open file.
+            Path(temp_path).unlink(missing_ok=True)
+            return
+        os.replace(temp_path, self._get_entry_path(key))
+        self._evict()
+
+    def _get_entry_path(self, key: str) -> Path:
+        return self.directory / key
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".tmp-"): continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for (_, size, _) in entries)
+        for (_, size, path) in sorted(entries):
+            if total_size <= self.max_size_bytes: break
+            Path(path).unlink(missing_ok=True)
+            total_size -= size
@@ -0,0 +1,82 @@
+import json
+import glob
+import tempfile
+import zipfile
+from io import BytesIO
+from pathlib import Path
+from otter.assign import main as otter_assign
+from otter.run import main as otter_run
+from app.core.exceptions import OtterConfigViolationException
+
+class OtterHelper:
+    """
+    Runs inside a grading worker process. Otter changes the working directory of the process
+    while it grades, so submissions have to be graded in separate processes, not threads.
+    Returns the parsed otter results JSON. Timeouts are enforced by the parent process.
+    """
+    @staticmethod
+    def run_autograder(
+        submission_path: str,
+        autograder_path: str,
+        output_path: str,
+        debug: bool = False
+    ) -> dict:
+        otter_run(
+            submission=submission_path,
+            autograder=autograder_path,
+            output_dir=output_path,
+            no_logo=True,
+            debug=debug
+        )
+
+        with open(output_path, "r") as f:
+            return json.load(f)
+
+    """
+    Runs otter assign inside a worker process, since it also changes the working directory.
+    Returns the final graded notebook and the zip config.
+    """
+    @staticmethod
+    def generate_config(
+        master_notebook_content: str,
+        otter_config_content: str,
+        requirements_txt_content: str
+    ) -> tuple[str, bytes]:
+        # The master notebook isn't actually the final revision used for grading
+        # We also need to generate a zip config.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_dir = Path(temp_dir)
+            master_notebook_path = temp_dir / "master.ipynb"
+            requirements_txt_path = temp_dir / "requirements.txt"
+            config_dir = temp_dir / "otter"
+            autograder_path = config_dir / "autograder"
+
+            with open(master_notebook_path, "w+") as f:
+                f.write(master_notebook_content)
+
+            with open(requirements_txt_path, "w+") as f:
+                f.write(requirements_txt_content)
+
+            otter_assign(master_notebook_path, str(config_dir), no_pdfs=True)
+            
+            zip_config_glob = glob.glob(str(autograder_path / f"{ master_notebook_path.stem }*.zip"))
+            if len(zip_config_glob) == 0:
+                raise OtterConfigViolationException("could not generate/find otterconfig zip for assignment")
+            
+            autograder_notebook_path = autograder_path / master_notebook_path.name
+            zip_config_path = zip_config_glob[0]
+
+            with open(autograder_notebook_path, "r") as f:
+                final_graded_notebook_content = f.read()
+
+            config_zip = BytesIO()
+            # Overwrite the otter_config.json generated inside the zip with the user-supplied config. 
+            with zipfile.ZipFile(zip_config_path, "r") as old_zip:
+                with zipfile.ZipFile(config_zip, "w") as new_zip:
+                    for item in old_zip.infolist():
+                        if item.filename != "otter_config.json":
+                            new_zip.writestr(item, old_zip.read(item.filename))
+                    new_zip.writestr("otter_config.json", otter_config_content)
+
+
+        return final_graded_notebook_content, config_zip.getvalue()
@@ -0,0 +1,60 @@
+import asyncio
+import multiprocessing
+from typing import Callable, TypeVar
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+T = TypeVar("T")
+
+class KillableProcessPool:
+    """
+    A pool of spawned worker processes whose calls can time out. A timeout is enforced from the parent,
+    since a call blocked in C code or waiting on a child process can't be interrupted from inside its worker.
+    A call that's still running can't be cancelled, so when one times out every worker is terminated and
+    the pool is replaced. Calls that were running on the terminated workers are resubmitted to the new pool.
+    """
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = self._create_executor()
+        # Executors that were terminated on purpose, rather than broken by a worker dying.
+        self._terminated_executors: set[ProcessPoolExecutor] = set()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # Forking would share the parent's database connections with the workers, so spawn fresh interpreters instead.
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    """ Runs `fn(*args)` in a worker, raising TimeoutError if it doesn't return within `timeout_seconds`. """
+    async def run(self, timeout_seconds: float | None, fn: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        while True:
+            executor = self._executor
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(executor, fn, *args), timeout_seconds)
+            except asyncio.TimeoutError:
+                self._replace_executor(executor)
+                raise TimeoutError(f"exceeded { timeout_seconds } seconds")
+            except BrokenProcessPool as e:
+                if executor in self._terminated_executors:
+                    # The workers were terminated because of another call, so this one is retried.
+                    continue
+                # A worker died (e.g. it ran out of memory). There's no telling which call it was running.
+                self._replace_executor(executor)
+                raise e
+
+    """ Terminates the workers, including any that are still running a call. """
+    def close(self) -> None:
+        self._terminate(self._executor)
+
+    def _replace_executor(self, executor: ProcessPoolExecutor) -> None:
+        # Calls running alongside each other may time out together, but the pool only needs replacing once.
+        if executor is not self._executor: return
+        self._terminated_executors.add(executor)
+        self._executor = self._create_executor()
+        self._terminate(executor)
+
+    @staticmethod
+    def _terminate(executor: ProcessPoolExecutor) -> None:
+        # ProcessPoolExecutor has no public way of stopping busy workers.
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,40 @@
+from typing import Generic, TypeVar, Hashable, Callable
+
+K = TypeVar("K", bound=Hashable)
+S = TypeVar("S")
+T = TypeVar("T")
+
+class ReconcileDiff(Generic[K, S, T]):
+    """
+    The difference between a source of truth (e.g. the LMS) and a target that mirrors it (e.g. the database),
+    with the items of each keyed by their shared identity. Items only in the source need to be created,
+    items only in the target need to be deleted, and items in both need to be updated if they've changed.
+    """
+    def __init__(self):
+        self.create: dict[K, S] = {}
+        self.update: dict[K, tuple[S, T]] = {}
+        self.delete: dict[K, T] = {}
+        self.unchanged: dict[K, tuple[S, T]] = {}
+
+    @property
+    def is_empty(self) -> bool:
+        return len(self.create) == 0 and len(self.update) == 0 and len(self.delete) == 0
+
+    @staticmethod
+    def compute(
+        source: dict[K, S],
+        target: dict[K, T],
+        is_changed: Callable[[S, T], bool] = lambda source_item, target_item: False
+    ) -> "ReconcileDiff[K, S, T]":
+        diff = ReconcileDiff()
+        for key, source_item in source.items():
+            if key not in target:
+                diff.create[key] = source_item
+            elif is_changed(source_item, target[key]):
+                diff.update[key] = (source_item, target[key])
+            else:
+                diff.unchanged[key] = (source_item, target[key])
+        for key, target_item in target.items():
+            if key not in source:
+                diff.delete[key] = target_item
+        return diff
@@ -1,9 +1,27 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncAttrs, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from .pool import InstrumentedAsyncQueuePool
 
+# Synchronous, for alembic and one-off scripts.
 engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+# Asynchronous, for the app, so that queries don't block the event loop.
+async_engine = create_async_engine(
+    make_url(settings.SQLALCHEMY_DATABASE_URI).set(drivername="postgresql+asyncpg"),
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_pre_ping=True
+)
+# Objects aren't expired on commit, since expired attributes can't be lazily reloaded outside of an await.
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# AsyncAttrs allows relationships that weren't eagerly loaded to be awaited, i.e. `await model.awaitable_attrs.relationship`.
+Base = declarative_base(cls=AsyncAttrs)
@@ -0,0 +1,76 @@
+import time
+from contextvars import ContextVar
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Time spent opening connections during the checkout in progress. Concurrent checkouts each run in their own
+# task (and greenlet), so each one only sees the connections it opened itself.
+_checkout_connect_seconds: ContextVar[float] = ContextVar("checkout_connect_seconds", default=0.0)
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    A connection pool that also keeps track of how long checking out a connection waits for one to be
+    returned once the pool and its overflow are exhausted, and separately, how long opening new connections
+    takes. Each worker process has its own pool, so the statistics are per process.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.connects = 0
+        self.total_connect_seconds = 0.0
+        self.max_connect_seconds = 0.0
+
+    def connect(self):
+        token = _checkout_connect_seconds.set(0.0)
+        start = time.monotonic()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError as e:
+            self.timeouts += 1
+            raise e
+        finally:
+            # A checkout that opens a connection (or reopens an invalidated one) isn't waiting on the pool meanwhile.
+            wait_seconds = max(0.0, time.monotonic() - start - _checkout_connect_seconds.get())
+            _checkout_connect_seconds.reset(token)
+        self.checkouts += 1
+        self.total_wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        return connection
+
+    # Every connection the pool opens goes through its creator, whether it's new or replacing one that was invalidated.
+    def _should_wrap_creator(self, creator):
+        invoke_creator = super()._should_wrap_creator(creator)
+        def timed_invoke_creator(connection_record):
+            start = time.monotonic()
+            try:
+                return invoke_creator(connection_record)
+            finally:
+                connect_seconds = time.monotonic() - start
+                self.connects += 1
+                self.total_connect_seconds += connect_seconds
+                self.max_connect_seconds = max(self.max_connect_seconds, connect_seconds)
+                _checkout_connect_seconds.set(_checkout_connect_seconds.get() + connect_seconds)
+        return timed_invoke_creator
+
+    def get_metrics(self) -> "DatabasePoolMetricsSchema":
+        from app.schemas import DatabasePoolMetricsSchema
+
+        return DatabasePoolMetricsSchema(
+            pool_size=self.size(),
+            max_overflow=self._max_overflow,
+            # The overflow counter starts at -pool_size and counts up as connections are opened.
+            open_connections=self.size() + self.overflow(),
+            checked_out=self.checkedout(),
+            idle=self.checkedin(),
+            overflow=max(0, self.overflow()),
+            checkouts=self.checkouts,
+            timeouts=self.timeouts,
+            average_wait_seconds=self.total_wait_seconds / self.checkouts if self.checkouts > 0 else None,
+            max_wait_seconds=self.max_wait_seconds,
+            connects=self.connects,
+            average_connect_seconds=self.total_connect_seconds / self.connects if self.connects > 0 else None,
+            max_connect_seconds=self.max_connect_seconds
+        )
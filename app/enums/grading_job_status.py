@@ -0,0 +1,16 @@
+from enum import Enum
+
+class GradingJobStatus(str, Enum):
+    QUEUED    = 'QUEUED'
+    RUNNING   = 'RUNNING'
+    COMPLETED = 'COMPLETED'
+    FAILED    = 'FAILED'
+
+class SubmissionGradingStatus(str, Enum):
+    QUEUED      = 'QUEUED'
+    DOWNLOADING = 'DOWNLOADING'
+    GRADING     = 'GRADING'
+    # Graded, but the grade has not been uploaded to the LMS (yet).
+    GRADED      = 'GRADED'
+    UPLOADED    = 'UPLOADED'
+    FAILED      = 'FAILED'
@@ -0,0 +1,6 @@
+from enum import Enum
+
+class LmsSyncStatus(str, Enum):
+    RUNNING   = 'RUNNING'
+    COMPLETED = 'COMPLETED'
+    FAILED    = 'FAILED'
@@ -1,38 +1,30 @@
 from fastapi import Depends
 from fastapi_events.handlers.local import local_handler
 from fastapi_events.typing import Event
-from sqlalchemy.orm import Session
 
 from .schemas import SyncEvents
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal
+from app.core.config import settings
+from app.core.utils.debounce import DebouncedJob
 from app.models import AssignmentModel
 from app.events import ModifyAssignmentCrudEvent
-from app.core.dependencies import get_db_persistent
 
 """
-NOTE: Use `get_db_persistent` instead of `get_db`. FastAPI-Events does not support generator-based DI.
-You MUST call Session.close() once you are done with the database session. 
+NOTE: FastAPI-Events does not support generator-based DI, so `get_db` can't be used here.
+Open sessions with `async with AsyncSessionLocal()` so that their connection is always returned to the pool.
 """
 
 
-@local_handler.register(event_name="crud:assignment:*")
-async def handle_sync_create_assignment(event: ModifyAssignmentCrudEvent):
-    from app.services import GiteaService, StudentService, CourseService
-    
-    event_name, payload = event
-    assignment = payload["assignment"]
+async def update_master_repo_prereceive_hook():
+    from app.services import GiteaService
 
-    with SessionLocal() as session:
-        course_service = CourseService(session)
-        gitea_service = GiteaService(session)
+    async with AsyncSessionLocal() as session:
+        await GiteaService(session).update_master_repo_prereceive_hook()
 
-        hook_content = await gitea_service.get_master_repo_prereceive_hook()    
-        master_repository_name = await course_service.get_master_repository_name()
-        instructor_organization_name = await course_service.get_instructor_gitea_organization_name()
+# Assignment changes tend to come in bursts (e.g. an LMS sync touching every assignment),
+# so the hook is regenerated once the burst is over rather than once per change.
+master_repo_prereceive_hook_job = DebouncedJob(update_master_repo_prereceive_hook, settings.GIT_HOOK_DEBOUNCE_SECONDS)
 
-        await GiteaService(session).set_git_hook(
-            repository_name=master_repository_name,
-            owner=instructor_organization_name,
-            hook_id="pre-receive",
-            hook_content=hook_content
-        )
\ No newline at end of file
+@local_handler.register(event_name="crud:assignment:*")
+async def handle_sync_create_assignment(event: ModifyAssignmentCrudEvent):
+    master_repo_prereceive_hook_job.trigger()
@@ -1,4 +1,5 @@
 from typing import List
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware import Middleware
@@ -12,6 +13,8 @@ from app.core.config import settings, DevPhase
 from app.core.middleware import AuthenticationMiddleware, AuthBackend, LogMiddleware
 from eduhelx_utils.custom_logger import CustomizeLogger
 from app.core.exceptions import CustomException
+from app.core.http_clients import http_clients
+from app.services import GradingJobService, LmsSyncService
 
 import logging
 from pathlib import Path
@@ -68,13 +71,26 @@ def make_middleware() -> List[Middleware]:
     ]
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Grading jobs interrupted by a restart are picked back up, once they're claimable.
+    GradingJobService.start_periodic_resume()
+    # The LMS is synced in the background, rather than holding up startup.
+    LmsSyncService.start_periodic_downsync()
+    yield
+    await GradingJobService.stop_periodic_resume()
+    await LmsSyncService.stop_periodic_downsync()
+    await http_clients.aclose()
+
+
 logger = logging.getLogger(__name__)
 config_path=Path(__file__).with_name("logging_config.json")
 
 def create_app() -> FastAPI:
     app = FastAPI(
         openapi_url=f"{ settings.API_V1_STR }/openapi.json",
-        middleware=make_middleware()
+        middleware=make_middleware(),
+        lifespan=lifespan
     )
     if not settings.DISABLE_LOGGER:
         logger = CustomizeLogger.make_logger(config_path)
@@ -3,4 +3,9 @@ from .submission import SubmissionModel
 from .assignment import AssignmentModel
 from .extra_time import ExtraTimeModel
 from .course import CourseModel
-from .grade_report import GradeReportModel
\ No newline at end of file
+from .grade_report import GradeReportModel
+from .grading_job import GradingJobModel, GradingJobSubmissionModel
+from .submission_grade_result import SubmissionGradeResultModel
+from .lms_fingerprint import LmsFingerprintModel
+from .lms_sync_run import LmsSyncRunModel
+from .git_hook import GitHookModel
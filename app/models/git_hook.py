@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Text, DateTime, func
+from app.database import Base
+
+# The last content set for a git hook of a repository, so that unchanged hooks aren't uploaded again.
+class GitHookModel(Base):
+    __tablename__ = "git_hook"
+
+    owner = Column(Text, primary_key=True)
+    repository_name = Column(Text, primary_key=True)
+    hook_id = Column(Text, primary_key=True)
+    content_hash = Column(String(64), nullable=False)
+    last_modified_date = Column(DateTime(timezone=True), nullable=False, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
@@ -0,0 +1,57 @@
+from sqlalchemy import (
+    Column, Sequence, ForeignKey,
+    Integer, Float, Text, DateTime,
+    Enum, func
+)
+from sqlalchemy.orm import relationship, backref
+from app.database import Base
+from app.enums.grading_job_status import GradingJobStatus, SubmissionGradingStatus
+
+class GradingJobModel(Base):
+    __tablename__ = "grading_job"
+
+    id = Column(Integer, Sequence("grading_job_id_seq"), primary_key=True, autoincrement=True, index=True)
+    status = Column(Enum(GradingJobStatus), nullable=False, server_default=GradingJobStatus.QUEUED.value)
+    error = Column(Text)
+
+    master_notebook_content = Column(Text, nullable=False)
+    otter_config_content = Column(Text, nullable=False)
+
+    created_date = Column(DateTime(timezone=True), nullable=False, server_default=func.current_timestamp())
+    started_date = Column(DateTime(timezone=True))
+    finished_date = Column(DateTime(timezone=True))
+    # Doubles as a heartbeat for the worker running the job.
+    last_updated_date = Column(DateTime(timezone=True), nullable=False, server_default=func.current_timestamp())
+
+    assignment_id = Column(Integer, ForeignKey("assignment.id"), nullable=False)
+    grade_report_id = Column(Integer, ForeignKey("grade_report.id", ondelete="SET NULL"))
+
+    assignment = relationship(
+        "AssignmentModel",
+        foreign_keys="GradingJobModel.assignment_id",
+        backref=backref("grading_jobs", cascade="all,delete")
+    )
+    grade_report = relationship("GradeReportModel", foreign_keys="GradingJobModel.grade_report_id")
+    submissions = relationship(
+        "GradingJobSubmissionModel",
+        cascade="all,delete",
+        back_populates="job",
+        order_by="GradingJobSubmissionModel.id"
+    )
+
+class GradingJobSubmissionModel(Base):
+    __tablename__ = "grading_job_submission"
+
+    id = Column(Integer, Sequence("grading_job_submission_id_seq"), primary_key=True, autoincrement=True, index=True)
+    status = Column(Enum(SubmissionGradingStatus), nullable=False, server_default=SubmissionGradingStatus.QUEUED.value)
+    score = Column(Float)
+    total_points = Column(Float)
+    comments = Column(Text)
+    error = Column(Text)
+    last_updated_date = Column(DateTime(timezone=True), nullable=False, server_default=func.current_timestamp())
+
+    job_id = Column(Integer, ForeignKey("grading_job.id", ondelete="CASCADE"), nullable=False, index=True)
+    submission_id = Column(Integer, ForeignKey("submission.id", ondelete="CASCADE"), nullable=False)
+
+    job = relationship("GradingJobModel", foreign_keys="GradingJobSubmissionModel.job_id", back_populates="submissions")
+    submission = relationship("SubmissionModel", foreign_keys="GradingJobSubmissionModel.submission_id")
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Text, DateTime, func
+from app.database import Base
+
+# The fingerprint of an LMS object (or collection) as of the last time it was synced into the database.
+class LmsFingerprintModel(Base):
+    __tablename__ = "lms_fingerprint"
+
+    # e.g. "course", "assignment", "roster"
+    kind = Column(Text, primary_key=True)
+    # The object's id within its kind
+    key = Column(Text, primary_key=True)
+    # The object's `updated_at`, or a hash of it if it doesn't have one
+    fingerprint = Column(Text, nullable=False)
+    last_modified_date = Column(DateTime(timezone=True), nullable=False, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
@@ -0,0 +1,22 @@
+from sqlalchemy import (
+    Column, Sequence,
+    Integer, Float, Boolean, Text, DateTime, JSON,
+    Enum, func
+)
+from app.database import Base
+from app.enums.lms_sync_status import LmsSyncStatus
+
+# A downsync from the LMS, whether scheduled or requested by an instructor.
+class LmsSyncRunModel(Base):
+    __tablename__ = "lms_sync_run"
+
+    id = Column(Integer, Sequence("lms_sync_run_id_seq"), primary_key=True, autoincrement=True, index=True)
+    status = Column(Enum(LmsSyncStatus), nullable=False, server_default=LmsSyncStatus.RUNNING.value)
+    incremental = Column(Boolean, nullable=False)
+    error = Column(Text)
+    # The LmsSyncReportSchema of a completed sync
+    report = Column(JSON)
+
+    started_date = Column(DateTime(timezone=True), nullable=False, server_default=func.current_timestamp())
+    finished_date = Column(DateTime(timezone=True))
+    duration_seconds = Column(Float)
@@ -0,0 +1,25 @@
+from sqlalchemy import (
+    Column, Sequence, ForeignKey,
+    Integer, Float, String, Text, DateTime,
+    UniqueConstraint, func
+)
+from app.database import Base
+
+# The autograder's result for a commit, graded against a specific autograder config as a specific assignment.
+class SubmissionGradeResultModel(Base):
+    __tablename__ = "submission_grade_result"
+    __table_args__ = (
+        UniqueConstraint("commit_id", "config_hash"),
+    )
+
+    id = Column(Integer, Sequence("submission_grade_result_id_seq"), primary_key=True, autoincrement=True, index=True)
+    commit_id = Column(String(255), nullable=False)
+    # GradingService.get_grading_hash: the inputs the autograder config was generated from,
+    # plus the assignment and the paths that decide what of the commit is graded
+    config_hash = Column(String(64), nullable=False)
+    score = Column(Float, nullable=False)
+    total_points = Column(Float, nullable=False)
+    comments = Column(Text, nullable=False)
+    created_date = Column(DateTime(timezone=True), nullable=False, server_default=func.current_timestamp())
+
+    assignment_id = Column(Integer, ForeignKey("assignment.id", ondelete="CASCADE"), nullable=False)
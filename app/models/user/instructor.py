@@ -3,7 +3,7 @@ from .user import UserModel, UserType
 
 class InstructorModel(UserModel):
     __tablename__ = "instructor"
-    __mapper_args__ = {"polymorphic_identity": UserType.INSTRUCTOR}
+    __mapper_args__ = {"polymorphic_identity": UserType.INSTRUCTOR, "polymorphic_load": "inline"}
     id = Column(Integer, ForeignKey("user_account.id"), primary_key=True)
 
     
\ No newline at end of file
@@ -4,7 +4,7 @@ from .user import UserModel, UserType
 
 class StudentModel(UserModel):
     __tablename__ = "student"
-    __mapper_args__ = {"polymorphic_identity": UserType.STUDENT}
+    __mapper_args__ = {"polymorphic_identity": UserType.STUDENT, "polymorphic_load": "inline"}
     id = Column(Integer, ForeignKey("user_account.id"), primary_key=True)
 
     # This is just a flag to indicate that the student has cloned their fork,
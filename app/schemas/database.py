@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+
+class DatabasePoolMetricsSchema(BaseModel):
+    pool_size: int
+    max_overflow: int
+    # Connections currently open, whether checked out or idle in the pool
+    open_connections: int
+    checked_out: int
+    idle: int
+    # Connections open beyond the pool size
+    overflow: int
+    # Checkouts since the worker started, and how many gave up waiting for a connection
+    checkouts: int
+    timeouts: int
+    # Time checkouts spent waiting for a connection to be returned, not counting opening connections
+    average_wait_seconds: float | None
+    max_wait_seconds: float
+    # Connections opened since the worker started, including reopening invalidated ones, and how long it took
+    connects: int
+    average_connect_seconds: float | None
+    max_connect_seconds: float
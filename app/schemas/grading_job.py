@@ -0,0 +1,37 @@
+from datetime import datetime
+from pydantic import BaseModel
+from app.enums.grading_job_status import GradingJobStatus, SubmissionGradingStatus
+from .grade_report import GradeReportSchema
+
+class ScoreDistributionSchema(BaseModel):
+    # Number of submissions graded so far
+    count: int
+    average: float | None
+    median: float | None
+    minimum: float | None
+    maximum: float | None
+    stdev: float | None
+
+class GradingJobSubmissionSchema(BaseModel):
+    submission_id: int
+    student_onyen: str
+    status: SubmissionGradingStatus
+    score: float | None
+    total_points: float | None
+    error: str | None
+    last_updated_date: datetime
+
+class GradingJobSchema(BaseModel):
+    id: int
+    assignment_id: int
+    status: GradingJobStatus
+    error: str | None
+    created_date: datetime
+    started_date: datetime | None
+    finished_date: datetime | None
+    last_updated_date: datetime
+    submissions: list[GradingJobSubmissionSchema]
+    # Distribution of the scores graded so far (partial until the job finishes)
+    score_distribution: ScoreDistributionSchema
+    # Only available once the job has finished grading
+    grade_report: GradeReportSchema | None
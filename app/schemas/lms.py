@@ -0,0 +1,59 @@
+from datetime import datetime
+from pydantic import BaseModel
+from app.enums.lms_sync_status import LmsSyncStatus
+
+class CanvasRateLimitMetricsSchema(BaseModel):
+    # Canvas' own view of the API token's quota, as of the last response
+    remaining_quota: float | None
+    last_request_cost: float | None
+    # How many requests may currently be in flight at once, and how many are
+    concurrency_limit: int
+    max_concurrency: int
+    in_flight: int
+    requests: int
+    retries: int
+    throttled: int
+
+class LmsUserSyncIssueSchema(BaseModel):
+    pid: str | None
+    name: str | None
+    reason: str
+
+class LmsUserSyncReportSchema(BaseModel):
+    # Whether the roster was left alone because it hadn't changed since the last sync
+    unchanged: bool = False
+    # Onyens of users created, already in the database, and deleted because they've left the course
+    created: list[str] = []
+    existing: list[str] = []
+    deleted: list[str] = []
+    # Users that were passed over because they can't be onboarded yet (e.g. pending enrollments)
+    skipped: list[LmsUserSyncIssueSchema] = []
+    failed: list[LmsUserSyncIssueSchema] = []
+
+class LmsAssignmentSyncDiffSchema(BaseModel):
+    # Whether the assignments were left alone because they hadn't changed since the last sync
+    unchanged: bool = False
+    created: list[int] = []
+    # The fields that changed, by assignment id
+    updated: dict[int, list[str]] = {}
+    deleted: list[int] = []
+
+class LmsSyncReportSchema(BaseModel):
+    # Whether nothing changed in the LMS since the last sync, so nothing was synced
+    unchanged: bool = False
+    assignments: LmsAssignmentSyncDiffSchema
+    students: LmsUserSyncReportSchema
+    instructors: LmsUserSyncReportSchema
+
+class LmsSyncRunSchema(BaseModel):
+    id: int
+    status: LmsSyncStatus
+    incremental: bool
+    error: str | None
+    report: LmsSyncReportSchema | None
+    started_date: datetime
+    finished_date: datetime | None
+    duration_seconds: float | None
+
+    class Config:
+        orm_mode = True
@@ -1,23 +1,22 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services import UserService
 from app.models import UserModel
 from app.models.user import UserType
 from app.core.config import settings
+from app.core.http_clients import http_clients
 from app.core.exceptions import AppstoreUserNotFoundException, AppstoreUserDoesNotMatchException, AppstoreUnsupportedUserTypeException, UserNotFoundException
 import httpx
 
 class AppstoreService:
-    def __init__(self, session: Session, appstore_identity_token: str, user_type: UserType):
+    def __init__(self, session: AsyncSession, appstore_identity_token: str, user_type: UserType):
         self.session = session
         self.user_type = user_type
-        self.client = httpx.AsyncClient(
-            base_url=f"{ self.base_url }",
-            headers={
-                "User-Agent": f"eduhelx_grader_api",
-                "Authorization": f"Bearer { appstore_identity_token }"
-            },
-            timeout=httpx.Timeout(10)
-        )
+        self.appstore_identity_token = appstore_identity_token
+
+    # The client is shared by every user, so the user's token is sent per request instead.
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return http_clients.get(f"appstore_{ self.user_type.value }", self.base_url)
 
     @property
     def base_url(self) -> str:
@@ -32,6 +31,7 @@ class AppstoreService:
             method,
             endpoint,
             headers={
+                "Authorization": f"Bearer { self.appstore_identity_token }",
                 **headers
             },
             **kwargs
@@ -2,13 +2,14 @@ import json
 from typing import List
 from pydantic import PositiveInt
 from datetime import datetime, timedelta
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.exceptions.assignment import AssignmentCannotBeUnpublished
 from app.events import dispatch
 from app.models import AssignmentModel, InstructorModel, StudentModel, ExtraTimeModel
 from app.models.course import CourseModel
 from app.schemas import AssignmentSchema, InstructorAssignmentSchema, StudentAssignmentSchema, UpdateAssignmentSchema
+from app.schemas._unset import UNSET
 from app.events import CreateAssignmentCrudEvent, ModifyAssignmentCrudEvent, DeleteAssignmentCrudEvent
 from app.core.exceptions import (
     AssignmentNotFoundException,
@@ -22,7 +23,7 @@ from app.enums.assignment_status import AssignmentStatus
 from app.services.submission_service import SubmissionService
 
 class AssignmentService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
         
     async def create_assignment(
@@ -56,7 +57,7 @@ class AssignmentService:
         )
 
         self.session.add(assignment)
-        self.session.commit()
+        await self.session.commit()
 
         master_repository_name = await course_service.get_master_repository_name()
         owner = await course_service.get_instructor_gitea_organization_name()
@@ -111,8 +112,8 @@ class AssignmentService:
                 files=files_to_modify
             )
         except Exception as e:
-            self.session.delete(assignment)
-            self.session.commit()
+            await self.session.delete(assignment)
+            await self.session.commit()
             raise e
 
         dispatch(CreateAssignmentCrudEvent(assignment=assignment))
@@ -144,27 +145,30 @@ class AssignmentService:
         #     files=files_to_modify
         # )
 
-        self.session.delete(assignment)
-        self.session.commit()
+        await self.session.delete(assignment)
+        await self.session.commit()
 
         dispatch(DeleteAssignmentCrudEvent(assignment=assignment))
 
     async def get_assignment_by_id(self, id: int) -> AssignmentModel:
-        assignment = self.session.query(AssignmentModel) \
-            .filter_by(id=id) \
-            .first()
+        assignment = await self.session.scalar(
+            select(AssignmentModel)
+            .filter_by(id=id)
+        )
         if assignment is None:
             raise AssignmentNotFoundException()
         return assignment
 
     async def get_assignments(self) -> List[AssignmentModel]:
-        return self.session.query(AssignmentModel) \
-            .all()
+        return (await self.session.scalars(
+            select(AssignmentModel)
+        )).all()
     
     async def get_assignment_by_name(self, name: str) -> AssignmentModel:
-        assignment = self.session.query(AssignmentModel) \
-            .filter_by(name=name) \
-            .first()
+        assignment = await self.session.scalar(
+            select(AssignmentModel)
+            .filter_by(name=name)
+        )
         if assignment is None:
             raise AssignmentNotFoundException()
         return assignment
@@ -213,7 +217,7 @@ class AssignmentService:
         if assignment.available_date is not None and assignment.due_date is not None and assignment.available_date >= assignment.due_date:
             raise AssignmentDueBeforeOpenException()
 
-        self.session.commit()
+        await self.session.commit()
 
         dispatch(ModifyAssignmentCrudEvent(assignment=assignment, modified_fields=list(update_fields.keys())))
 
@@ -222,23 +226,57 @@ class AssignmentService:
     # Get the earliest time at which the given assignment is available
     async def get_earliest_available_date(self, assignment: AssignmentModel) -> datetime | None:
         if assignment.available_date is None: return None
-        earliest_deferral = self.session.query(ExtraTimeModel.deferred_time) \
-            .filter_by(assignment_id=assignment.id) \
-            .order_by(ExtraTimeModel.deferred_time) \
-            .first()
+        earliest_deferral = (await self.session.execute(
+            select(ExtraTimeModel.deferred_time)
+            .filter_by(assignment_id=assignment.id)
+            .order_by(ExtraTimeModel.deferred_time)
+            .limit(1)
+        )).first()
         
         return assignment.available_date + (earliest_deferral if earliest_deferral is not None else timedelta(0))
     
     # Gets the latest time at which the given assignment closes
     async def get_latest_due_date(self, assignment: AssignmentModel) -> datetime | None:
         if assignment.due_date is None: return None
-        latest_time = self.session.query(ExtraTimeModel.extra_time) \
-            .filter_by(assignment_id=assignment.id) \
-            .order_by(ExtraTimeModel.extra_time.desc()) \
-            .first()
+        latest_time = (await self.session.execute(
+            select(ExtraTimeModel.extra_time)
+            .filter_by(assignment_id=assignment.id)
+            .order_by(ExtraTimeModel.extra_time.desc())
+            .limit(1)
+        )).first()
         
         return assignment.due_date + (latest_time.extra_time if latest_time.extra_time is not None else timedelta(0))
 
+    """
+    Builds the schemas of every given assignment for a student using a fixed number of queries,
+    rather than several per assignment. All statuses are computed against a single read of the database clock.
+    """
+    async def get_student_assignment_schemas(
+        self,
+        student: StudentModel,
+        assignments: List[AssignmentModel],
+        course: CourseModel
+    ) -> List[StudentAssignmentSchema]:
+        extra_time_models = {
+            extra_time_model.assignment_id: extra_time_model
+            for extra_time_model in await self.session.scalars(select(ExtraTimeModel).filter_by(student_id=student.id))
+        }
+        attempts = await SubmissionService(self.session).get_submission_attempts_by_assignment(student)
+        current_timestamp = await self.session.scalar(select(func.current_timestamp()))
+
+        return [
+            await StudentAssignmentService(
+                self.session,
+                student,
+                assignment,
+                course,
+                extra_time_model=extra_time_models.get(assignment.id),
+                current_timestamp=current_timestamp,
+                current_attempts=attempts.get(assignment.id, 0)
+            ).get_student_assignment_schema()
+            for assignment in assignments
+        ]
+
     """ Compute the default gitignore for an assignment. """
     async def get_gitignore_content(self, assignment: AssignmentModel) -> str:
         protected_files_str = "\n".join(await self.get_protected_files(assignment))
@@ -288,7 +326,7 @@ __pycache__/
         ]
 
 class InstructorAssignmentService(AssignmentService):
-    def __init__(self, session: Session, instructor_model: InstructorModel, assignment_model: AssignmentModel, course_model: CourseModel):
+    def __init__(self, session: AsyncSession, instructor_model: InstructorModel, assignment_model: AssignmentModel, course_model: CourseModel):
         super().__init__(session)
         self.instructor_model = instructor_model
         self.assignment_model = assignment_model
@@ -308,10 +346,10 @@ class InstructorAssignmentService(AssignmentService):
 
         return assignment_due_date
 
-    def get_assignment_status(self) -> AssignmentStatus:
+    async def get_assignment_status(self) -> AssignmentStatus:
         if not self.assignment_model.is_published: return AssignmentStatus.UNPUBLISHED
 
-        current_timestamp = self.session.scalar(func.current_timestamp())
+        current_timestamp = await self.session.scalar(select(func.current_timestamp()))
         adjusted_available_date = self.get_adjusted_available_date()
         adjusted_due_date = self.get_adjusted_due_date()
 
@@ -331,7 +369,7 @@ class InstructorAssignmentService(AssignmentService):
         assignment["protected_files"] = await self.get_protected_files(self.assignment_model)
         assignment["overwritable_files"] = await self.get_overwritable_files(self.assignment_model)
 
-        assignment_status = self.get_assignment_status()
+        assignment_status = await self.get_assignment_status()
         assignment["status"] = assignment_status.value
         assignment["is_available"] = assignment_status == AssignmentStatus.OPEN
         assignment["is_closed"] = assignment_status == AssignmentStatus.CLOSED
@@ -340,40 +378,74 @@ class InstructorAssignmentService(AssignmentService):
         return InstructorAssignmentSchema(**assignment)
     
 class StudentAssignmentService(AssignmentService):
-    def __init__(self, session: Session, student_model: StudentModel, assignment_model: AssignmentModel, course_model: CourseModel):
+    """
+    `extra_time_model`, `current_timestamp` and `current_attempts` may be passed in when they've
+    already been loaded in bulk. Otherwise, they're queried as needed (at most once).
+    """
+    def __init__(
+        self,
+        session: AsyncSession,
+        student_model: StudentModel,
+        assignment_model: AssignmentModel,
+        course_model: CourseModel,
+        *,
+        extra_time_model: ExtraTimeModel | None = UNSET,
+        current_timestamp: datetime | None = None,
+        current_attempts: int | None = None
+    ):
         super().__init__(session)
         self.student_model = student_model
         self.assignment_model = assignment_model
         self.course_model = course_model
-        self.extra_time_model = self._get_extra_time_model()
-
-    def _get_extra_time_model(self) -> ExtraTimeModel | None:
-        extra_time_model = self.session.query(ExtraTimeModel) \
-            .filter(
-                (ExtraTimeModel.assignment_id == self.assignment_model.id) &
-                (ExtraTimeModel.student_id == self.student_model.id)
-            ) \
-            .first()
-        return extra_time_model
+        self.extra_time_model = extra_time_model
+        self._current_timestamp = current_timestamp
+        self._current_attempts = current_attempts
+
+    async def _get_extra_time_model(self) -> ExtraTimeModel | None:
+        if self.extra_time_model is UNSET:
+            self.extra_time_model = await self.session.scalar(
+                select(ExtraTimeModel)
+                .filter(
+                    (ExtraTimeModel.assignment_id == self.assignment_model.id) &
+                    (ExtraTimeModel.student_id == self.student_model.id)
+                )
+            )
+        return self.extra_time_model
+
+    # The database clock is read at most once, so that every date is compared against the same moment.
+    async def _get_current_timestamp(self) -> datetime:
+        if self._current_timestamp is None:
+            self._current_timestamp = await self.session.scalar(select(func.current_timestamp()))
+        return self._current_timestamp
+
+    async def _get_current_attempts(self) -> int:
+        if self._current_attempts is None:
+            self._current_attempts = await SubmissionService(self.session).get_current_submission_attempt(
+                self.student_model,
+                self.assignment_model
+            )
+        return self._current_attempts
 
     # The release date for a specific student, considering extra_time
-    def get_adjusted_available_date(self) -> datetime | None:
+    async def get_adjusted_available_date(self) -> datetime | None:
         assignment_open_date = self.assignment_model.available_date or self.course_model.start_at
         if assignment_open_date is None: return None
-        deferred_time = self.extra_time_model.deferred_time if self.extra_time_model is not None else timedelta(0)
+        extra_time_model = await self._get_extra_time_model()
+        deferred_time = extra_time_model.deferred_time if extra_time_model is not None else timedelta(0)
         
         return assignment_open_date + deferred_time
 
     # The due date for a specific student, considering extra_time
-    def get_adjusted_due_date(self) -> datetime | None:
+    async def get_adjusted_due_date(self) -> datetime | None:
         assignment_due_date = self.assignment_model.due_date or self.course_model.end_at
         if assignment_due_date is None: return None
 
         # If a student does not have any extra time allotted for the assignment,
         # allocate them a timedelta of 0.
-        if self.extra_time_model is not None:
-            deferred_time = self.extra_time_model.deferred_time
-            extra_time = self.extra_time_model.extra_time
+        extra_time_model = await self._get_extra_time_model()
+        if extra_time_model is not None:
+            deferred_time = extra_time_model.deferred_time
+            extra_time = extra_time_model.extra_time
         else:
             deferred_time = timedelta(0)
             extra_time = timedelta(0)
@@ -381,25 +453,25 @@ class StudentAssignmentService(AssignmentService):
         # Base due date + have to defer by whatever amount the available date was deferred by + extra time + base extra time
         return assignment_due_date + deferred_time + extra_time + self.student_model.base_extra_time
 
-    def _get_is_available(self) -> bool:
-        adjusted_available_date = self.get_adjusted_available_date()
+    async def _get_is_available(self) -> bool:
+        adjusted_available_date = await self.get_adjusted_available_date()
         if adjusted_available_date is None: return True
-        current_timestamp = self.session.scalar(func.current_timestamp())
+        current_timestamp = await self._get_current_timestamp()
         return current_timestamp >= adjusted_available_date
     
-    def _get_is_closed(self) -> bool:
-        adjusted_due_date = self.get_adjusted_due_date()
+    async def _get_is_closed(self) -> bool:
+        adjusted_due_date = await self.get_adjusted_due_date()
         if adjusted_due_date is None: 
-            return not self._get_is_available()
-        current_timestamp = self.session.scalar(func.current_timestamp())
+            return not await self._get_is_available()
+        current_timestamp = await self._get_current_timestamp()
         return current_timestamp > adjusted_due_date
     
-    def get_assignment_status(self) -> AssignmentStatus:
+    async def get_assignment_status(self) -> AssignmentStatus:
         if not self.assignment_model.is_published: return AssignmentStatus.UNPUBLISHED
 
-        current_timestamp = self.session.scalar(func.current_timestamp())
-        adjusted_available_date = self.get_adjusted_available_date()
-        adjusted_due_date = self.get_adjusted_due_date()
+        current_timestamp = await self._get_current_timestamp()
+        adjusted_available_date = await self.get_adjusted_available_date()
+        adjusted_due_date = await self.get_adjusted_due_date()
 
         # Until a course is properly configured (has start_at,end_at dates),
         # all published assignments will display as upcoming. 
@@ -412,7 +484,7 @@ class StudentAssignmentService(AssignmentService):
         else: return AssignmentStatus.CLOSED
 
     async def validate_student_can_submit(self):
-        assignment_status = self.get_assignment_status()
+        assignment_status = await self.get_assignment_status()
         if assignment_status == AssignmentStatus.UNPUBLISHED:
             raise AssignmentNotPublishedException()
 
@@ -423,23 +495,20 @@ class StudentAssignmentService(AssignmentService):
             raise AssignmentClosedException()
         
         if self.assignment_model.max_attempts is not None:
-            attempts = await SubmissionService(self.session).get_current_submission_attempt(self.student_model, self.assignment_model)
+            attempts = await self._get_current_attempts()
             if attempts >= self.assignment_model.max_attempts:
                 raise SubmissionMaxAttemptsReachedException()
 
     async def get_student_assignment_schema(self) -> StudentAssignmentSchema:
         assignment = AssignmentSchema.from_orm(self.assignment_model).dict()
-        assignment_status = self.get_assignment_status()
+        assignment_status = await self.get_assignment_status()
 
         assignment["protected_files"] = await self.get_protected_files(self.assignment_model)
         assignment["overwritable_files"] = await self.get_overwritable_files(self.assignment_model)
-        assignment["current_attempts"] = await SubmissionService(self.session).get_current_submission_attempt(
-            self.student_model,
-            self.assignment_model
-        )
+        assignment["current_attempts"] = await self._get_current_attempts()
         assignment["status"] = assignment_status.value
-        assignment["adjusted_available_date"] = self.get_adjusted_available_date()
-        assignment["adjusted_due_date"] = self.get_adjusted_due_date()
+        assignment["adjusted_available_date"] = await self.get_adjusted_available_date()
+        assignment["adjusted_due_date"] = await self.get_adjusted_due_date()
         assignment["is_available"] = assignment_status == AssignmentStatus.OPEN
         assignment["is_closed"] = assignment_status == AssignmentStatus.CLOSED
         assignment["is_published"] = assignment_status != AssignmentStatus.UNPUBLISHED
@@ -1,16 +1,23 @@
-import requests
+import time
+import random
 import httpx
+import asyncio
 import os.path
-from typing import BinaryIO
+from typing import BinaryIO, AsyncIterator
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
 from pathlib import Path
 from enum import Enum
 from urllib.parse import urlparse
 from pydantic import BaseModel, PositiveInt
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.core.http_clients import http_clients
 from app.enums.canvas.canvas_workflow_state_filter import CanvasWorkflowStateFilter
 from app.models import UserModel, OnyenPIDModel
+from app.schemas import CanvasRateLimitMetricsSchema
 from app.services import UserService, UserType
 from app.core.utils.datetime import get_now_with_tzinfo
 from app.core.exceptions import (
@@ -29,21 +36,109 @@ class UpdateCanvasAssignmentBody(BaseModel):
     max_attempts: PositiveInt | None
     is_published: bool | None
 
+class CanvasRoster(BaseModel):
+    users: list[dict]
+    # Index of users by their PID (sis_user_id)
+    users_by_pid: dict[str, dict]
+    # time.monotonic() at which the roster was fetched
+    fetched_at: float
+    # PIDs that were looked up and aren't in the roster
+    missing_pids: set[str] = set()
+
+# Rosters of the course by user type, shared by every CanvasService in the process.
+_roster_cache: dict[UserType, CanvasRoster] = {}
+# Held while a roster is fetched, so that concurrent lookups share a single fetch.
+_roster_locks: dict[UserType, asyncio.Lock] = {}
+
+class CanvasRequestScheduler:
+    """
+    Paces every request the process makes to Canvas. Canvas meters an API token with a leaky bucket,
+    reporting what's left of it in X-Rate-Limit-Remaining, and rejects requests with a 403 once it runs dry.
+    Concurrency is adjusted to the reported quota: raised by one while the quota stays above
+    CANVAS_RATE_LIMIT_LOW_WATERMARK, and halved whenever it dips below it or a request is throttled.
+    """
+    def __init__(self):
+        self.concurrency_limit = settings.CANVAS_MAX_CONCURRENCY
+        self.in_flight = 0
+        self.remaining_quota: float | None = None
+        self.last_request_cost: float | None = None
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._condition: asyncio.Condition | None = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        # Like pooled clients, the condition belongs to the event loop it was created on.
+        if self._loop is not loop:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self.in_flight = 0
+        return self._condition
+
+    """ Waits until a request may be sent, and holds its place in the concurrency limit until it's done. """
+    @asynccontextmanager
+    async def slot(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.concurrency_limit)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with condition:
+                self.in_flight -= 1
+                condition.notify_all()
+
+    def record_response(self, res: httpx.Response) -> None:
+        self.requests += 1
+        remaining = res.headers.get("X-Rate-Limit-Remaining")
+        cost = res.headers.get("X-Request-Cost")
+        if cost is not None:
+            self.last_request_cost = float(cost)
+        if remaining is None:
+            return
+        self.remaining_quota = float(remaining)
+        if self.remaining_quota < settings.CANVAS_RATE_LIMIT_LOW_WATERMARK:
+            self._decrease_concurrency()
+        else:
+            self.concurrency_limit = min(self.concurrency_limit + 1, settings.CANVAS_MAX_CONCURRENCY)
+
+    def record_throttle(self) -> None:
+        self.throttled += 1
+        self._decrease_concurrency()
+
+    def record_retry(self) -> None:
+        self.retries += 1
+
+    def _decrease_concurrency(self) -> None:
+        self.concurrency_limit = max(1, self.concurrency_limit // 2)
+
+    def get_metrics(self) -> CanvasRateLimitMetricsSchema:
+        return CanvasRateLimitMetricsSchema(
+            remaining_quota=self.remaining_quota,
+            last_request_cost=self.last_request_cost,
+            concurrency_limit=self.concurrency_limit,
+            max_concurrency=settings.CANVAS_MAX_CONCURRENCY,
+            in_flight=self.in_flight,
+            requests=self.requests,
+            retries=self.retries,
+            throttled=self.throttled
+        )
+
+# Canvas rate limits per API token, so every CanvasService in the process shares one scheduler.
+_request_scheduler = CanvasRequestScheduler()
+
 class CanvasService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.session = requests.Session()
-        self.session.headers.update({
-            "Authorization": f"Bearer {settings.CANVAS_API_KEY}"
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return http_clients.get("canvas", self.api_url, {
+            "Authorization": f"Bearer { settings.CANVAS_API_KEY }"
         })
-        self.client = httpx.AsyncClient(
-            base_url=f"{ self.api_url }",
-            headers={
-                "User-Agent": f"eduhelx_grader_api",
-                "Authorization": f"Bearer { settings.CANVAS_API_KEY }"
-            },
-            timeout=httpx.Timeout(10)
-        )
 
     @property
     def api_url(self) -> str:
@@ -57,18 +152,67 @@ class CanvasService:
                 raise LMSBackendException(e.response.text, e.response) from e
             raise LMSBackendException(str(e)) from e
     
-    async def _make_request(self, method: str, endpoint: str, headers={}, **kwargs):
-        res = await self.client.request(
-            method,
-            endpoint,
-            headers={
-                **headers
-            },
-            **kwargs
-        )
+    """
+    Sends a request through the shared scheduler. Throttled requests are always retried, since Canvas
+    rejects them before doing anything. Server and connection errors are only retried for idempotent methods,
+    so that e.g. a POST which went through before the connection dropped isn't made twice.
+    """
+    async def _make_raw_request(self, method: str, endpoint: str, headers={}, **kwargs) -> httpx.Response:
+        idempotent = method.upper() in ("GET", "HEAD", "PUT", "DELETE")
+        for attempt in range(settings.CANVAS_MAX_RETRIES + 1):
+            is_last_attempt = attempt == settings.CANVAS_MAX_RETRIES
+            async with _request_scheduler.slot():
+                try:
+                    res = await self.client.request(
+                        method,
+                        endpoint,
+                        headers={
+                            **headers
+                        },
+                        **kwargs
+                    )
+                except httpx.TransportError as e:
+                    if not idempotent or is_last_attempt:
+                        raise e
+                    res = None
+
+            if res is not None:
+                _request_scheduler.record_response(res)
+                throttled = self._is_throttled(res)
+                if throttled:
+                    _request_scheduler.record_throttle()
+                if is_last_attempt or not (throttled or (idempotent and res.status_code >= 500)):
+                    break
+
+            _request_scheduler.record_retry()
+            await asyncio.sleep(self._get_retry_delay(attempt))
+
         await self._check_response(res)
+        return res
+
+    @staticmethod
+    def _is_throttled(res: httpx.Response) -> bool:
+        if res.status_code == 429:
+            return True
+        return res.status_code == 403 and "Rate Limit Exceeded" in res.text
+
+    """ Exponential backoff with full jitter, so that throttled requests don't all come back at once. """
+    @staticmethod
+    def _get_retry_delay(attempt: int) -> float:
+        return random.uniform(0, min(
+            settings.CANVAS_RETRY_MAX_SECONDS,
+            settings.CANVAS_RETRY_BASE_SECONDS * 2 ** attempt
+        ))
+
+    @staticmethod
+    def get_rate_limit_metrics() -> CanvasRateLimitMetricsSchema:
+        return _request_scheduler.get_metrics()
+
+    async def _make_request(self, method: str, endpoint: str, headers={}, **kwargs):
+        res = await self._make_raw_request(method, endpoint, headers, **kwargs)
         return res.json()
     
+    """ NOTE: For list endpoints, this only returns the first page. Use _get_all or _get_paginated instead. """
     async def _get(self, endpoint: str, **kwargs):
         if 'params' not in kwargs:
             kwargs['params'] = {}
@@ -78,6 +222,70 @@ class CanvasService:
 
         return await self._make_request("GET", endpoint, **kwargs)
 
+    """
+    Yields every page of a list endpoint, following the pagination Link header.
+    When Canvas links to the last page by number, the remaining pages are known up front,
+    so up to CANVAS_PAGINATION_CONCURRENCY of them are prefetched concurrently (still yielded in order).
+    Otherwise (e.g. bookmark-based pages), pages are followed one at a time.
+    """
+    async def _get_paginated(self, endpoint: str, **kwargs) -> AsyncIterator[list]:
+        if 'params' not in kwargs:
+            kwargs['params'] = {}
+        kwargs['params']['per_page'] = 100
+
+        res = await self._make_raw_request("GET", endpoint, **kwargs)
+        yield res.json()
+
+        page_urls = self._get_numbered_page_urls(res)
+        if page_urls is None:
+            while "next" in res.links:
+                # Pagination links already include the original query parameters.
+                res = await self._make_raw_request("GET", res.links["next"]["url"])
+                yield res.json()
+            return
+
+        page_urls = iter(page_urls)
+        pending = deque()
+        def prefetch_next_page():
+            url = next(page_urls, None)
+            if url is not None:
+                pending.append(asyncio.create_task(self._make_request("GET", url)))
+
+        for _ in range(max(1, settings.CANVAS_PAGINATION_CONCURRENCY)):
+            prefetch_next_page()
+        try:
+            while len(pending) > 0:
+                page = await pending.popleft()
+                prefetch_next_page()
+                yield page
+        finally:
+            # On an early exit or an error, wait for the prefetches to wind down so that none are left running
+            # (and none of their exceptions go unretrieved).
+            for task in pending: task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _get_all(self, endpoint: str, **kwargs) -> list:
+        items = []
+        async for page in self._get_paginated(endpoint, **kwargs):
+            items += page
+        return items
+
+    """ The URLs of the pages after the current one, if the pages are numbered and the last one is linked. """
+    @staticmethod
+    def _get_numbered_page_urls(res: httpx.Response) -> list[str] | None:
+        if "next" not in res.links or "last" not in res.links:
+            return None
+        next_url = httpx.URL(res.links["next"]["url"])
+        last_url = httpx.URL(res.links["last"]["url"])
+        next_page = next_url.params.get("page", "")
+        last_page = last_url.params.get("page", "")
+        if not next_page.isdigit() or not last_page.isdigit():
+            return None
+        return [
+            str(next_url.copy_set_param("page", page))
+            for page in range(int(next_page), int(last_page) + 1)
+        ]
+
     async def _post(self, endpoint: str, **kwargs):
         return await self._make_request("POST", endpoint, **kwargs)
     
@@ -91,14 +299,14 @@ class CanvasService:
         return await self._make_request("DELETE", endpoint, **kwargs)
 
     async def get_courses(self):
-        return await self._get("courses")
+        return await self._get_all("courses")
 
     async def get_course(self):
         return await self._get(f"courses/{ settings.CANVAS_COURSE_ID }")
     
     # returns a dictionary of assignments for a course
     async def get_assignments(self):
-        return await self._get(f"courses/{ settings.CANVAS_COURSE_ID }/assignments")
+        return await self._get_all(f"courses/{ settings.CANVAS_COURSE_ID }/assignments")
 
     async def get_assignment(self, assignment_id):
         return await self._get(f"courses/{ settings.CANVAS_COURSE_ID }/assignments/{ assignment_id }")
@@ -132,7 +340,7 @@ class CanvasService:
         }
         if workflow_state_filter is not None:
             params["workflow_state"] = workflow_state_filter.value
-        return await self._get(f"courses/{ settings.CANVAS_COURSE_ID }/students/submissions", params=params)
+        return await self._get_all(f"courses/{ settings.CANVAS_COURSE_ID }/students/submissions", params=params)
 
     """ NOTE: If student_id is provided, returns a single Submission object. """
     """ NOTE: Otherwise, returns a Submission for every enrolled student, even if they have not submitted (submitted_at = None). """
@@ -160,12 +368,46 @@ class CanvasService:
     async def get_instructor_by_pid(self, pid: str):
         return await self.get_user_by_pid(pid, UserType.INSTRUCTOR)
     
+    """
+    Looks the user up in the cached roster. If the PID isn't there, the roster may just be out of
+    date (e.g. the user enrolled recently), so it's fetched again, but only if it's older than
+    CANVAS_ROSTER_REFRESH_SECONDS. PIDs that still aren't found are remembered until the roster is
+    next fetched, so looking them up again doesn't fetch it either.
+    """
     async def get_user_by_pid(self, pid: str, user_type: UserType):
-        users = await self.get_users(user_type)
-        for user in users:
-            if user["sis_user_id"] == pid: return user
-        raise LMSUserNotFoundException()
+        roster = await self.get_roster(user_type)
+        if pid not in roster.users_by_pid and pid not in roster.missing_pids:
+            roster = await self._get_roster(user_type, settings.CANVAS_ROSTER_REFRESH_SECONDS)
+        if pid not in roster.users_by_pid:
+            roster.missing_pids.add(pid)
+            raise LMSUserNotFoundException()
+        return roster.users_by_pid[pid]
+
+    """ The cached roster of users of the given type, fetched if it's missing or older than CANVAS_ROSTER_CACHE_TTL_SECONDS. """
+    async def get_roster(self, user_type: UserType) -> CanvasRoster:
+        return await self._get_roster(user_type, settings.CANVAS_ROSTER_CACHE_TTL_SECONDS)
+
+    async def _get_roster(self, user_type: UserType, max_age_seconds: float) -> CanvasRoster:
+        def is_fresh(roster: CanvasRoster | None) -> bool:
+            return roster is not None and time.monotonic() - roster.fetched_at <= max_age_seconds
+
+        roster = _roster_cache.get(user_type)
+        if is_fresh(roster): return roster
+        async with _roster_locks.setdefault(user_type, asyncio.Lock()):
+            # Another lookup may have fetched the roster while this one was waiting.
+            roster = _roster_cache.get(user_type)
+            if not is_fresh(roster):
+                await self.get_users(user_type)
+                roster = _roster_cache[user_type]
+        return roster
+
+    """ Drops the cached roster of the given user type, or of every user type if None. """
+    @staticmethod
+    def invalidate_roster_cache(user_type: UserType | None = None) -> None:
+        if user_type is None: _roster_cache.clear()
+        else: _roster_cache.pop(user_type, None)
 
+    """ Always fetches the users from Canvas, refreshing the cached roster along the way. """
     async def get_users(self, user_type: UserType):
         if user_type == UserType.STUDENT:
             enrollment_type = "student"
@@ -173,9 +415,38 @@ class CanvasService:
             enrollment_type = "teacher"
         else:
             raise ValueError("You can only get student and instructor users from this endpoint")
-        return await self._get(f"courses/{ settings.CANVAS_COURSE_ID }/users", params={
+        users = await self._get_all(f"courses/{ settings.CANVAS_COURSE_ID }/users", params={
             "enrollment_type": enrollment_type
         })
+        self._store_roster(user_type, users)
+        return users
+
+    """
+    Fetches the students and instructors in a single listing, refreshing both cached rosters.
+    Cheaper than calling get_users for each user type when both are needed, e.g. while syncing.
+    """
+    async def refresh_rosters(self) -> None:
+        users = await self._get_all(f"courses/{ settings.CANVAS_COURSE_ID }/users", params={
+            "enrollment_type[]": ["student", "teacher"],
+            "include[]": ["enrollments"]
+        })
+        users_by_type = { UserType.STUDENT: [], UserType.INSTRUCTOR: [] }
+        for user in users:
+            enrollment_types = set(enrollment["type"] for enrollment in user.pop("enrollments", []))
+            if "StudentEnrollment" in enrollment_types: users_by_type[UserType.STUDENT].append(user)
+            if "TeacherEnrollment" in enrollment_types: users_by_type[UserType.INSTRUCTOR].append(user)
+        for user_type, users in users_by_type.items():
+            self._store_roster(user_type, users)
+
+    @staticmethod
+    def _store_roster(user_type: UserType, users: list[dict]) -> None:
+        # Callers are free to modify the users they get back, so the roster keeps its own copies.
+        roster_users = [dict(user) for user in users]
+        _roster_cache[user_type] = CanvasRoster(
+            users=roster_users,
+            users_by_pid={ user["sis_user_id"]: user for user in roster_users if user.get("sis_user_id") is not None },
+            fetched_at=time.monotonic()
+        )
     
     async def _upload_file(
         self,
@@ -289,15 +560,17 @@ class CanvasService:
     ):
         folder_path = Path(folder_path)
         url = f"courses/{ settings.CANVAS_COURSE_ID }/folders"
-        folders = await self._get(url)
-        for folder in folders:
-            # Canvas files are always under a hidden top-level directory.
-            # E.g., course files are under the "course files" directory, but you don't see that in the UI.
-            # We're have to remove that from the path before comparing.
-            path = Path(folder["full_name"])
-            if len(path.parts) <= 1: continue
-            path = Path(*path.parts[1:])
-            if path == folder_path: return folder
+        # Close the pages early (cancelling any prefetches) once the folder is found.
+        async with aclosing(self._get_paginated(url)) as pages:
+            async for folders in pages:
+                for folder in folders:
+                    # Canvas files are always under a hidden top-level directory.
+                    # E.g., course files are under the "course files" directory, but you don't see that in the UI.
+                    # We're have to remove that from the path before comparing.
+                    path = Path(folder["full_name"])
+                    if len(path.parts) <= 1: continue
+                    path = Path(*path.parts[1:])
+                    if path == folder_path: return folder
         raise LMSFolderNotFoundException(f'Could not find the folder "{ folder_path }" in Canvas course files')
     
     async def _create_folder(
@@ -400,6 +673,40 @@ class CanvasService:
 
         await self._put(url, json=payload)
 
+    """
+    Sets the grades (and comments) of many students on an assignment with a single request.
+    `grades` maps each Canvas user id to its grade proportion, between [0,1], and comments.
+    Canvas applies the grades asynchronously, so this waits on the returned Progress until it finishes.
+    Raises LMSBackendException if Canvas fails to apply the grades.
+    """
+    async def upload_assignment_grades(
+        self,
+        assignment_id: int,
+        grades: dict[int, tuple[float, str | None]]
+    ):
+        url = f"courses/{ settings.CANVAS_COURSE_ID }/assignments/{ assignment_id }/submissions/update_grades"
+
+        grade_data = {}
+        for user_id, (grade_proportion, comments) in grades.items():
+            grade_data[str(user_id)] = { "posted_grade": f"{ grade_proportion * 100 }%" }
+            if comments is not None: grade_data[str(user_id)]["text_comment"] = comments
+
+        progress = await self._post(url, json={ "grade_data": grade_data })
+        return await self.wait_for_progress(progress)
+
+    """ Polls a Canvas Progress object until it completes, returning the final Progress. """
+    async def wait_for_progress(self, progress):
+        deadline = time.monotonic() + settings.CANVAS_PROGRESS_TIMEOUT_SECONDS
+        while progress["workflow_state"] not in ("completed", "failed"):
+            if time.monotonic() > deadline:
+                raise LMSBackendException(f"Timed out waiting on LMS progress { progress['id'] }")
+            await asyncio.sleep(settings.CANVAS_PROGRESS_POLL_SECONDS)
+            progress = await self._get(f"progress/{ progress['id'] }")
+
+        if progress["workflow_state"] == "failed":
+            raise LMSBackendException(progress.get("message") or f"LMS progress { progress['id'] } failed")
+        return progress
+
     async def update_assignment(self, assignment_id: int, body: UpdateCanvasAssignmentBody):
         url = f"courses/{ settings.CANVAS_COURSE_ID }/assignments/{ assignment_id }"
         payload = body.dict(exclude_unset=True)
@@ -417,13 +724,13 @@ class CanvasService:
         })
 
     async def get_onyen_from_pid(self, pid: str) -> UserModel:
-        pid_onyen = self.db.query(OnyenPIDModel).filter_by(pid=pid).first()
+        pid_onyen = await self.db.scalar(select(OnyenPIDModel).filter_by(pid=pid))
         if pid_onyen is None:
             raise LMSUserNotFoundException(f'LMS user with pid "{ pid }" does not exist')
         return await UserService(self.db).get_user_by_onyen(pid_onyen.onyen)
 
     async def get_pid_from_onyen(self, onyen: str) -> str:
-        pid_onyen = self.db.query(OnyenPIDModel).filter_by(onyen=onyen).first()
+        pid_onyen = await self.db.scalar(select(OnyenPIDModel).filter_by(onyen=onyen))
         if pid_onyen is None:
             raise LMSUserNotFoundException(f'LMS user with onyen "{ onyen }" does not exist')
         return pid_onyen.pid
@@ -432,7 +739,7 @@ class CanvasService:
     I would recommend for clarity first calling unassociate_pid_from_user when modifying a mapping.
     If there's a chance the PID is already associated with a different user, this method will throw. """
     async def associate_pid_to_user(self, onyen: str, pid: str) -> None:
-        existing_mapping = self.db.query(OnyenPIDModel).filter((OnyenPIDModel.onyen == onyen) | (OnyenPIDModel.pid == pid)).first()
+        existing_mapping = await self.db.scalar(select(OnyenPIDModel).filter((OnyenPIDModel.onyen == onyen) | (OnyenPIDModel.pid == pid)).limit(1))
         if existing_mapping is not None:
             if existing_mapping.onyen == onyen and existing_mapping.pid == pid:
                 # Already associated, no further action required.
@@ -440,7 +747,7 @@ class CanvasService:
             elif existing_mapping.onyen == onyen:
                 # The Eduhelx user is currently associated with a different PID, update it.
                 existing_mapping.pid = pid
-                self.db.commit()
+                await self.db.commit()
                 return
             elif existing_mapping.pid == pid:
                 # This PID is already associated with a different Eduhelx user.
@@ -448,14 +755,46 @@ class CanvasService:
                 raise LMSUserPIDAlreadyAssociatedException()
         else:
             self.db.add(OnyenPIDModel(onyen=onyen, pid=pid))
-            self.db.commit()
+            await self.db.commit()
         
+    async def get_pids_by_onyen(self) -> dict[str, str]:
+        return { mapping.onyen: mapping.pid for mapping in await self.db.scalars(select(OnyenPIDModel)) }
+
+    """
+    Associates many users with their PIDs in a single commit, following the same rules as associate_pid_to_user.
+    Returns the onyens that were left unassociated because their PID is already associated with a different user.
+    """
+    async def associate_pids_to_users(self, pids_by_onyen: dict[str, str]) -> list[str]:
+        if len(pids_by_onyen) == 0: return []
+
+        existing_mappings = (await self.db.scalars(select(OnyenPIDModel).filter(
+            OnyenPIDModel.onyen.in_(pids_by_onyen.keys()) | OnyenPIDModel.pid.in_(pids_by_onyen.values())
+        ))).all()
+        mappings_by_onyen = { mapping.onyen: mapping for mapping in existing_mappings }
+        onyens_by_pid = { mapping.pid: mapping.onyen for mapping in existing_mappings }
+
+        conflicting_onyens = []
+        for onyen, pid in pids_by_onyen.items():
+            if onyens_by_pid.get(pid, onyen) != onyen:
+                conflicting_onyens.append(onyen)
+                continue
+            mapping = mappings_by_onyen.get(onyen)
+            if mapping is None:
+                self.db.add(OnyenPIDModel(onyen=onyen, pid=pid))
+            else:
+                onyens_by_pid.pop(mapping.pid, None)
+                mapping.pid = pid
+            onyens_by_pid[pid] = onyen
+        await self.db.commit()
+
+        return conflicting_onyens
+
     async def unassociate_pid_from_user(self, onyen: str) -> None:
-        pid_onyen = self.db.query(OnyenPIDModel).filter_by(onyen=onyen).first()
+        pid_onyen = await self.db.scalar(select(OnyenPIDModel).filter_by(onyen=onyen))
         if pid_onyen is None:
             raise LMSUserNotFoundException()
-        self.db.delete(pid_onyen)
-        self.db.commit()
+        await self.db.delete(pid_onyen)
+        await self.db.commit()
 
     async def get_private_course_folder_path(self) -> str:
         return self._compute_private_course_folder_path()
@@ -1,20 +1,20 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import UserModel, CourseModel, GradeReportModel
 from app.services import GiteaService, KubernetesService
 
 class CleanupService:
     class Grading:
-        def __init__(self, session: Session, grade_report: GradeReportModel):
+        def __init__(self, session: AsyncSession, grade_report: GradeReportModel):
             self.session = session
             self.grade_report = grade_report
 
         async def undo_grade_assignment(self, delete_database_grade_report=False):
             if delete_database_grade_report:
-                self.session.delete(self.grade_report)
-                self.session.commit()
+                await self.session.delete(self.grade_report)
+                await self.session.commit()
 
     class Course:
-        def __init__(self, session: Session, course: CourseModel):
+        def __init__(self, session: AsyncSession, course: CourseModel):
             self.session = session
             self.course = course
 
@@ -24,15 +24,15 @@ class CleanupService:
             gitea_service = GiteaService(self.session)
 
             if delete_database_course:
-                self.session.delete(self.course)
-                self.session.commit()
+                await self.session.delete(self.course)
+                await self.session.commit()
             
             if delete_gitea_organization:
                 instructor_organization_name = CourseService._compute_instructor_gitea_organization_name(self.course.name)
                 await gitea_service.delete_organization(instructor_organization_name, purge=True)
 
     class User:
-        def __init__(self, session: Session, user: UserModel, autogen_password: str | None = None):
+        def __init__(self, session: AsyncSession, user: UserModel, autogen_password: str | None = None):
             self.session = session
             self.user = user
             self.autogen_password = autogen_password
@@ -42,8 +42,8 @@ class CleanupService:
 
             course = await CourseService(self.session).get_course()
             if delete_database_user:
-                self.session.delete(self.user)
-                self.session.commit()
+                await self.session.delete(self.user)
+                await self.session.commit()
 
             if delete_password_secret:
                 KubernetesService().delete_credential_secret(course.name, self.user.onyen)
@@ -1,5 +1,6 @@
 from app.core.config import settings
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
 from app.events import dispatch
 from app.models import CourseModel
@@ -8,12 +9,12 @@ from app.events import CreateCourseCrudEvent, ModifyCourseCrudEvent
 from app.core.exceptions import MultipleCoursesExistException, NoCourseExistsException, CourseAlreadyExistsException
 
 class CourseService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
     
     async def get_course(self) -> CourseModel:
         try:
-            return self.session.query(CourseModel).one()
+            return (await self.session.scalars(select(CourseModel))).one()
         except MultipleResultsFound as e:
             raise MultipleCoursesExistException()
         except NoResultFound as e:
@@ -52,7 +53,7 @@ class CourseService:
         )
 
         self.session.add(course)
-        self.session.commit()
+        await self.session.commit()
 
         gitea_service = GiteaService(self.session)
         cleanup_service = CleanupService.Course(self.session, course)
@@ -95,7 +96,7 @@ class CourseService:
             )
             print("SET CLASS MASTER REPO HOOK")
             course.master_remote_url = master_remote_url
-            self.session.commit()
+            await self.session.commit()
             
         except Exception as e:
             await cleanup_service.undo_create_course(delete_database_course=True, delete_gitea_organization=True)
@@ -103,7 +104,7 @@ class CourseService:
             raise e
         
         course.master_remote_url = master_remote_url
-        self.session.commit()
+        await self.session.commit()
 
         dispatch(CreateCourseCrudEvent(course=course))
         print("DONE CREATING COURSE")
@@ -119,7 +120,7 @@ class CourseService:
         if "master_remote_url" in update_fields:
             course.master_remote_url = update_fields["master_remote_url"]
 
-        self.session.commit()
+        await self.session.commit()
 
         dispatch(ModifyCourseCrudEvent(course=course, modified_fields=list(update_fields.keys())))
 
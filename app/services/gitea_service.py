@@ -1,18 +1,41 @@
-from typing import List, Optional
+import os
+import re
+import shlex
+import asyncio
+import hashlib
+import tempfile
+from typing import List, Optional, BinaryIO, AsyncIterator
 from enum import Enum
-from io import BytesIO
+from pathlib import Path
 from math import ceil
 from datetime import datetime
 from dateutil import tz
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.core.http_clients import http_clients
 from app.services import AssignmentService
+from app.models import AssignmentModel, GitHookModel
 from app.schemas import CommitSchema
-from app.core.utils.header import parse_content_disposition_header
+from app.core.utils.disk_cache import DiskLRUCache
 import httpx
 import base64
 
+# Archives of commits never change, so they're kept on disk and shared by downloads and grading.
+archive_cache = DiskLRUCache(
+    Path(settings.CACHE_DIRECTORY) / "archives",
+    settings.ARCHIVE_CACHE_MAX_BYTES
+)
+
+COMMIT_ID_PATTERN = re.compile(r"^([0-9a-f]{40}|[0-9a-f]{64})$")
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+# A glob's wildcards and bracket expressions (which may start with `]`, or contain classes like `[:digit:]`)
+GLOB_TOKEN_PATTERN = re.compile(r"(\*|\?|\[[!^]?\]?(?:\[:[a-z]+:\]|[^\]])*\])")
+# Characters that can be left unquoted inside a bracket expression
+GLOB_BRACKET_SAFE_PATTERN = re.compile(r"[A-Za-z0-9_.,:/!^+=@%\[\]-]")
+
 class FileOperationType(str, Enum):
     CREATE = "create"
     UPDATE = "update"
@@ -33,16 +56,14 @@ class CollaboratorPermission(str, Enum):
     ADMIN = "admin"
 
 class GiteaService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
-        self.client = httpx.AsyncClient(
-            base_url=f"{ self.api_url }",
-            headers={
-                "User-Agent": f"eduhelx_grader_api",
-                "Authorization": f"Bearer { settings.GITEA_ASSIST_AUTH_TOKEN }"
-            },
-            timeout=httpx.Timeout(10)
-        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return http_clients.get("gitea", self.api_url, {
+            "Authorization": f"Bearer { settings.GITEA_ASSIST_AUTH_TOKEN }"
+        })
 
     @property
     def api_url(self) -> str:
@@ -60,6 +81,26 @@ class GiteaService:
         res.raise_for_status()
         return res
 
+    """ Sends the request without reading the response body. The caller must close the response. """
+    async def _stream_request(self, method: str, endpoint: str, headers={}, **kwargs) -> httpx.Response:
+        req = self.client.build_request(
+            method,
+            endpoint,
+            headers={
+                **headers
+            },
+            **kwargs
+        )
+        res = await self.client.send(req, stream=True)
+        try:
+            res.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            # Read the (error) body so it's available to error handlers, then release the connection.
+            await res.aread()
+            await res.aclose()
+            raise e
+        return res
+
     async def _get(self, endpoint: str, **kwargs):
         return await self._make_request("GET", endpoint, **kwargs)
 
@@ -203,25 +244,117 @@ class GiteaService:
         new_remote_url = res.text
         return new_remote_url
     
-    """ Returns a zipped archive of the branch/commit as a byte stream """
+    """
+    Returns a zipped archive of the branch/commit as an open file, which the caller must close.
+    Archives of commits are served from the local archive cache when possible. Otherwise, the
+    archive is streamed to disk rather than held in memory.
+    """
     async def download_repository(
         self,
         name: str,
         owner: str,
         treeish_id: str,
         path: str | None = None
-    ) -> BytesIO:
-        res = await self._get("/repos/download", params={
+    ) -> BinaryIO:
+        # Branches and tags move, so only archives of full commit ids can be cached.
+        cacheable = COMMIT_ID_PATTERN.match(treeish_id) is not None
+        if cacheable:
+            cache_key = DiskLRUCache.make_key(owner, name, treeish_id, path or "")
+            cached_archive = archive_cache.open(cache_key)
+            if cached_archive is not None:
+                return cached_archive
+
+        res = await self.stream_repository(name, owner, treeish_id, path)
+        try:
+            if cacheable:
+                with archive_cache.writer(cache_key) as archive:
+                    async for chunk in res.aiter_bytes():
+                        archive.write(chunk)
+            else:
+                archive = tempfile.TemporaryFile()
+                try:
+                    async for chunk in res.aiter_bytes():
+                        archive.write(chunk)
+                except BaseException as e:
+                    archive.close()
+                    raise e
+        finally:
+            await res.aclose()
+        archive.seek(0)
+        return archive
+
+    """
+    Like `download_repository`, but yields the archive chunk by chunk as soon as it arrives rather than once
+    all of it has been fetched. On a cache miss, the archive is written to the cache as it's forwarded, and
+    only stored once it has been forwarded in full. Also returns the size of the archive if it was cached.
+    Upstream errors are raised before the first chunk.
+    """
+    async def stream_repository_archive(
+        self,
+        name: str,
+        owner: str,
+        treeish_id: str,
+        path: str | None = None
+    ) -> tuple[AsyncIterator[bytes], int | None]:
+        cacheable = COMMIT_ID_PATTERN.match(treeish_id) is not None
+        if cacheable:
+            cache_key = DiskLRUCache.make_key(owner, name, treeish_id, path or "")
+            cached_archive = archive_cache.open(cache_key)
+            if cached_archive is not None:
+                size = os.fstat(cached_archive.fileno()).st_size
+                return self._read_cached_archive(cached_archive), size
+
+        res = await self.stream_repository(name, owner, treeish_id, path)
+        if cacheable:
+            return self._tee_archive(res, cache_key), None
+        return self._forward_archive(res), None
+
+    @staticmethod
+    async def _read_cached_archive(archive: BinaryIO) -> AsyncIterator[bytes]:
+        try:
+            while chunk := await asyncio.to_thread(archive.read, ARCHIVE_CHUNK_SIZE):
+                yield chunk
+        finally:
+            archive.close()
+
+    @staticmethod
+    async def _tee_archive(res: httpx.Response, cache_key: str) -> AsyncIterator[bytes]:
+        try:
+            # If forwarding stops early (e.g. the client disconnects), the partial entry is discarded.
+            with archive_cache.writer(cache_key) as archive:
+                async for chunk in res.aiter_bytes():
+                    archive.write(chunk)
+                    yield chunk
+            archive.close()
+        finally:
+            await res.aclose()
+
+    @staticmethod
+    async def _forward_archive(res: httpx.Response) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in res.aiter_bytes():
+                yield chunk
+        finally:
+            await res.aclose()
+    
+    """
+    Returns the response of a zipped archive of the branch/commit without reading its body,
+    so that the archive can be forwarded chunk by chunk (`res.aiter_bytes()`) instead of held in memory.
+    The caller must close the response (`res.aclose()`).
+    """
+    async def stream_repository(
+        self,
+        name: str,
+        owner: str,
+        treeish_id: str,
+        path: str | None = None
+    ) -> httpx.Response:
+        return await self._stream_request("GET", "/repos/download", params={
             "name": name,
             "owner": owner,
             "treeish_id": treeish_id,
             "path": path
         })
-        content_disposition = res.headers.get("Content-Disposition")
-        file_name = parse_content_disposition_header(content_disposition)[1].get("filename")
-        file_stream = BytesIO(res.content)
-        file_stream.name = file_name
-        return file_stream
     
     async def get_commits(
         self,
@@ -298,10 +431,59 @@ class GiteaService:
             "content": hook_content
         })
 
+        statement = insert(GitHookModel).values(
+            owner=owner,
+            repository_name=repository_name,
+            hook_id=hook_id,
+            content_hash=self._get_hook_content_hash(hook_content)
+        )
+        await self.session.execute(statement.on_conflict_do_update(
+            index_elements=[GitHookModel.owner, GitHookModel.repository_name, GitHookModel.hook_id],
+            set_={
+                "content_hash": statement.excluded.content_hash,
+                "last_modified_date": func.current_timestamp()
+            }
+        ))
+        await self.session.commit()
+
+    """ Sets the hook, unless it was last set to the same content. Returns whether it was set. """
+    async def set_git_hook_if_changed(
+        self,
+        repository_name: str,
+        owner: str,
+        hook_id: str,
+        hook_content: str
+    ) -> bool:
+        hook = await self.session.scalar(
+            select(GitHookModel)
+            .filter_by(owner=owner, repository_name=repository_name, hook_id=hook_id)
+        )
+        if hook is not None and hook.content_hash == self._get_hook_content_hash(hook_content):
+            return False
+        await self.set_git_hook(repository_name, owner, hook_id, hook_content)
+        return True
+
+    @staticmethod
+    def _get_hook_content_hash(hook_content: str) -> str:
+        return hashlib.sha256(hook_content.encode()).hexdigest()
+
+    """ Regenerates the pre-receive hook of the class master repository, and sets it if it changed. """
+    async def update_master_repo_prereceive_hook(self) -> bool:
+        from app.services import CourseService
+
+        course_service = CourseService(self.session)
+        return await self.set_git_hook_if_changed(
+            repository_name=await course_service.get_master_repository_name(),
+            owner=await course_service.get_instructor_gitea_organization_name(),
+            hook_id="pre-receive",
+            hook_content=await self.get_master_repo_prereceive_hook()
+        )
+
     async def get_master_repo_prereceive_hook(self) -> str:
+        assignments = await AssignmentService(self.session).get_assignments()
         prereceive_hooks = {
-            "reject_protected": await self.get_reject_protected_files_hook(),
-            "merge_control": await self.get_merge_control_hook()
+            "reject_protected": await self.get_reject_protected_files_hook(assignments),
+            "merge_control": await self.get_merge_control_hook(assignments)
         }
         return self._create_combined_hook_script(prereceive_hooks)
 
@@ -310,25 +492,21 @@ class GiteaService:
     It is used so that we don't need to edit the gitignore (which the professor may change themselves).
     It is only used within the class master repository.
     """
-    async def get_reject_protected_files_hook(self) -> str:
+    async def get_reject_protected_files_hook(self, assignments: list[AssignmentModel] | None = None) -> str:
         assignment_service = AssignmentService(self.session)
         
-        assignments = await assignment_service.get_assignments()
-        protected_file_paths = []
+        if assignments is None: assignments = await assignment_service.get_assignments()
+        protected_globs = {}
         for assignment in assignments:
-            protected_file_paths += [
-                f"{ assignment.directory_path }/{ file }"
-                for file in await assignment_service.get_protected_files(assignment)
-            ]
+            directory_path = assignment.directory_path.strip("/")
+            protected_globs.setdefault(directory_path, [])
+            protected_globs[directory_path] += await assignment_service.get_protected_files(assignment)
 
-        init_protected_file_paths = "\n".join([
-            f'protected_file_paths+=("{ path }")' for path in protected_file_paths
-        ])
+        init_protected_globs = self._create_assignment_glob_matchers("protected_ids", "is_protected", protected_globs)
         return f"""#!/bin/bash
 z40=0000000000000000000000000000000000000000
 declare -a violations
-declare -a protected_file_paths
-{ init_protected_file_paths }
+{ init_protected_globs }
 while read oldrev newrev refname; do
     if [ $oldrev == $z40 ]; then
         # Commit being pushed is for a new branch, use empty tree SHA
@@ -337,9 +515,14 @@ while read oldrev newrev refname; do
     # Iterate over files that have been modified between the old and new revisions
     created_files=$(git diff --name-only --diff-filter=A $oldrev $newrev)
     while IFS= read -r file; do
-        for protected_file in "${{protected_file_paths[@]}}"; do
-            if [[ $file == $protected_file ]]; then
+        # Only check the file against the assignments it's in, i.e. look up each of its parent directories.
+        directory="$file"
+        while [[ "$directory" == */* ]]; do
+            directory="${{directory%/*}}"
+            id="${{protected_ids[$directory]}}"
+            if [ -n "$id" ] && is_protected_$id "${{file#"$directory"/}}"; then
                 violations+=("$file")
+                break
             fi
         done
     done <<< "$created_files"
@@ -358,51 +541,40 @@ fi
     This hook enforces our merge control policy on assignments.
     It is only used within the class master repository.
     """
-    async def get_merge_control_hook(self) -> str:
+    async def get_merge_control_hook(self, assignments: list[AssignmentModel] | None = None) -> str:
         assignment_service = AssignmentService(self.session)
 
-        assignments = await assignment_service.get_assignments()
+        if assignments is None: assignments = await assignment_service.get_assignments()
         
-        init_overwritable_patterns = []
-        for assignment in assignments:
-            overwritable_patterns = await assignment_service.get_overwritable_files(assignment)
-            for pattern in overwritable_patterns:
-                declaration = f'overwritable_patterns+=("{ assignment.directory_path }/{ pattern }")'
-                init_overwritable_patterns.append(declaration)
-        init_overwritable_patterns = "\n".join(init_overwritable_patterns)
-
-        init_assignments_assoc = []
+        overwritable_globs = {}
+        opened_timestamps = {}
         for assignment in assignments:
             if assignment.available_date is not None and assignment.due_date is not None:
-                # Until HLXK-265, merge control policy is ALWAYS active.
-                earliest_datetime = datetime.now(tz.UTC)
+                directory_path = assignment.directory_path.strip("/")
+                # Until HLXK-265, merge control policy is ALWAYS active, i.e. since the assignment was created.
+                # (Rather than since the hook was generated, so that regenerating an unchanged hook yields the same content.)
+                earliest_datetime = assignment.created_date or datetime.now(tz.UTC)
                 # earliest_datetime = await assignment_service.get_earliest_available_date(assignment)
-                declaration = f'assignments["{ assignment.directory_path }"]'
-                value=ceil(earliest_datetime.timestamp())
-                init_assignments_assoc.append(f"{ declaration }={ value }")
-        init_assignments_assoc = "\n".join(init_assignments_assoc)
+                timestamp = ceil(earliest_datetime.timestamp())
+                opened_timestamps[directory_path] = min(timestamp, opened_timestamps.get(directory_path, timestamp))
+                overwritable_globs.setdefault(directory_path, [])
+                overwritable_globs[directory_path] += await assignment_service.get_overwritable_files(assignment)
+
+        init_overwritable_globs = self._create_assignment_glob_matchers("overwritable_ids", "is_overwritable", overwritable_globs)
+        # Indexed by the same IDs as the matchers.
+        init_opened_timestamps = "\n".join([
+            f"    { timestamp }" for timestamp in opened_timestamps.values()
+        ])
         
         return f"""#!/bin/bash
 z40=0000000000000000000000000000000000000000
 # Epoch time
 current_timestamp=$(date -u +%s)
 declare -a violations
-declare -a overwritable_patterns
-declare -A assignments
-{ init_overwritable_patterns }
-{ init_assignments_assoc }
-
-function is_overwritable() {{
-    local file="$1"
-
-    for glob in "${{overwritable_patterns[@]}}"; do
-        if [[ "$file" == $glob ]]; then
-            return 0
-        fi
-    done
-
-    return 1
-}}
+{ init_overwritable_globs }
+declare -a opened_timestamps=(
+{ init_opened_timestamps }
+)
 
 while read oldrev newrev refname; do
     if [ $oldrev == $z40 ]; then
@@ -412,13 +584,16 @@ while read oldrev newrev refname; do
     # Iterate over files that have been modified between the old and new revisions
     modified_files=$(git diff --name-only --diff-filter=MD $oldrev $newrev)
     while IFS= read -r file; do
-        for directory_path in "${{!assignments[@]}}"; do
-            if [[ "${{file}}" == "${{directory_path}}"* ]]; then
-                # Assignment has already opened to some students, so can't modify this file, unless overwritable.
-                if [ "${{current_timestamp}}" -gt "${{assignments[$directory_path]}}" ]; then
-                    if ! is_overwritable "$file"; then
-                        violations+=("$file")
-                    fi
+        # Only check the file against the assignments it's in, i.e. look up each of its parent directories.
+        directory="$file"
+        while [[ "$directory" == */* ]]; do
+            directory="${{directory%/*}}"
+            id="${{overwritable_ids[$directory]}}"
+            # Assignment has already opened to some students, so can't modify this file, unless overwritable.
+            if [ -n "$id" ] && [ "$current_timestamp" -gt "${{opened_timestamps[$id]}}" ]; then
+                if ! is_overwritable_$id "${{file#"$directory"/}}"; then
+                    violations+=("$file")
+                    break
                 fi
             fi
         done
@@ -433,44 +608,88 @@ if [ ${{#violations[@]}} -gt 0 ]; then
     exit 1
 fi
 """
+
+    """
+    Emits bash that maps each assignment directory to an ID in the associative array `ids_name`, and defines
+    a function `{function_name}_{id}` that tests whether a path relative to that directory matches any of its globs.
+    Looking up a file's directories in the array makes the cost of checking it independent of the number of assignments.
+    """
+    @classmethod
+    def _create_assignment_glob_matchers(cls, ids_name: str, function_name: str, globs_by_directory: dict[str, list[str]]) -> str:
+        init_ids = []
+        matchers = []
+        for id, (directory_path, globs) in enumerate(globs_by_directory.items()):
+            init_ids.append(f"    [{ shlex.quote(directory_path) }]={ id }")
+            if len(globs) > 0:
+                cases = "|".join([cls._quote_glob(glob) for glob in globs])
+                matchers.append(f"""function { function_name }_{ id }() {{
+    case "$1" in
+        { cases }) return 0 ;;
+    esac
+    return 1
+}}""")
+            else:
+                matchers.append(f"function { function_name }_{ id }() {{ return 1; }}")
+        init_ids = "\n".join(init_ids)
+        matchers = "\n".join(matchers)
+        return f"""declare -A { ids_name }=(
+{ init_ids }
+)
+{ matchers }"""
+
+    """
+    Quotes everything in the glob except its wildcards and bracket expressions (e.g. `[a-z]`, `[!0-9]` or
+    `[[:digit:]]`), so that file names can't be interpreted as bash but the glob still matches as it would in `[[ ]]`.
+    Characters inside a bracket expression that bash would interpret are quoted individually, which keeps them
+    as members of the expression. A `[` that isn't closed is matched literally.
+    """
+    @classmethod
+    def _quote_glob(cls, glob: str) -> str:
+        quoted = []
+        for part in re.split(GLOB_TOKEN_PATTERN, glob):
+            if part == "": continue
+            if part in ("*", "?"):
+                quoted.append(part)
+            elif re.fullmatch(GLOB_TOKEN_PATTERN, part):
+                quoted.append("[" + "".join([
+                    char if re.fullmatch(GLOB_BRACKET_SAFE_PATTERN, char) else shlex.quote(char)
+                    for char in part[1:-1]
+                ]) + "]")
+            else:
+                quoted.append(shlex.quote(part))
+        return "".join(quoted)
     
     """ Utility for combining multiple scripts for a single hook type into a
     single, unified script (gitea only allows 1 script per hook type).
+    Each script is run as a function of the combined script, rather than being written out to a file and executed.
     """
     def _create_combined_hook_script(self, scripts: dict[str, str]) -> str:
-        template = "$(cat <<'EOF'\n{}\nEOF\n)"
-        init_hook_scripts = "\n".join([
-            f'hook_scripts["{ name }"]={ template.format(hook) }'
+        function_names = {
+            name: "hook_" + re.sub(r"\W", "_", name) for name in scripts
+        }
+        # The scripts' shebangs become comments. Each function runs in its own subshell (via the command substitution),
+        # so the scripts can still `exit`, and their variables don't leak into each other.
+        init_hook_functions = "\n".join([
+            f"function { function_names[name] }() {{\n{ hook }\n}}"
             for name, hook in scripts.items()
         ])
+        run_hook_functions = "\n".join([
+            f"run_hook { function_name }" for function_name in function_names.values()
+        ])
         return f"""#!/bin/bash
-declare -A hook_scripts
-{ init_hook_scripts }
+{ init_hook_functions }
 
 stdin=$(cat /dev/stdin)
-for name in "${{!hook_scripts[@]}}"; do
-    hook="${{hook_scripts[$name]}}"
-    tmpfile=$(mktemp)
-
-    if [[ $? -ne 0 ]]; then
-        echo "Failed to create temp file"
-        exit 1
-    fi
 
-    # In case the script exits unexpectedly, still want to cleanup.
-    trap 'rm -f "$tmpfile"' SIGTERM SIGINT EXIT
-
-    echo "$hook" > "$tmpfile"
-    chmod +x "$tmpfile"
-    # Execute the hook
-    output=$(echo $stdin | "$tmpfile" 2>&1)
+function run_hook() {{
+    output=$("$1" <<< "$stdin" 2>&1)
     exit_code=$?
-    
-    rm -f "$tmpfile"
 
     if [ $exit_code -ne 0 ]; then
         echo "$output"
         exit $exit_code
     fi
-done
-"""
\ No newline at end of file
+}}
+
+{ run_hook_functions }
+"""
@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import numpy as np
+from datetime import timedelta
+from sqlalchemy import select, update, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.core.config import settings
+from app.core.exceptions import AutogradingDisabledException, GradingJobNotFoundException
+from app.database import AsyncSessionLocal
+from app.enums.grading_job_status import GradingJobStatus, SubmissionGradingStatus
+from app.models import AssignmentModel, SubmissionModel, GradeReportModel, GradingJobModel, GradingJobSubmissionModel
+from app.schemas import (
+    GradingJobSchema, GradingJobSubmissionSchema, ScoreDistributionSchema,
+    GradeReportSchema, SubmissionGradeSchema
+)
+from app.services import GradingService
+
+logger = logging.getLogger(__name__)
+
+# Keep references to running jobs so they aren't garbage collected mid-run.
+_grading_job_tasks: set[asyncio.Task] = set()
+# Keep a reference to the periodic resume so it isn't garbage collected.
+_resume_grading_jobs_tasks: set[asyncio.Task] = set()
+
+class GradingJobService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create_grading_job(
+        self,
+        assignment: AssignmentModel,
+        master_notebook_content: str,
+        otter_config_content: str
+    ) -> GradingJobModel:
+        if assignment.manual_grading:
+            raise AutogradingDisabledException()
+
+        # The submissions are pinned when the job is enqueued, not when it starts running.
+        submissions = await GradingService(self.session).compute_submissions_at_moment(assignment)
+
+        job = GradingJobModel(
+            assignment_id=assignment.id,
+            status=GradingJobStatus.QUEUED,
+            master_notebook_content=master_notebook_content,
+            otter_config_content=otter_config_content,
+            submissions=[
+                GradingJobSubmissionModel(submission=submission, status=SubmissionGradingStatus.QUEUED)
+                for submission in submissions
+            ]
+        )
+        self.session.add(job)
+        await self.session.commit()
+
+        return job
+
+    async def get_grading_job_by_id(self, id: int) -> GradingJobModel:
+        job = await self.session.scalar(
+            select(GradingJobModel)
+            .options(*self._get_load_options())
+            .filter_by(id=id)
+        )
+        if job is None:
+            raise GradingJobNotFoundException()
+        return job
+
+    async def list_grading_jobs(self, assignment: AssignmentModel) -> list[GradingJobModel]:
+        return (await self.session.scalars(
+            select(GradingJobModel)
+            .options(*self._get_load_options())
+            .filter_by(assignment_id=assignment.id)
+            .order_by(GradingJobModel.created_date.desc())
+        )).all()
+
+    async def get_grading_job_schema(self, job: GradingJobModel) -> GradingJobSchema:
+        scores = [row.score for row in job.submissions if row.score is not None]
+        score_distribution = ScoreDistributionSchema(
+            count=len(scores),
+            average=float(np.mean(scores)) if scores else None,
+            median=float(np.median(scores)) if scores else None,
+            minimum=min(scores) if scores else None,
+            maximum=max(scores) if scores else None,
+            stdev=float(np.std(scores)) if scores else None
+        )
+        return GradingJobSchema(
+            id=job.id,
+            assignment_id=job.assignment_id,
+            status=job.status,
+            error=job.error,
+            created_date=job.created_date,
+            started_date=job.started_date,
+            finished_date=job.finished_date,
+            last_updated_date=job.last_updated_date,
+            submissions=[
+                GradingJobSubmissionSchema(
+                    submission_id=row.submission_id,
+                    student_onyen=row.submission.student.onyen,
+                    status=row.status,
+                    score=row.score,
+                    total_points=row.total_points,
+                    error=row.error,
+                    last_updated_date=row.last_updated_date
+                ) for row in job.submissions
+            ],
+            score_distribution=score_distribution,
+            grade_report=GradeReportSchema.from_orm(job.grade_report) if job.grade_report is not None else None
+        )
+
+    """ Everything a job's schema and execution need, loaded up front since it can't be lazily loaded later. """
+    @staticmethod
+    def _get_load_options() -> list:
+        return [
+            selectinload(GradingJobModel.assignment),
+            selectinload(GradingJobModel.grade_report),
+            selectinload(GradingJobModel.submissions)
+                .joinedload(GradingJobSubmissionModel.submission)
+                .joinedload(SubmissionModel.student)
+        ]
+
+    """ Runs the job in the background of the current event loop, using its own database session. """
+    @staticmethod
+    def start_grading_job(job_id: int) -> None:
+        task = asyncio.create_task(GradingJobService._run_grading_job(job_id))
+        _grading_job_tasks.add(task)
+        task.add_done_callback(_grading_job_tasks.discard)
+
+    """ Picks back up any jobs that are queued, or were left running by a worker that has since gone away. """
+    @staticmethod
+    async def resume_grading_jobs() -> None:
+        async with AsyncSessionLocal() as session:
+            job_ids = (await session.scalars(
+                select(GradingJobModel.id)
+                .filter(GradingJobService._is_claimable())
+                .order_by(GradingJobModel.created_date)
+            )).all()
+        for job_id in job_ids:
+            GradingJobService.start_grading_job(job_id)
+
+    """
+    Resumes grading jobs now, and then every GRADING_JOB_HEARTBEAT_SECONDS in the background of the current event loop.
+    A job that was running when its worker restarted isn't claimable until its heartbeat goes stale, which may well be
+    after startup, so it's resumed by a later pass.
+    """
+    @staticmethod
+    def start_periodic_resume() -> None:
+        task = asyncio.create_task(GradingJobService._run_periodic_resume())
+        _resume_grading_jobs_tasks.add(task)
+        task.add_done_callback(_resume_grading_jobs_tasks.discard)
+
+    @staticmethod
+    async def stop_periodic_resume() -> None:
+        tasks = list(_resume_grading_jobs_tasks)
+        for task in tasks: task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def _run_periodic_resume() -> None:
+        while True:
+            try:
+                await GradingJobService.resume_grading_jobs()
+            except Exception:
+                logger.exception("could not resume grading jobs")
+            await asyncio.sleep(settings.GRADING_JOB_HEARTBEAT_SECONDS)
+
+    @staticmethod
+    async def _run_grading_job(job_id: int) -> None:
+        async with AsyncSessionLocal() as session:
+            grading_job_service = GradingJobService(session)
+            if not await grading_job_service._claim_grading_job(job_id):
+                # Another worker is already running the job, or it has finished.
+                return
+
+            job = await grading_job_service.get_grading_job_by_id(job_id)
+            heartbeat = asyncio.create_task(GradingJobService._heartbeat(job.id))
+            try:
+                await grading_job_service._execute_grading_job(job)
+            except Exception as e:
+                logger.exception(f"grading job { job_id } failed")
+                await GradingJobService._fail_grading_job(job_id, str(e))
+            finally:
+                heartbeat.cancel()
+
+    """ Uses its own session, since the job's session may be unusable after whatever made the job fail. """
+    @staticmethod
+    async def _fail_grading_job(job_id: int, error: str) -> None:
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(GradingJobModel)
+                .filter(GradingJobModel.id == job_id)
+                .values({
+                    GradingJobModel.status: GradingJobStatus.FAILED,
+                    GradingJobModel.error: error,
+                    GradingJobModel.finished_date: func.current_timestamp(),
+                    GradingJobModel.last_updated_date: func.current_timestamp()
+                })
+            )
+            await session.commit()
+
+    """ A running job can only be claimed once its heartbeat has gone stale, i.e. the worker running it has died. """
+    @staticmethod
+    def _is_claimable():
+        stale_date = func.current_timestamp() - timedelta(seconds=settings.GRADING_JOB_STALE_SECONDS)
+        return or_(
+            GradingJobModel.status == GradingJobStatus.QUEUED,
+            and_(GradingJobModel.status == GradingJobStatus.RUNNING, GradingJobModel.last_updated_date < stale_date)
+        )
+
+    """ Atomically marks the job as running, if it's claimable. """
+    async def _claim_grading_job(self, job_id: int) -> bool:
+        claimed = await self.session.execute(
+            update(GradingJobModel)
+            .filter(GradingJobModel.id == job_id)
+            .filter(GradingJobService._is_claimable())
+            .values({
+                GradingJobModel.status: GradingJobStatus.RUNNING,
+                GradingJobModel.started_date: func.coalesce(GradingJobModel.started_date, func.current_timestamp()),
+                GradingJobModel.last_updated_date: func.current_timestamp()
+            })
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+        return claimed.rowcount == 1
+
+    """ Runs alongside the job in its own session, since the job's session can't be used by two tasks at once. """
+    @staticmethod
+    async def _heartbeat(job_id: int) -> None:
+        while True:
+            await asyncio.sleep(settings.GRADING_JOB_HEARTBEAT_SECONDS)
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(GradingJobModel)
+                    .filter(GradingJobModel.id == job_id)
+                    .values(last_updated_date=func.current_timestamp())
+                )
+                await session.commit()
+
+    async def _execute_grading_job(self, job: GradingJobModel) -> None:
+        grading_service = GradingService(self.session)
+        assignment = job.assignment
+        rows = { row.submission_id: row for row in job.submissions }
+
+        async def on_progress(
+            submission: SubmissionModel,
+            status: SubmissionGradingStatus,
+            grade: SubmissionGradeSchema | None = None,
+            error: str | None = None
+        ) -> None:
+            row = rows[submission.id]
+            row.status = status
+            if grade is not None:
+                row.score = grade.score
+                row.total_points = grade.total_points
+                row.comments = grade.comments
+            if error is not None:
+                row.error = error
+            row.last_updated_date = func.current_timestamp()
+            job.last_updated_date = func.current_timestamp()
+            await self.session.commit()
+
+        if job.grade_report is None:
+            # If the job is being resumed, submissions that were already graded keep their grades.
+            pending_rows = [row for row in job.submissions if row.status in (
+                SubmissionGradingStatus.QUEUED,
+                SubmissionGradingStatus.DOWNLOADING,
+                SubmissionGradingStatus.GRADING
+            )]
+            for row in pending_rows:
+                row.status = SubmissionGradingStatus.QUEUED
+            await self.session.commit()
+
+            await grading_service.autograde_submissions(
+                [row.submission for row in pending_rows],
+                job.master_notebook_content,
+                job.otter_config_content,
+                on_progress=on_progress
+            )
+
+            grade_report = GradeReportModel.from_submission_grades(
+                assignment=assignment,
+                submission_grades=[grade for grade in self._get_submission_grades(job).values()],
+                master_notebook_content=job.master_notebook_content,
+                otter_config_content=job.otter_config_content
+            )
+            self.session.add(grade_report)
+            job.grade_report = grade_report
+            await self.session.commit()
+
+        await grading_service.upsync_grade_report(
+            assignment,
+            job.grade_report,
+            {
+                submission: grade for submission, grade in self._get_submission_grades(job).items()
+                if rows[submission.id].status != SubmissionGradingStatus.UPLOADED
+            },
+            on_progress=on_progress
+        )
+
+        job.status = GradingJobStatus.COMPLETED
+        job.finished_date = func.current_timestamp()
+        job.last_updated_date = func.current_timestamp()
+        await self.session.commit()
+
+    @staticmethod
+    def _get_submission_grades(job: GradingJobModel) -> dict[SubmissionModel, SubmissionGradeSchema]:
+        return {
+            row.submission: SubmissionGradeSchema(
+                score=row.score,
+                total_points=row.total_points,
+                comments=row.comments,
+                submission_already_graded=row.submission.graded
+            )
+            for row in job.submissions
+            if row.status in (SubmissionGradingStatus.GRADED, SubmissionGradingStatus.UPLOADED)
+        }
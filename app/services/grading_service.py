@@ -1,59 +1,63 @@
+import os
+import asyncio
 import tempfile
 import zipfile
-import glob
-import json
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Optional, Awaitable, Callable
 from collections import Counter
-from otter.assign import main as otter_assign
-from otter.run import main as otter_run
+from otter import __version__ as otter_version
 from otter.export import export_notebook
 from pydantic import BaseModel
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from io import BytesIO
 from pathlib import Path
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
 from app.core.config import settings, DevPhase
 from app.core.exceptions import (
-    SubmissionNotFoundException, OtterConfigViolationException, AutogradingDisabledException,
+    SubmissionNotFoundException, AutogradingDisabledException,
     StudentGradedMultipleTimesException, SubmissionMismatchException
 )
 from app.core.utils.datetime import get_now_with_tzinfo
-from app.services import StudentService, SubmissionService, CourseService, GiteaService
-from app.models import AssignmentModel, SubmissionModel, GradeReportModel
+from app.core.utils.otter_helper import OtterHelper
+from app.core.utils.process_pool import KillableProcessPool
+from app.core.utils.disk_cache import DiskLRUCache
+from app.enums.grading_job_status import SubmissionGradingStatus
+from app.services import SubmissionService, CourseService, GiteaService
+from app.models import AssignmentModel, SubmissionModel, GradeReportModel, SubmissionGradeResultModel
 from app.schemas import GradeReportSchema, SubmissionGradeSchema, IdentifiableSubmissionGradeSchema
 
+# Called as `on_progress(submission, status, grade=None, error=None)` whenever a submission changes status.
+GradingProgressCallback = Callable[..., Awaitable[None]]
+
+# Generated autograder configs, keyed by everything that goes into generating them.
+otter_config_cache = DiskLRUCache(
+    Path(settings.CACHE_DIRECTORY) / "otter_config",
+    settings.OTTER_CONFIG_CACHE_MAX_BYTES
+)
+
 class GradingService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
+        # Submissions are graded concurrently, but a session can only be used by one of them at a time.
+        self._session_lock = asyncio.Lock()
 
     """ You can retrace which submissions were used to generate a grade report by using its created_date. """
     async def compute_submissions_at_moment(self, assignment: AssignmentModel, moment: datetime | None = None) -> list[SubmissionModel]:
         if moment is None: moment = get_now_with_tzinfo()
 
-        student_service = StudentService(self.session)
-        submission_service = SubmissionService(self.session)
-
-        students = await student_service.list_students()
-        submissions = []
-        for student in students:
-            try:
-                active_submission = await submission_service.get_active_submission(student, assignment, moment)
-                submissions.append(active_submission)
-            except SubmissionNotFoundException:
-                # The student hasn't made a submission
-                pass
-            
-        return submissions
+        return await SubmissionService(self.session).get_active_submissions(assignment, moment)
 
     async def get_student_notebook_upload(self, submission: SubmissionModel, student_notebook_content: bytes) -> BinaryIO:
-        attempt = await SubmissionService(self.session).get_current_submission_attempt(submission.student, submission.assignment)
+        student = await submission.awaitable_attrs.student
+        attempt = await SubmissionService(self.session).get_current_submission_attempt(student, await submission.awaitable_attrs.assignment)
         try:
             # Convert to PDF
             with tempfile.TemporaryDirectory() as temp_dir:
                 temp_dir = Path(temp_dir)
                 student_notebook_path = temp_dir / "submission.ipynb"
-                student_notebook_pdf_path = temp_dir / f"{ submission.student.onyen }-submission-{ attempt }.pdf"
+                student_notebook_pdf_path = temp_dir / f"{ student.onyen }-submission-{ attempt }.pdf"
                 
                 student_notebook_path.write_bytes(student_notebook_content)
                 export_notebook(student_notebook_path, student_notebook_pdf_path)
@@ -63,54 +67,57 @@ class GradingService:
         except Exception as e:
             print("Couldn't generate PDF of student submission: ", e)
             student_notebook = BytesIO(student_notebook_content)
-            student_notebook.name = f"{ submission.student.onyen }-submission-{ attempt }.ipynb"
+            student_notebook.name = f"{ student.onyen }-submission-{ attempt }.ipynb"
         return student_notebook
     
+    """ Identifies the autograder config generated from these inputs. """
+    @staticmethod
+    def get_config_hash(
+        master_notebook_content: str,
+        otter_config_content: str,
+        requirements_txt_content: str
+    ) -> str:
+        return DiskLRUCache.make_key(otter_version, master_notebook_content, otter_config_content, requirements_txt_content)
+
+    """
+    Returns the final graded notebook and the zip config. Running otter assign is slow, so the result
+    is cached by the content of its inputs and reused as long as none of them change.
+    """
     async def generate_config(
         self,
         master_notebook_content: str,
         otter_config_content: str,
         requirements_txt_content: str
     ) -> tuple[str, bytes]:
-        # The master notebook isn't actually the final revision used for grading
-        # We also need to generate a zip config.
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_dir = Path(temp_dir)
-            master_notebook_path = temp_dir / "master.ipynb"
-            requirements_txt_path = temp_dir / "requirements.txt"
-            config_dir = temp_dir / "otter"
-            autograder_path = config_dir / "autograder"
-
-            with open(master_notebook_path, "w+") as f:
-                f.write(master_notebook_content)
-
-            with open(requirements_txt_path, "w+") as f:
-                f.write(requirements_txt_content)
-
-            otter_assign(master_notebook_path, str(config_dir), no_pdfs=True)
-            
-            zip_config_glob = glob.glob(str(autograder_path / f"{ master_notebook_path.stem }*.zip"))
-            if len(zip_config_glob) == 0:
-                raise OtterConfigViolationException("could not generate/find otterconfig zip for assignment")
-            
-            autograder_notebook_path = autograder_path / master_notebook_path.name
-            zip_config_path = zip_config_glob[0]
-
-            with open(autograder_notebook_path, "r") as f:
-                final_graded_notebook_content = f.read()
-
-            config_zip = BytesIO()
-            # Overwrite the otter_config.json generated inside the zip with the user-supplied config. 
-            with zipfile.ZipFile(zip_config_path, "r") as old_zip:
-                with zipfile.ZipFile(config_zip, "w") as new_zip:
-                    for item in old_zip.infolist():
-                        if item.filename != "otter_config.json":
-                            new_zip.writestr(item, old_zip.read(item.filename))
-                    new_zip.writestr("otter_config.json", otter_config_content)
-
-
-        return final_graded_notebook_content, config_zip.getvalue()
-    
+        cache_key = self.get_config_hash(master_notebook_content, otter_config_content, requirements_txt_content)
+        cached_config = await asyncio.to_thread(otter_config_cache.get, cache_key)
+        if cached_config is not None:
+            with zipfile.ZipFile(BytesIO(cached_config), "r") as entry:
+                return entry.read("graded.ipynb").decode(), entry.read("config.zip")
+
+        # Otter assign takes a while and changes the working directory, so it runs in a worker process
+        # rather than blocking the event loop (and with it, the heartbeats of running grading jobs).
+        pool = KillableProcessPool(1)
+        try:
+            final_graded_notebook_content, config_zip_bytes = await pool.run(
+                None,
+                OtterHelper.generate_config,
+                master_notebook_content,
+                otter_config_content,
+                requirements_txt_content
+            )
+        finally:
+            pool.close()
+
+        cache_entry = BytesIO()
+        # The zip config is already compressed.
+        with zipfile.ZipFile(cache_entry, "w", zipfile.ZIP_STORED) as entry:
+            entry.writestr("graded.ipynb", final_graded_notebook_content)
+            entry.writestr("config.zip", config_zip_bytes)
+        await asyncio.to_thread(otter_config_cache.set, cache_key, cache_entry.getvalue())
+
+        return final_graded_notebook_content, config_zip_bytes
+
     """ Returns path to the loaded submission notebook """
     async def load_submission_archive(
         self,
@@ -118,23 +125,282 @@ class GradingService:
         parent_dir: Path | str
     ) -> tuple[Path, BinaryIO]:
         parent_dir = Path(parent_dir)
+        async with self._session_lock:
+            student = await submission.awaitable_attrs.student
+            assignment = await submission.awaitable_attrs.assignment
+            student_repo_name = await CourseService(self.session).get_student_repository_name(student.onyen)
 
         submission_archive_path = parent_dir / str(submission.id)
-        submission_notebook_path = submission_archive_path / submission.assignment.student_notebook_path
-        student_repo_name = await CourseService(self.session).get_student_repository_name(submission.student.onyen)
-        archive_stream = await GiteaService(self.session).download_repository(
+        submission_notebook_path = submission_archive_path / assignment.student_notebook_path
+        archive = await GiteaService(self.session).download_repository(
             name=student_repo_name,
-            owner=submission.student.onyen,
+            owner=student.onyen,
             treeish_id=submission.commit_id,
-            path=submission.assignment.directory_path
+            path=assignment.directory_path
         )
-        with zipfile.ZipFile(archive_stream, "r") as zip:
+        submission_notebook_content = await asyncio.to_thread(
+            self._extract_submission_archive,
+            archive,
+            submission_archive_path,
+            submission_notebook_path
+        )
+
+        return (submission_notebook_path, submission_notebook_content)
+
+    """ Extracts the archive and returns the content of the submission notebook. Blocks, so it's run in a thread. """
+    @staticmethod
+    def _extract_submission_archive(archive: BinaryIO, submission_archive_path: Path, submission_notebook_path: Path) -> bytes:
+        with archive, zipfile.ZipFile(archive, "r") as zip:
             zip.extractall(submission_archive_path)
 
         with open(submission_notebook_path, "rb") as f:
-            submission_notebook_content = f.read()
+            return f.read()
+
+    """
+    Generates the autograder config and grades the given submissions against it.
+    A submission whose commit was already graded against the same config, as the same assignment, reuses its stored result
+    instead of being graded again, so regrades only run the autograder on submissions that changed.
+    Submissions that fail to download or grade (or time out) are left out of the returned mapping.
+    """
+    async def autograde_submissions(
+        self,
+        submissions: list[SubmissionModel],
+        master_notebook_content: str,
+        otter_config_content: str,
+        requirements_txt_content: str = "otter-grader==5.5.0",
+        *,
+        on_progress: GradingProgressCallback | None = None
+    ) -> dict[SubmissionModel, SubmissionGradeSchema]:
+        if on_progress is None: on_progress = self._ignore_progress
+
+        config_hash = self.get_config_hash(master_notebook_content, otter_config_content, requirements_txt_content)
+        grading_hashes = {
+            submission: self.get_grading_hash(config_hash, await submission.awaitable_attrs.assignment)
+            for submission in submissions
+        }
+        stored_grades = await self.get_stored_submission_grades(grading_hashes)
+        for submission, submission_grade in stored_grades.items():
+            await on_progress(submission, SubmissionGradingStatus.GRADED, grade=submission_grade)
+
+        new_grades = {}
+        ungraded_submissions = [submission for submission in submissions if submission not in stored_grades]
+        if len(ungraded_submissions) > 0:
+            final_graded_notebook_content, zip_config_bytes = await self.generate_config(
+                master_notebook_content,
+                otter_config_content,
+                requirements_txt_content
+            )
 
-        return (submission_notebook_path, submission_notebook_content)
+            with tempfile.TemporaryDirectory() as temp_dir:
+                temp_dir = Path(temp_dir)
+                graded_notebook_path = temp_dir / "graded.ipynb"
+                otter_config_path = temp_dir / "config.zip"
+                with open(graded_notebook_path, "w+") as f:
+                    f.write(final_graded_notebook_content)
+                with open(otter_config_path, "wb+") as f:
+                    f.write(zip_config_bytes)
+
+                results = await self.grade_submissions(ungraded_submissions, otter_config_path, temp_dir, on_progress=on_progress)
+            new_grades = { submission: submission_grade for submission, (submission_grade, _) in results.items() }
+            await self.store_submission_grades(new_grades, grading_hashes)
+
+        # Preserve the order of `submissions`.
+        return {
+            submission: stored_grades[submission] if submission in stored_grades else new_grades[submission]
+            for submission in submissions
+            if submission in stored_grades or submission in new_grades
+        }
+
+    """
+    Identifies a grade: the autograder config it was graded against, and what of the commit was graded.
+    The assignment decides which directory is extracted and which notebook in it is graded.
+    """
+    @staticmethod
+    def get_grading_hash(config_hash: str, assignment: AssignmentModel) -> str:
+        return DiskLRUCache.make_key(config_hash, str(assignment.id), assignment.directory_path, assignment.student_notebook_path)
+
+    """ The stored grades of the given submissions, mapped to their grading hashes. """
+    async def get_stored_submission_grades(
+        self,
+        grading_hashes: dict[SubmissionModel, str]
+    ) -> dict[SubmissionModel, SubmissionGradeSchema]:
+        results = (await self.session.scalars(
+            select(SubmissionGradeResultModel)
+            .filter(SubmissionGradeResultModel.config_hash.in_(set(grading_hashes.values())))
+            .filter(SubmissionGradeResultModel.commit_id.in_([submission.commit_id for submission in grading_hashes]))
+        )).all()
+        results_by_key = { (result.commit_id, result.config_hash): result for result in results }
+
+        stored_grades = {}
+        for submission, grading_hash in grading_hashes.items():
+            result = results_by_key.get((submission.commit_id, grading_hash))
+            if result is None: continue
+            stored_grades[submission] = SubmissionGradeSchema(
+                score=result.score,
+                total_points=result.total_points,
+                comments=result.comments,
+                submission_already_graded=submission.graded
+            )
+        return stored_grades
+
+    async def store_submission_grades(
+        self,
+        submission_grades: dict[SubmissionModel, SubmissionGradeSchema],
+        grading_hashes: dict[SubmissionModel, str]
+    ) -> None:
+        if len(submission_grades) == 0: return
+
+        # Two grading runs may race to store the same result, in which case they're identical anyways.
+        await self.session.execute(
+            insert(SubmissionGradeResultModel)
+                .values([
+                    {
+                        "commit_id": submission.commit_id,
+                        "config_hash": grading_hashes[submission],
+                        "score": submission_grade.score,
+                        "total_points": submission_grade.total_points,
+                        "comments": submission_grade.comments,
+                        "assignment_id": submission.assignment_id
+                    } for submission, submission_grade in submission_grades.items()
+                ])
+                .on_conflict_do_nothing(index_elements=["commit_id", "config_hash"])
+        )
+        await self.session.commit()
+
+    """
+    Grades submissions concurrently, running otter in a bounded pool of worker processes.
+    Submissions that fail to download or grade (or time out) are left out of the returned mapping.
+    """
+    async def grade_submissions(
+        self,
+        submissions: list[SubmissionModel],
+        otter_config_path: Path,
+        parent_dir: Path,
+        *,
+        on_progress: GradingProgressCallback | None = None
+    ) -> dict[SubmissionModel, tuple[SubmissionGradeSchema, bytes]]:
+        if on_progress is None: on_progress = self._ignore_progress
+        on_progress = self._serialize_progress(on_progress)
+
+        max_workers = max(1, min(settings.GRADING_MAX_WORKERS or os.cpu_count() or 1, len(submissions)))
+        # Downloads are bounded as well so that archives aren't fetched much faster than otter can grade them.
+        semaphore = asyncio.Semaphore(max_workers)
+        pool = KillableProcessPool(max_workers)
+
+        tasks = [
+            asyncio.create_task(self._grade_submission(submission, otter_config_path, parent_dir, pool, semaphore, on_progress))
+            for submission in submissions
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except Exception as e:
+            for task in tasks: task.cancel()
+            raise e
+        finally:
+            # Don't leave hung workers behind if grading was cancelled or failed.
+            pool.close()
+
+        # Preserve the order of `submissions`.
+        return {
+            submission: result
+            for submission, result in zip(submissions, results)
+            if result is not None
+        }
+
+    async def _grade_submission(
+        self,
+        submission: SubmissionModel,
+        otter_config_path: Path,
+        parent_dir: Path,
+        pool: KillableProcessPool,
+        semaphore: asyncio.Semaphore,
+        on_progress: GradingProgressCallback
+    ) -> tuple[SubmissionGradeSchema, bytes] | None:
+        async with semaphore:
+            try:
+                await on_progress(submission, SubmissionGradingStatus.DOWNLOADING)
+                (submission_notebook_path, student_notebook_content) = await self.load_submission_archive(submission, parent_dir)
+                submission_graded_path = parent_dir / f"{ submission.id }-graded.json"
+
+                await on_progress(submission, SubmissionGradingStatus.GRADING)
+                grade_data = await pool.run(
+                    settings.GRADING_SUBMISSION_TIMEOUT_SECONDS,
+                    OtterHelper.run_autograder,
+                    str(submission_notebook_path),
+                    str(otter_config_path),
+                    str(submission_graded_path),
+                    settings.DEV_PHASE == DevPhase.DEV
+                )
+            except Exception as e:
+                print(f"could not grade submission { submission.id }: { str(e) }")
+                await on_progress(submission, SubmissionGradingStatus.FAILED, error=str(e))
+                return None
+
+        tests = [test for test in grade_data["tests"] if "score" in test]
+        public_tests = [test for test in grade_data["tests"] if "score" not in test]
+        public_test_comments = "\n".join([test["output"] for test in public_tests])
+
+        score = sum([question["score"] for question in tests])
+        max_score = sum([question["max_score"] for question in tests])
+
+        submission_grade = SubmissionGradeSchema(
+            score=score,
+            total_points=max_score,
+            comments=public_test_comments,
+            submission_already_graded=submission.graded
+        )
+        await on_progress(submission, SubmissionGradingStatus.GRADED, grade=submission_grade)
+        return (submission_grade, student_notebook_content)
+    
+    """
+    Uploads the grades of a persisted grade report to the LMS in bulk. Submissions whose grades fail
+    to upload are reported (and returned with their errors) without stopping the others. If the upload
+    fails outright, the grade report is deleted and the exception is reraised.
+    Already graded submissions are skipped unless `skip_graded` is False.
+    """
+    async def upsync_grade_report(
+        self,
+        assignment: AssignmentModel,
+        grade_report: GradeReportModel,
+        submission_grades: dict[SubmissionModel, SubmissionGradeSchema],
+        *,
+        skip_graded: bool = True,
+        on_progress: GradingProgressCallback | None = None
+    ) -> dict[SubmissionModel, str]:
+        from app.services import LmsSyncService, CleanupService
+
+        if on_progress is None: on_progress = self._ignore_progress
+
+        cleanup_service = CleanupService.Grading(self.session, grade_report)
+
+        lms_grades = {
+            submission: (
+                submission_grade.score / grade_report.total_points,
+                submission_grade.comments if assignment.grader_question_feedback else None
+            )
+            for submission, submission_grade in submission_grades.items()
+            # An already graded submission doesn't need to be reuploaded to Canvas.
+            if not (skip_graded and submission.graded)
+        }
+
+        try:
+            failures = await LmsSyncService(self.session).upsync_grades(assignment, lms_grades)
+        except Exception as e:
+            await cleanup_service.undo_grade_assignment(delete_database_grade_report=True)
+            raise e
+        
+        for submission in lms_grades.keys():
+            if submission in failures:
+                print(f"could not upload grade for { (await submission.awaitable_attrs.student).onyen }: { failures[submission] }")
+                await on_progress(submission, SubmissionGradingStatus.FAILED, error=failures[submission])
+            else:
+                submission.graded = True
+                await on_progress(submission, SubmissionGradingStatus.UPLOADED)
+
+        # All we've done is change `graded` on submissions, which can't cause any violations here.
+        await self.session.commit()
+
+        return failures
 
     async def grade_assignment(
         self,
@@ -145,103 +411,49 @@ class GradingService:
         *,
         dry_run=False
     ) -> GradeReportModel:
-        from app.services import LmsSyncService, CleanupService
-
         if assignment.manual_grading:
             raise AutogradingDisabledException()
 
         submissions = await self.compute_submissions_at_moment(assignment)
-        final_graded_notebook_content, zip_config_bytes = await self.generate_config(
+        final_scores = await self.autograde_submissions(
+            submissions,
             master_notebook_content,
             otter_config_content,
             requirements_txt_content
         )
 
-        final_scores = {}
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_dir = Path(temp_dir)
-            graded_notebook_path = temp_dir / "graded.ipynb"
-            otter_config_path = temp_dir / "config.zip"
-            with open(graded_notebook_path, "w+") as f:
-                f.write(final_graded_notebook_content)
-            with open(otter_config_path, "wb+") as f:
-                f.write(zip_config_bytes)
-            for submission in submissions:
-                (submission_notebook_path, student_notebook_content) = await self.load_submission_archive(submission, temp_dir)
-                submission_graded_path = temp_dir / f"{ submission.id }-graded.json"
-
-                try:
-                    otter_run(
-                        submission=str(submission_notebook_path),
-                        autograder=str(otter_config_path),
-                        output_dir=str(submission_graded_path),
-                        no_logo=True,
-                        debug=settings.DEV_PHASE == DevPhase.DEV
-                    )
-
-                    with open(submission_graded_path, "r") as f:
-                        grade_data = json.load(f)
-                
-                except Exception as e:
-                    print(f"could not grade submission for { submission.student.onyen }: { str(e) }")
-                    continue
-
-                tests = [test for test in grade_data["tests"] if "score" in test]
-                public_tests = [test for test in grade_data["tests"] if "score" not in test]
-                public_test_comments = "\n".join([test["output"] for test in public_tests])
-
-                score = sum([question["score"] for question in tests])
-                max_score = sum([question["max_score"] for question in tests])
-
-                final_scores[submission] = (
-                    SubmissionGradeSchema(
-                        score=score,
-                        total_points=max_score,
-                        comments=public_test_comments,
-                        submission_already_graded=submission.graded
-                    ),
-                    student_notebook_content
-                )
-
-            grade_report = GradeReportModel.from_submission_grades(
-                assignment=assignment,
-                submission_grades=[submission_grade for (submission_grade, _) in final_scores.values()],
-                master_notebook_content=master_notebook_content,
-                otter_config_content=otter_config_content
-            )
-            print(f"Generated grade report:\ntotal points = { grade_report.total_points }\navg = { grade_report.average }")
-
-            # If it's a dry run, stop right here and return the grade report.
-            if dry_run: return grade_report
+        grade_report = GradeReportModel.from_submission_grades(
+            assignment=assignment,
+            submission_grades=[submission_grade for submission_grade in final_scores.values()],
+            master_notebook_content=master_notebook_content,
+            otter_config_content=otter_config_content
+        )
+        print(f"Generated grade report:\ntotal points = { grade_report.total_points }\navg = { grade_report.average }")
 
-            self.session.add(grade_report)
-            self.session.commit()
+        # If it's a dry run, stop right here and return the grade report.
+        if dry_run: return grade_report
 
-            cleanup_service = CleanupService.Grading(self.session, grade_report)
+        self.session.add(grade_report)
+        await self.session.commit()
 
-            try:
-                for submission, (
-                    submission_grade,
-                    student_notebook_content
-                ) in final_scores.items():
-                    if submission.graded:
-                        # This submission is already graded. No point in reuploading it to Canvas.
-                        continue
-                    
-                    await LmsSyncService(self.session).upsync_grade(
-                        submission=submission,
-                        grade_proportion=submission_grade.score / grade_report.total_points,
-                        comments=submission_grade.comments if assignment.grader_question_feedback else None,
-                    )
-                    submission.graded = True
-            except Exception as e:
-                await cleanup_service.undo_grade_assignment(delete_database_grade_report=True)
-                raise e
-            
-            # All we've done is change `graded` on submissions, which can't cause any violations here.
-            self.session.commit()
-            
-            return grade_report
+        await self.upsync_grade_report(
+            assignment,
+            grade_report,
+            final_scores
+        )
+        
+        return grade_report
+
+    @staticmethod
+    async def _ignore_progress(*args, **kwargs) -> None:
+        pass
+
+    """ Wraps a progress callback so that concurrent gradings take turns using the session in it. """
+    def _serialize_progress(self, on_progress: GradingProgressCallback) -> GradingProgressCallback:
+        async def serialized_on_progress(*args, **kwargs) -> None:
+            async with self._session_lock:
+                await on_progress(*args, **kwargs)
+        return serialized_on_progress
         
     async def grade_assignment_manually(
         self,
@@ -250,13 +462,9 @@ class GradingService:
         *,
         dry_run=False
     ) -> GradeReportModel:
-        from app.services import LmsSyncService, CleanupService
-        
-        lms_sync_service = LmsSyncService(self.session)
-
         # Validate that manually-entered grading data does not attempt
         # to grade multiple submissions from a single student.
-        grade_users = [g.submission.student.onyen for g in grade_data]
+        grade_users = [(await g.submission.awaitable_attrs.student).onyen for g in grade_data]
         counts = Counter(grade_users)
         for onyen, count in counts.items():
             if count > 1: raise StudentGradedMultipleTimesException()
@@ -264,17 +472,9 @@ class GradingService:
         # Validate that manually-entered grading data does not attempt
         # to grade submissions for anything besides the given assignment.
         for grade in grade_data:
-            if grade.submission.assignment != assignment:
+            if await grade.submission.awaitable_attrs.assignment != assignment:
                 raise SubmissionMismatchException()
 
-        # Load student notebooks alongside submission grades
-        grades_with_notebooks = []
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_dir = Path(temp_dir)
-            for grade in grade_data:
-                (_, student_notebook_content) = await self.load_submission_archive(grade.submission, temp_dir)
-                grades_with_notebooks.append((grade, student_notebook_content))
-
         # Generate a grade report from submission grades
         grade_report = GradeReportModel.from_submission_grades(
             assignment=assignment,
@@ -288,33 +488,15 @@ class GradingService:
         if dry_run: return grade_report
 
         self.session.add(grade_report)
-        self.session.commit()
-
-        cleanup_service = CleanupService.Grading(self.session, grade_report)
-
-        try:
-            for (submission_grade, student_notebook_content) in grades_with_notebooks:
-                submission = submission_grade.submission
-                # We actually don't skip upsyncing here when `submission.graded == True`
-                # This is because the professor may want to manually update the grade of
-                # a submission.
-
-                student_notebook_upload = await self.get_student_notebook_upload(
-                    submission,
-                    student_notebook_content
-                )
-                await lms_sync_service.upsync_grade(
-                    submission=submission,
-                    grade_percent=submission_grade.score / grade_report.total_points,
-                    student_notebook=student_notebook_upload,
-                    comments=submission_grade.comments if assignment.grader_question_feedback else None,
-                )
-                submission.graded = True
-        except Exception as e:
-            cleanup_service.undo_grade_assignment(delete_database_grade_report=True)
-            raise e
-        
-        # All we've done is change `graded` on submissions, which can't cause any violations here.
-        self.session.commit()
+        await self.session.commit()
+
+        # We actually don't skip upsyncing already graded submissions here. This is because
+        # the professor may want to manually update the grade of a submission.
+        await self.upsync_grade_report(
+            assignment,
+            grade_report,
+            { grade.submission: grade for grade in grade_data },
+            skip_graded=False
+        )
 
         return grade_report
\ No newline at end of file
@@ -1,5 +1,12 @@
+import time
+import queue
+import asyncio
+import threading
 import ldap3
-from ldap3.core.exceptions import LDAPSocketOpenError
+from contextlib import contextmanager
+from typing import Iterator
+from ldap3.core.exceptions import LDAPSocketOpenError, LDAPCommunicationError
+from ldap3.utils.conv import escape_filter_chars
 from pydantic import BaseModel
 from app.core.config import settings
 from app.core.exceptions import LDAPConnectionTimeoutException, UserNotFoundException
@@ -10,9 +17,41 @@ class LDAPUserInfoSchema(BaseModel):
     last_name: str
     email: str
 
-class LDAPService:
-    def get_user_info(self, pid: str) -> LDAPUserInfoSchema:
-        base_dn = "dc=unc,dc=edu"
+class LDAPConnectionPool:
+    """
+    Keeps bound connections to the LDAP server open between searches, so that each search
+    doesn't pay for a new TLS handshake and bind. ldap3 is synchronous, so connections are
+    checked out from worker threads and at most LDAP_POOL_SIZE of them are open at once.
+    """
+    def __init__(self, size: int):
+        self._idle_connections: queue.LifoQueue[ldap3.Connection] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self) -> Iterator[ldap3.Connection]:
+        with self._slots:
+            conn = self._get_idle_connection() or self._connect()
+            try:
+                yield conn
+            except LDAPCommunicationError as e:
+                # The connection is likely broken (e.g. closed by the server while idle), so don't reuse it.
+                try: conn.unbind()
+                except LDAPCommunicationError: pass
+                raise e
+            finally:
+                if not conn.closed:
+                    self._idle_connections.put(conn)
+
+    def _get_idle_connection(self) -> ldap3.Connection | None:
+        while True:
+            try:
+                conn = self._idle_connections.get_nowait()
+            except queue.Empty:
+                return None
+            if not conn.closed and conn.bound:
+                return conn
+
+    def _connect(self) -> ldap3.Connection:
         server = ldap3.Server(
             host=settings.LDAP_HOST,
             port=settings.LDAP_PORT,
@@ -21,33 +60,110 @@ class LDAPService:
             connect_timeout=settings.LDAP_TIMEOUT_SECONDS
         )
         try:
-            with ldap3.Connection(
+            return ldap3.Connection(
                 server,
                 user=settings.LDAP_SERVICE_ACCOUNT_BIND_DN,
                 password=settings.LDAP_SERVICE_ACCOUNT_PASSWORD,
                 auto_bind=True,
                 receive_timeout=settings.LDAP_TIMEOUT_SECONDS
-            ) as conn:
-                search_filter = f"(&(objectClass=uncperson)(pid={pid}))"
-                conn.search(
-                    search_base=base_dn,
-                    search_filter=search_filter,
-                    search_scope=ldap3.SUBTREE,
-                    attributes=[
-                        "uid", # onyen
-                        "givenName", # first name
-                        "sn", # surname
-                        "mail" # email
-                    ]
-                )
-                if len(conn.entries) == 0:
-                    raise UserNotFoundException()
-                student = conn.entries[0]
-                return LDAPUserInfoSchema(
-                    onyen=student.uid.value,
-                    first_name=student.givenName.value,
-                    last_name=student.sn.value,
-                    email=student.mail.value
-                )
+            )
+        except LDAPSocketOpenError as e:
+            raise LDAPConnectionTimeoutException()
+
+class LDAPCacheEntry(BaseModel):
+    # None if the PID isn't in LDAP
+    user_info: LDAPUserInfoSchema | None
+    # time.monotonic() at which the PID was looked up
+    fetched_at: float
+
+_connection_pool = LDAPConnectionPool(settings.LDAP_POOL_SIZE)
+# PID lookups, shared by every LDAPService in the process. PIDs are practically never reassigned,
+# but unknown PIDs expire sooner since new users show up in LDAP some time after enrolling.
+_user_info_cache: dict[str, LDAPCacheEntry] = {}
+
+class LDAPService:
+    async def get_user_info(self, pid: str) -> LDAPUserInfoSchema:
+        users_info = await self.get_users_info([pid])
+        if pid not in users_info:
+            raise UserNotFoundException()
+        return users_info[pid]
+
+    """
+    Looks up many users by PID. PIDs that were looked up recently are served from the cache, and the rest
+    are searched for up to LDAP_SEARCH_CHUNK_SIZE at a time. PIDs that aren't in LDAP are left out of the returned mapping.
+    """
+    async def get_users_info(self, pids: list[str]) -> dict[str, LDAPUserInfoSchema]:
+        users_info = {}
+        missing_pids = []
+        for pid in dict.fromkeys(pids):
+            entry = self._get_cache_entry(pid)
+            if entry is None:
+                missing_pids.append(pid)
+            elif entry.user_info is not None:
+                users_info[pid] = entry.user_info
+
+        chunk_size = max(1, settings.LDAP_SEARCH_CHUNK_SIZE)
+        chunks = [missing_pids[i : i + chunk_size] for i in range(0, len(missing_pids), chunk_size)]
+        # ldap3 blocks, so search from worker threads rather than the event loop.
+        results = await asyncio.gather(*[asyncio.to_thread(self._search_users, chunk) for chunk in chunks])
+
+        fetched_at = time.monotonic()
+        for (chunk, result) in zip(chunks, results):
+            for pid in chunk:
+                _user_info_cache[pid] = LDAPCacheEntry(user_info=result.get(pid), fetched_at=fetched_at)
+            users_info.update(result)
+        return users_info
+
+    """ Drops the cached lookup of the given PID, or of every PID if None. """
+    @staticmethod
+    def invalidate_cache(pid: str | None = None) -> None:
+        if pid is None: _user_info_cache.clear()
+        else: _user_info_cache.pop(pid, None)
+
+    @staticmethod
+    def _get_cache_entry(pid: str) -> LDAPCacheEntry | None:
+        entry = _user_info_cache.get(pid)
+        if entry is None:
+            return None
+        ttl = settings.LDAP_CACHE_TTL_SECONDS if entry.user_info is not None else settings.LDAP_NEGATIVE_CACHE_TTL_SECONDS
+        if time.monotonic() - entry.fetched_at > ttl:
+            del _user_info_cache[pid]
+            return None
+        return entry
+
+    def _search_users(self, pids: list[str]) -> dict[str, LDAPUserInfoSchema]:
+        pid_filter = "".join(f"(pid={ escape_filter_chars(pid) })" for pid in pids)
+        search_filter = f"(&(objectClass=uncperson)(|{ pid_filter }))"
+        try:
+            try:
+                return self._search_users_with_pool(search_filter)
+            except LDAPCommunicationError:
+                # An idle connection may have been dropped by the server; retry once on a fresh one.
+                return self._search_users_with_pool(search_filter)
         except LDAPSocketOpenError as e:
-            raise LDAPConnectionTimeoutException()
\ No newline at end of file
+            raise LDAPConnectionTimeoutException()
+
+    def _search_users_with_pool(self, search_filter: str) -> dict[str, LDAPUserInfoSchema]:
+        base_dn = "dc=unc,dc=edu"
+        with _connection_pool.connection() as conn:
+            conn.search(
+                search_base=base_dn,
+                search_filter=search_filter,
+                search_scope=ldap3.SUBTREE,
+                attributes=[
+                    "pid",
+                    "uid", # onyen
+                    "givenName", # first name
+                    "sn", # surname
+                    "mail" # email
+                ]
+            )
+            return {
+                str(entry.pid.value): LDAPUserInfoSchema(
+                    onyen=entry.uid.value,
+                    first_name=entry.givenName.value,
+                    last_name=entry.sn.value,
+                    email=entry.mail.value
+                )
+                for entry in conn.entries
+            }
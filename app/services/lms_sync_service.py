@@ -1,7 +1,12 @@
+import json
+import time
 import asyncio
+import hashlib
 import os.path
 from typing import BinaryIO
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 from app.services.canvas_service import CanvasService, UpdateCanvasAssignmentBody, DuplicateFileAction
 from app.services.course_service import CourseService
@@ -10,16 +15,30 @@ from app.services.assignment_service import AssignmentService
 from app.services.grading_service import GradingService
 from app.services.user.student_service import StudentService
 from app.services.user.instructor_service import InstructorService
-from app.models import AssignmentModel, SubmissionModel
+from app.database import AsyncSessionLocal, async_engine
+from app.enums.lms_sync_status import LmsSyncStatus
+from app.models import AssignmentModel, SubmissionModel, UserModel, StudentModel, InstructorModel, LmsFingerprintModel, LmsSyncRunModel
+from app.models.user import UserType
 from app.schemas.course import UpdateCourseSchema
 from app.schemas.assignment import UpdateAssignmentSchema
+from app.schemas.lms import LmsSyncRunSchema, LmsSyncReportSchema, LmsAssignmentSyncDiffSchema, LmsUserSyncReportSchema, LmsUserSyncIssueSchema
+from app.core.utils.reconcile import ReconcileDiff
 from app.core.exceptions import (
-    AssignmentNotFoundException, NoCourseExistsException, 
-    UserNotFoundException, LMSUserNotFoundException
+    CustomException, NoCourseExistsException, NotAStudentException, NotAnInstructorException,
+    LMSUserNotFoundException, LMSUserPIDAlreadyAssociatedException, LMSBackendException,
+    LMSSyncInProgressException, LMSSyncNotFoundException
 )
 
+PENDING_ENROLLMENT_REASON = "Enrollment is pending"
+NOT_IN_LDAP_REASON = "Not found in LDAP"
+# Arbitrary, but shared by every worker and replica so that only one of them syncs the LMS at a time.
+LMS_SYNC_LOCK_ID = 0x4c4d5353594e43
+
+# Keep a reference to the periodic sync so it isn't garbage collected.
+_periodic_downsync_tasks: set[asyncio.Task] = set()
+
 class LmsSyncService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.canvas_service = CanvasService(session)
         self.course_service = CourseService(session)
         self.assignment_service = AssignmentService(session)
@@ -32,178 +51,316 @@ class LmsSyncService:
     async def get_assignment(self, assignment_id):
         return await self.canvas_service.get_assignment(assignment_id)
 
-    async def sync_course(self):
+    """ Brings the course in the database in line with Canvas. Returns whether it was left alone because it hadn't changed. """
+    async def sync_course(self, *, incremental: bool = False) -> bool:
         print("SYNC COURSE")
-        try:
-            canvas_course = await self.canvas_service.get_course()
-            print("CANVAS COURSE EXISTS")
+        canvas_course = await self.canvas_service.get_course()
+        fingerprint = self._get_fingerprint(canvas_course)
+        if incremental and (await self._get_stored_fingerprints("course")).get(str(canvas_course["id"])) == fingerprint:
+            return True
 
-            # Check if a course already exists in the database
-            if(await self.course_service.get_course()):
-                print("COURSE EXISTS ALREADY")
-                #update the existing course
+        try:
+            course = await self.course_service.get_course()
+            if course.name != canvas_course["name"]:
                 await self.course_service.update_course(UpdateCourseSchema(
                     name=canvas_course["name"]
                 ))
                 print("UPDATED COURSE")
-
         except NoCourseExistsException as e:
             print("CREATING COURSE (LMS)", e)
-            return await CourseService(self.session).create_course(name=canvas_course['name'])
+            await self.course_service.create_course(name=canvas_course['name'])
 
+        await self._store_fingerprints("course", { str(canvas_course["id"]): fingerprint })
+        return False
 
-    async def sync_assignments(self):
+    """
+    Brings the assignments in the database in line with Canvas. Only assignments that actually
+    differ are touched, and only their changed fields are updated. Returns what changed.
+    """
+    async def sync_assignments(self, *, incremental: bool = False) -> LmsAssignmentSyncDiffSchema:
         canvas_assignments = await self.canvas_service.get_assignments()
-        db_assignments = await self.assignment_service.get_assignments()
+        fingerprints = { str(assignment["id"]): self._get_fingerprint(assignment) for assignment in canvas_assignments }
+        stored_fingerprints = await self._get_stored_fingerprints("assignment")
+        if incremental and fingerprints == stored_fingerprints:
+            return LmsAssignmentSyncDiffSchema(unchanged=True)
+
+        updates = { assignment["id"]: self._get_update_assignment_schema(assignment) for assignment in canvas_assignments }
+        db_assignments = { assignment.id: assignment for assignment in await self.assignment_service.get_assignments() }
+        def is_changed(update: UpdateAssignmentSchema, db_assignment: AssignmentModel) -> bool:
+            # In incremental mode, assignments that haven't changed in Canvas since they were last synced are left alone.
+            if incremental and fingerprints[str(db_assignment.id)] == stored_fingerprints.get(str(db_assignment.id)):
+                return False
+            return len(self._get_changed_assignment_fields(update, db_assignment)) > 0
+        diff = ReconcileDiff.compute(updates, db_assignments, is_changed)
+        report = LmsAssignmentSyncDiffSchema()
 
         # Delete assignments that are in the database but not in Canvas
-        for assignment in db_assignments:
-            if assignment.id not in [a['id'] for a in canvas_assignments]:
-                await self.assignment_service.delete_assignment(assignment)
+        for id, db_assignment in diff.delete.items():
+            await self.assignment_service.delete_assignment(db_assignment)
+            report.deleted.append(id)
 
-        for assignment in canvas_assignments:
+        for id, (update, db_assignment) in diff.update.items():
+            changed_fields = self._get_changed_assignment_fields(update, db_assignment)
+            await self.assignment_service.update_assignment(db_assignment, UpdateAssignmentSchema(**changed_fields))
+            report.updated[id] = list(changed_fields.keys())
+
+        for id, update in diff.create.items():
+            await self.assignment_service.create_assignment(
+                id=id,
+                name=update.name,
+                due_date=update.due_date,
+                available_date=update.available_date,
+                directory_path=update.name,
+                is_published=update.is_published,
+                max_attempts=update.max_attempts
+            )
+            report.created.append(id)
+
+        await self._store_fingerprints("assignment", fingerprints, delete_missing=True)
+        return report
+
+    @staticmethod
+    def _get_update_assignment_schema(canvas_assignment: dict) -> UpdateAssignmentSchema:
+        return UpdateAssignmentSchema(
+            name=canvas_assignment["name"],
+            available_date=canvas_assignment["unlock_at"],
+            due_date=canvas_assignment["due_at"],
+            is_published=canvas_assignment["published"],
             # Canvas uses -1 for unlimited attempts.
-            max_attempts = assignment["allowed_attempts"] if assignment["allowed_attempts"] >= 0 else None
-            try:
-                db_assignment = await self.assignment_service.get_assignment_by_id(assignment['id'])
-
-                await self.assignment_service.update_assignment(db_assignment, UpdateAssignmentSchema(
-                    name=assignment["name"],
-                    available_date=assignment["unlock_at"],
-                    due_date=assignment["due_at"],
-                    is_published=assignment["published"],
-                    max_attempts=max_attempts
-                ))
+            max_attempts=canvas_assignment["allowed_attempts"] if canvas_assignment["allowed_attempts"] >= 0 else None
+        )
 
-            except AssignmentNotFoundException as e:
-                #create a new assignment
-                await self.assignment_service.create_assignment(
-                    id=assignment['id'],
-                    name=assignment['name'], 
-                    due_date=assignment['due_at'], 
-                    available_date=assignment['unlock_at'],
-                    directory_path=assignment['name'],
-                    is_published=assignment['published'],
-                    max_attempts=max_attempts
-                )
-        
-        return canvas_assignments
+    @staticmethod
+    def _get_changed_assignment_fields(update: UpdateAssignmentSchema, assignment: AssignmentModel) -> dict:
+        return {
+            field: value for field, value in update.dict(exclude_unset=True).items()
+            if getattr(assignment, field) != value
+        }
 
-    async def sync_students(self):
-        db_students = await self.student_service.list_students()
-        canvas_students = await self.canvas_service.get_students()
+    async def sync_students(self, *, refresh_roster: bool = True, incremental: bool = False) -> LmsUserSyncReportSchema:
+        return await self._sync_users(UserType.STUDENT, refresh_roster, incremental)
 
-        # If this course runs on a 2U Digital Campus instance, remove ":UNC" from the PID
-        for student in canvas_students:
-            sis_user_id = student.get("sis_user_id")
-            if sis_user_id and ':' in sis_user_id:
-                student["sis_user_id"] = sis_user_id.split(':')[0]
+    async def sync_instructors(self, *, refresh_roster: bool = True, incremental: bool = False) -> LmsUserSyncReportSchema:
+        return await self._sync_users(UserType.INSTRUCTOR, refresh_roster, incremental)
+
+    """
+    Brings the users of the given type in the database in line with the Canvas roster, matching them up by PID.
+    PID mappings and users are loaded up front rather than per user. New users are resolved in LDAP in bulk,
+    then onboarded concurrently, up to LMS_SYNC_CONCURRENCY at a time, each in its own database session so that
+    one user failing (and being cleaned up) doesn't affect the others. Their PIDs are associated in one batch.
+    In incremental mode, the sync is skipped if the roster hasn't changed since it was last synced in full.
+    """
+    async def _sync_users(self, user_type: UserType, refresh_roster: bool, incremental: bool) -> LmsUserSyncReportSchema:
+        if user_type == UserType.STUDENT:
+            user_model, user_service, not_user_type_exception = StudentModel, self.student_service, NotAStudentException
+        else:
+            user_model, user_service, not_user_type_exception = InstructorModel, self.instructor_service, NotAnInstructorException
+
+        lms_users = await self._get_lms_users(user_type, refresh_roster)
+        roster_fingerprint = self._get_roster_fingerprint(lms_users)
+        if incremental and (await self._get_stored_fingerprints("roster")).get(user_type.value) == roster_fingerprint:
+            return LmsUserSyncReportSchema(unchanged=True)
 
-        canvas_student_pids = [s["sis_user_id"] for s in canvas_students]
+        report = LmsUserSyncReportSchema()
+        canvas_users = {}
+        for user in lms_users:
+            pid = user.get("sis_user_id")
+            if pid is None:
+                report.skipped.append(LmsUserSyncIssueSchema(pid=None, name=user.get("name"), reason=PENDING_ENROLLMENT_REASON))
+                continue
+            # Users missing their email or name are still enrolled, so they're kept even though they can't be created yet.
+            canvas_users[pid] = user
+
+        pids_by_onyen = await self.canvas_service.get_pids_by_onyen()
+        db_users = {}
+        for user in await self.session.scalars(select(user_model)):
+            pid = pids_by_onyen.get(user.onyen)
+            if pid is None:
+                # Without their PID, there's no telling whether the user is still enrolled.
+                report.failed.append(LmsUserSyncIssueSchema(pid=None, name=user.name, reason=f'User "{ user.onyen }" has no associated PID'))
+                continue
+            db_users[pid] = user
+
+        diff = ReconcileDiff.compute(canvas_users, db_users)
+        report.existing = [user.onyen for (_, user) in diff.unchanged.values()]
         
-        # Delete students that are in the database but not in Canvas
-        for student in db_students:
-            print("getting student pid", student.onyen)
-            student_pid = await self.canvas_service.get_pid_from_onyen(student.onyen)
-            print("student pid is", student_pid)
-            if student_pid not in canvas_student_pids:
-                await self.student_service.delete_user(student.onyen)
-                try: await self.canvas_service.unassociate_pid_from_user(student.onyen)
+        # Delete users that are in the database but not in Canvas
+        for pid, user in diff.delete.items():
+            try:
+                await user_service.delete_user(user.onyen)
+                try: await self.canvas_service.unassociate_pid_from_user(user.onyen)
                 except LMSUserNotFoundException: pass
-       
-        for student in canvas_students:
-            pid, email, name = student.get("sis_user_id"), student.get("email"), student.get("name")
-            if pid is None or email is None or name is None:
-                print("Skipping over pending student", name or "<unknown>")
+            except Exception as e:
+                report.failed.append(LmsUserSyncIssueSchema(pid=pid, name=user.name, reason=self._get_error_reason(e)))
                 continue
+            report.deleted.append(user.onyen)
 
-            try:
-                print("getting user info for ", pid)
-                user_info = self.ldap_service.get_user_info(pid)
-                print(pid, "->", user_info.onyen)
-            except:
-                print("Skipping over student not in LDAP: ", pid or "<unknown>")
+        new_canvas_users = {}
+        for pid, canvas_user in diff.create.items():
+            if canvas_user.get("email") is None or canvas_user.get("name") is None:
+                report.skipped.append(LmsUserSyncIssueSchema(pid=pid, name=canvas_user.get("name"), reason=PENDING_ENROLLMENT_REASON))
                 continue
+            new_canvas_users[pid] = canvas_user
 
-            try:
-                await self.student_service.get_user_by_onyen(user_info.onyen)
-
-            except UserNotFoundException:
-                #create a new student
-                print("student doesn't exist", user_info.onyen)
-                await self.student_service.create_student(
-                    onyen=user_info.onyen,
-                    name=name,
-                    email=email
-                )
-                print("associate pid", pid, "to onyen", user_info.onyen)
-                await self.canvas_service.associate_pid_to_user(user_info.onyen, pid)
-
-        return canvas_students
-    
-    async def sync_instructors(self):
-        db_instructors = await self.instructor_service.list_instructors()
-        canvas_instructors = await self.canvas_service.get_instructors()
+        users_info = await self.ldap_service.get_users_info(list(new_canvas_users.keys()))
+        onyens = [user_info.onyen for user_info in users_info.values()]
+        existing_users = { user.onyen: user for user in await self.session.scalars(select(UserModel).filter(UserModel.onyen.in_(onyens))) }
+
+        pids_to_associate = {}
+        new_users = []
+        for pid, canvas_user in new_canvas_users.items():
+            name, email = canvas_user["name"], canvas_user["email"]
+            user_info = users_info.get(pid)
+            if user_info is None:
+                report.skipped.append(LmsUserSyncIssueSchema(pid=pid, name=name, reason=NOT_IN_LDAP_REASON))
+                continue
+            existing_user = existing_users.get(user_info.onyen)
+            if existing_user is None:
+                new_users.append((pid, name, email, user_info.onyen))
+            elif not isinstance(existing_user, user_model):
+                report.failed.append(LmsUserSyncIssueSchema(pid=pid, name=name, reason=not_user_type_exception().message))
+            else:
+                # The user exists but their PID was never associated, e.g. if a previous sync was interrupted.
+                report.existing.append(user_info.onyen)
+                pids_to_associate[user_info.onyen] = pid
+
+        semaphore = asyncio.Semaphore(max(1, settings.LMS_SYNC_CONCURRENCY))
+        async def create_user(pid: str, name: str, email: str, onyen: str) -> None:
+            async with semaphore:
+                try:
+                    async with AsyncSessionLocal() as session:
+                        if user_type == UserType.STUDENT:
+                            await StudentService(session).create_student(onyen=onyen, name=name, email=email)
+                        else:
+                            await InstructorService(session).create_instructor(onyen=onyen, name=name, email=email)
+                except Exception as e:
+                    print(f"could not create { user_type.value } { onyen }: { self._get_error_reason(e) }")
+                    report.failed.append(LmsUserSyncIssueSchema(pid=pid, name=name, reason=self._get_error_reason(e)))
+                    return
+            report.created.append(onyen)
+            pids_to_associate[onyen] = pid
+
+        await asyncio.gather(*[create_user(*new_user) for new_user in new_users])
+
+        conflicting_onyens = await self.canvas_service.associate_pids_to_users(pids_to_associate)
+        for onyen in conflicting_onyens:
+            report.failed.append(LmsUserSyncIssueSchema(
+                pid=pids_to_associate[onyen],
+                name=None,
+                reason=LMSUserPIDAlreadyAssociatedException().message
+            ))
+
+        # Only a roster that was synced without issues is considered synced, so that the others are retried.
+        # Pending enrollments change the roster once they're complete, so they don't need retrying.
+        if len(report.failed) == 0 and all(issue.reason == PENDING_ENROLLMENT_REASON for issue in report.skipped):
+            await self._store_fingerprints("roster", { user_type.value: roster_fingerprint })
+
+        report.created.sort()
+        print(f"Synced { user_type.value }s: { len(report.created) } created, { len(report.deleted) } deleted, { len(report.skipped) } skipped, { len(report.failed) } failed")
+        return report
+
+    """
+    Refreshes the course rosters and looks up everyone on them in LDAP in bulk, so that syncing students and
+    instructors afterwards is served from the LDAP cache rather than searching for users one at a time.
+    In incremental mode, rosters that haven't changed since they were last synced are left out.
+    """
+    async def warm_ldap_cache(self, *, incremental: bool = False) -> None:
+        await self.canvas_service.refresh_rosters()
+        stored_fingerprints = await self._get_stored_fingerprints("roster")
+        pids = []
+        for user_type in (UserType.STUDENT, UserType.INSTRUCTOR):
+            users = await self._get_lms_users(user_type, refresh_roster=False)
+            if incremental and stored_fingerprints.get(user_type.value) == self._get_roster_fingerprint(users):
+                continue
+            pids += [user["sis_user_id"] for user in users if user.get("sis_user_id") is not None]
+        await self.ldap_service.get_users_info(pids)
+
+    """
+    The users of the given type on the Canvas roster. When syncing, the roster is normally fetched
+    afresh rather than served from the cache, unless it was just refreshed (e.g. by warm_ldap_cache).
+    """
+    async def _get_lms_users(self, user_type: UserType, refresh_roster: bool) -> list[dict]:
+        if refresh_roster:
+            self.canvas_service.invalidate_roster_cache(user_type)
+        roster = await self.canvas_service.get_roster(user_type)
+        users = [dict(user) for user in roster.users]
 
         # If this course runs on a 2U Digital Campus instance, remove ":UNC" from the PID
-        for instructor in canvas_instructors:
-            sis_user_id = instructor.get("sis_user_id")
+        for user in users:
+            sis_user_id = user.get("sis_user_id")
             if sis_user_id and ':' in sis_user_id:
-                instructor["sis_user_id"] = sis_user_id.split(':')[0]
-
-        canvas_instructor_pids = [i["sis_user_id"] for i in canvas_instructors]
-       
-        # Delete instructors that are in the database but not in Canvas
-        for instructor in db_instructors:
-            print("getting instructor pid", instructor.onyen)
-            instructor_pid = await self.canvas_service.get_pid_from_onyen(instructor.onyen)
-            print("instructor pid is", instructor_pid)
-            if instructor_pid not in canvas_instructor_pids:
-                await self.instructor_service.delete_user(instructor.onyen)
-                try: await self.canvas_service.unassociate_pid_from_user(instructor.onyen)
-                except LMSUserNotFoundException: pass
-        
-        for instructor in canvas_instructors:
-            pid, email, name = instructor.get("sis_user_id"), instructor.get("email"), instructor.get("name")
-            if pid is None or email is None or name is None:
-                print("Skipping over pending instructor", name or "<unknown>")
-                continue
+                user["sis_user_id"] = sis_user_id.split(':')[0]
 
-            print("getting user info for ", pid)
-            user_info = self.ldap_service.get_user_info(pid)
-            print(pid, "->", user_info.onyen)
+        return users
 
-            try:
-                await self.instructor_service.get_user_by_onyen(user_info.onyen)
-
-            except UserNotFoundException:
-                #create a new instructor
-                print("instructor doesn't exit", user_info.onyen)
-                await self.instructor_service.create_instructor(
-                    onyen=user_info.onyen,
-                    name=name,
-                    email=email
-                )
-                print("associate pid", pid, "to onyen", user_info.onyen)
-                await self.canvas_service.associate_pid_to_user(user_info.onyen, pid)
-
-        return canvas_instructors
+    """ Canvas' `updated_at` for the object if it has one, otherwise a hash of its contents. """
+    @staticmethod
+    def _get_fingerprint(lms_object: dict) -> str:
+        if lms_object.get("updated_at") is not None:
+            return lms_object["updated_at"]
+        return hashlib.sha256(json.dumps(lms_object, sort_keys=True, default=str).encode()).hexdigest()
+
+    """ Canvas users don't have an `updated_at`, so a roster is fingerprinted by the fields that are synced. """
+    @classmethod
+    def _get_roster_fingerprint(cls, users: list[dict]) -> str:
+        return cls._get_fingerprint({
+            "users": sorted(
+                [(user.get("sis_user_id"), user.get("name"), user.get("email")) for user in users],
+                key=lambda user: tuple(field or "" for field in user)
+            )
+        })
+
+    async def _get_stored_fingerprints(self, kind: str) -> dict[str, str]:
+        return {
+            row.key: row.fingerprint
+            for row in await self.session.scalars(select(LmsFingerprintModel).filter_by(kind=kind))
+        }
+
+    """
+    Records that the given objects are in sync. Only fingerprints that changed are written, so that a sync
+    where nothing changed doesn't write anything. With `delete_missing`, objects that are gone are forgotten.
+    """
+    async def _store_fingerprints(self, kind: str, fingerprints: dict[str, str], delete_missing: bool = False) -> None:
+        stored_fingerprints = await self._get_stored_fingerprints(kind)
+        changed_fingerprints = [
+            { "kind": kind, "key": key, "fingerprint": fingerprint }
+            for key, fingerprint in fingerprints.items()
+            if stored_fingerprints.get(key) != fingerprint
+        ]
+        missing_keys = set(stored_fingerprints.keys()) - set(fingerprints.keys()) if delete_missing else set()
+        if len(changed_fingerprints) == 0 and len(missing_keys) == 0:
+            return
+
+        if len(changed_fingerprints) > 0:
+            statement = insert(LmsFingerprintModel).values(changed_fingerprints)
+            await self.session.execute(statement.on_conflict_do_update(
+                index_elements=[LmsFingerprintModel.kind, LmsFingerprintModel.key],
+                set_={
+                    "fingerprint": statement.excluded.fingerprint,
+                    "last_modified_date": func.current_timestamp()
+                }
+            ))
+        if len(missing_keys) > 0:
+            await self.session.execute(
+                delete(LmsFingerprintModel)
+                .filter(LmsFingerprintModel.kind == kind, LmsFingerprintModel.key.in_(missing_keys))
+                .execution_options(synchronize_session=False)
+            )
+        await self.session.commit()
+
+    @staticmethod
+    def _get_error_reason(e: Exception) -> str:
+        return e.message if isinstance(e, CustomException) else str(e)
     
     async def upsync_submission(
         self,
         submission: SubmissionModel,
         student_notebook_content: bytes
     ):
-        user_pid = await self.canvas_service.get_pid_from_onyen(submission.student.onyen)
-        
-        # If this course runs on a 2U Digital Campus instance, append ":UNC" to the PID
-        if "digitalcampus" in settings.CANVAS_API_URL:
-            user_pid += ":UNC"
-
-        student = await self.canvas_service.get_student_by_pid(user_pid)
+        student = await self._get_lms_student(submission)
         student_notebook_upload = await self.grading_service.get_student_notebook_upload(submission, student_notebook_content)
         await self.canvas_service.upload_submission(
-            assignment_id=submission.assignment.id,
+            assignment_id=submission.assignment_id,
             user_id=student["id"],
             student_notebook=student_notebook_upload,
             comments=None
@@ -216,20 +373,73 @@ class LmsSyncService:
         grade_proportion: float,
         comments: str | None = None,
     ):
-        user_pid = await self.canvas_service.get_pid_from_onyen(submission.student.onyen)
-        
-        # If this course runs on a 2U Digital Campus instance, append ":UNC" to the PID
-        if "digitalcampus" in settings.CANVAS_API_URL:
-            user_pid += ":UNC"
-
-        student = await self.canvas_service.get_student_by_pid(user_pid)
+        student = await self._get_lms_student(submission)
         await self.canvas_service.upload_assignment_grade(
-            assignment_id=submission.assignment.id,
+            assignment_id=submission.assignment_id,
             user_id=student["id"],
             grade_proportion=grade_proportion,
             comments=comments
         )
             
+    """
+    Uploads the grades of many submissions to an assignment at once. `submission_grades` maps each
+    submission to its grade proportion, between [0,1], and comments. A grade that can't be uploaded
+    doesn't stop the others; returns the error for each submission whose grade failed to upload.
+    """
+    async def upsync_grades(
+        self,
+        assignment: AssignmentModel,
+        submission_grades: dict[SubmissionModel, tuple[float, str | None]]
+    ) -> dict[SubmissionModel, str]:
+        failures = {}
+        grades = {}
+        submissions_by_user_id = {}
+        # Look up every PID at once, rather than a query per submission.
+        pids_by_onyen = await self.canvas_service.get_pids_by_onyen()
+        for submission, grade in submission_grades.items():
+            onyen = (await submission.awaitable_attrs.student).onyen
+            try:
+                if onyen not in pids_by_onyen:
+                    raise LMSUserNotFoundException(f'LMS user with onyen "{ onyen }" does not exist')
+                student = await self._get_lms_student_by_pid(pids_by_onyen[onyen])
+            except LMSUserNotFoundException as e:
+                failures[submission] = e.message
+                continue
+            grades[student["id"]] = grade
+            submissions_by_user_id[student["id"]] = submission
+
+        if len(grades) == 0: return failures
+
+        try:
+            await self.canvas_service.upload_assignment_grades(assignment.id, grades)
+        except LMSBackendException as e:
+            # Canvas rejects the whole batch if any one grade can't be applied,
+            # so upload the grades one at a time to find out which ones.
+            print("Bulk grade upload failed, uploading grades individually:", e.message)
+            for user_id, (grade_proportion, comments) in grades.items():
+                try:
+                    await self.canvas_service.upload_assignment_grade(
+                        assignment_id=assignment.id,
+                        user_id=user_id,
+                        grade_proportion=grade_proportion,
+                        comments=comments
+                    )
+                except LMSBackendException as e:
+                    failures[submissions_by_user_id[user_id]] = e.message
+
+        return failures
+
+    async def _get_lms_student(self, submission: SubmissionModel):
+        student = await submission.awaitable_attrs.student
+        return await self._get_lms_student_by_pid(await self.canvas_service.get_pid_from_onyen(student.onyen))
+
+    async def _get_lms_student_by_pid(self, user_pid: str):
+        # If this course runs on a 2U Digital Campus instance, append ":UNC" to the PID
+        if "digitalcampus" in settings.CANVAS_API_URL:
+            user_pid += ":UNC"
+
+        return await self.canvas_service.get_student_by_pid(user_pid)
+            
     async def upsync_assignment(
         self,
         assignment: AssignmentModel
@@ -243,10 +453,145 @@ class LmsSyncService:
         ))
         
 
-    async def downsync(self):
+    """
+    Syncs the course, its assignments and its users from the LMS. In incremental mode, only what changed in
+    the LMS since the last sync is applied. A sync where nothing changed doesn't write to the database, but it
+    still lists the course, its assignments and its roster (students and instructors in one listing, which may
+    span several pages), since Canvas has nothing cheaper to tell whether the roster changed.
+    """
+    async def downsync(self, *, incremental: bool = False) -> LmsSyncReportSchema:
         print("Syncing the LMS with the database")
-        await self.sync_course()
-        await self.sync_assignments()
-        await self.sync_students()
-        await self.sync_instructors()
-        print("Syncing complete")
\ No newline at end of file
+        course_unchanged = await self.sync_course(incremental=incremental)
+        assignments = await self.sync_assignments(incremental=incremental)
+        await self.warm_ldap_cache(incremental=incremental)
+        students = await self.sync_students(refresh_roster=False, incremental=incremental)
+        instructors = await self.sync_instructors(refresh_roster=False, incremental=incremental)
+        print("Syncing complete")
+        return LmsSyncReportSchema(
+            unchanged=course_unchanged and assignments.unchanged and students.unchanged and instructors.unchanged,
+            assignments=assignments,
+            students=students,
+            instructors=instructors
+        )
+
+    """
+    Runs a downsync in its own database session while holding the LMS sync lock, and records it as a sync run.
+    Raises LMSSyncInProgressException if another worker or replica is already syncing.
+    """
+    @staticmethod
+    async def run_downsync(*, incremental: bool = False) -> LmsSyncRunSchema:
+        # Advisory locks belong to the connection that took them, so one connection is held for the whole sync.
+        # If the worker dies mid-sync, its connection drops and the lock is released with it.
+        async with async_engine.connect() as lock_connection:
+            if not await lock_connection.scalar(select(func.pg_try_advisory_lock(LMS_SYNC_LOCK_ID))):
+                raise LMSSyncInProgressException()
+            # The lock outlives the transaction, which shouldn't be left open while syncing.
+            await lock_connection.commit()
+            try:
+                async with AsyncSessionLocal() as session:
+                    return await LmsSyncService(session)._record_downsync(incremental)
+            finally:
+                await lock_connection.scalar(select(func.pg_advisory_unlock(LMS_SYNC_LOCK_ID)))
+                await lock_connection.commit()
+
+    async def _record_downsync(self, incremental: bool) -> LmsSyncRunSchema:
+        # Only one sync runs at a time, so any other sync still marked as running was interrupted.
+        await self.session.execute(
+            update(LmsSyncRunModel)
+            .filter_by(status=LmsSyncStatus.RUNNING)
+            .values({
+                LmsSyncRunModel.status: LmsSyncStatus.FAILED,
+                LmsSyncRunModel.error: "interrupted",
+                LmsSyncRunModel.finished_date: func.current_timestamp()
+            })
+            .execution_options(synchronize_session=False)
+        )
+        run = LmsSyncRunModel(status=LmsSyncStatus.RUNNING, incremental=incremental)
+        self.session.add(run)
+        await self.session.commit()
+
+        start_time = time.monotonic()
+        error = None
+        try:
+            report = await self.downsync(incremental=incremental)
+            run.status = LmsSyncStatus.COMPLETED
+            run.report = json.loads(report.json())
+        except Exception as e:
+            await self.session.rollback()
+            run.status = LmsSyncStatus.FAILED
+            run.error = self._get_error_reason(e)
+            error = e
+        run.finished_date = func.current_timestamp()
+        run.duration_seconds = time.monotonic() - start_time
+
+        # An incremental sync where nothing changed replaces the one before it if that didn't change anything either,
+        # so that syncing an idle course doesn't push every other run out of the history.
+        if error is None and report.unchanged:
+            previous_run = await self.session.scalar(
+                select(LmsSyncRunModel)
+                .filter(LmsSyncRunModel.id < run.id)
+                .order_by(LmsSyncRunModel.id.desc())
+                .limit(1)
+            )
+            if self._is_unchanged_run(previous_run):
+                await self.session.delete(previous_run)
+
+        stale_run_ids = select(LmsSyncRunModel.id) \
+            .order_by(LmsSyncRunModel.id.desc()) \
+            .offset(settings.LMS_SYNC_HISTORY_SIZE)
+        await self.session.execute(
+            delete(LmsSyncRunModel)
+            .filter(LmsSyncRunModel.id.in_(stale_run_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+        # The finished date was set by the database.
+        await self.session.refresh(run)
+
+        if error is not None:
+            raise error
+        return LmsSyncRunSchema.from_orm(run)
+
+    @staticmethod
+    def _is_unchanged_run(run: LmsSyncRunModel | None) -> bool:
+        return run is not None and run.status == LmsSyncStatus.COMPLETED and (run.report or {}).get("unchanged", False)
+
+    async def get_last_sync_run(self) -> LmsSyncRunModel:
+        run = await self.session.scalar(
+            select(LmsSyncRunModel)
+            .order_by(LmsSyncRunModel.id.desc())
+            .limit(1)
+        )
+        if run is None:
+            raise LMSSyncNotFoundException()
+        return run
+
+    """ Syncs the LMS in the background of the current event loop, every LMS_SYNC_INTERVAL_SECONDS. """
+    @staticmethod
+    def start_periodic_downsync() -> None:
+        if settings.LMS_SYNC_INTERVAL_SECONDS <= 0:
+            return
+        task = asyncio.create_task(LmsSyncService._run_periodic_downsync())
+        _periodic_downsync_tasks.add(task)
+        task.add_done_callback(_periodic_downsync_tasks.discard)
+
+    @staticmethod
+    async def stop_periodic_downsync() -> None:
+        tasks = list(_periodic_downsync_tasks)
+        for task in tasks: task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def _run_periodic_downsync() -> None:
+        # The first sync after starting up is a full one. This also sets up the course on a fresh install.
+        incremental = False
+        while True:
+            try:
+                await LmsSyncService.run_downsync(incremental=incremental)
+                incremental = settings.LMS_SYNC_INCREMENTAL
+            except LMSSyncInProgressException:
+                # Another worker or replica is syncing right now.
+                pass
+            except Exception as e:
+                print(f"LMS sync failed: { LmsSyncService._get_error_reason(e) }")
+            await asyncio.sleep(settings.LMS_SYNC_INTERVAL_SECONDS)
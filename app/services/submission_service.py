@@ -1,10 +1,11 @@
 import os.path
 import tempfile
-from typing import List
+from typing import Dict, List
 from pathlib import Path
 from datetime import datetime
-from sqlalchemy import desc, func
-from sqlalchemy.orm import Session
+from sqlalchemy import select, desc, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from app.events import dispatch
 from app.models import StudentModel, AssignmentModel, SubmissionModel
 from app.schemas import SubmissionSchema, DatabaseSubmissionSchema
@@ -13,7 +14,7 @@ from app.core.exceptions import SubmissionNotFoundException
 from app.core.utils.datetime import get_now_with_tzinfo
 
 class SubmissionService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
     async def create_submission(
@@ -41,7 +42,7 @@ class SubmissionService:
         )
 
         self.session.add(submission)
-        self.session.commit()
+        await self.session.commit()
 
         dispatch(CreateSubmissionCrudEvent(submission=submission))
 
@@ -51,9 +52,10 @@ class SubmissionService:
         self,
         submission_id: int
     ) -> SubmissionModel:
-        submission = self.session.query(SubmissionModel) \
-            .filter_by(id=submission_id) \
-            .first()
+        submission = await self.session.scalar(
+            select(SubmissionModel)
+            .filter_by(id=submission_id)
+        )
         if submission is None:
             raise SubmissionNotFoundException()
         return submission
@@ -63,10 +65,11 @@ class SubmissionService:
         student: StudentModel,
         assignment: AssignmentModel
     ) -> List[SubmissionModel]:
-        submissions = self.session.query(SubmissionModel) \
-            .filter_by(student_id=student.id, assignment_id=assignment.id) \
-            .order_by(desc(SubmissionModel.submission_time)) \
-            .all()
+        submissions = (await self.session.scalars(
+            select(SubmissionModel)
+            .filter_by(student_id=student.id, assignment_id=assignment.id)
+            .order_by(desc(SubmissionModel.submission_time))
+        )).all()
 
         return submissions
 
@@ -77,29 +80,112 @@ class SubmissionService:
         moment: datetime | None = None
     ) -> SubmissionModel:
         if moment is None: moment = get_now_with_tzinfo()
-        submission = self.session.query(SubmissionModel) \
-            .filter_by(student_id=student.id, assignment_id=assignment.id) \
-            .filter(SubmissionModel.submission_time <= moment) \
-            .order_by(desc(SubmissionModel.submission_time)) \
-            .limit(1) \
-            .first()
+        submission = await self.session.scalar(
+            select(SubmissionModel)
+            .filter_by(student_id=student.id, assignment_id=assignment.id)
+            .filter(SubmissionModel.submission_time <= moment)
+            .order_by(desc(SubmissionModel.submission_time), desc(SubmissionModel.id))
+            .limit(1)
+        )
         if submission is None:
             raise SubmissionNotFoundException()
         return submission
         
+    """ The active submission of every student who has submitted to the assignment as of `moment`, in a single query. """
+    async def get_active_submissions(
+        self,
+        assignment: AssignmentModel,
+        moment: datetime | None = None
+    ) -> List[SubmissionModel]:
+        if moment is None: moment = get_now_with_tzinfo()
+        return (await self.session.scalars(
+            select(SubmissionModel)
+            .options(joinedload(SubmissionModel.student))
+            .filter(SubmissionModel.assignment_id == assignment.id)
+            .filter(SubmissionModel.submission_time <= moment)
+            .distinct(SubmissionModel.student_id)
+            .order_by(SubmissionModel.student_id, desc(SubmissionModel.submission_time), desc(SubmissionModel.id))
+        )).all()
+        
     """ NOTE: Marked for refactor. Not a fan of this workflow... """
     async def get_current_submission_attempt(
         self,
         student: StudentModel,
         assignment: AssignmentModel
     ) -> int:
-        student_submissions = self.session.query(SubmissionModel) \
-            .filter(SubmissionModel.assignment_id == assignment.id) \
+        return await self.session.scalar(
+            select(func.count(SubmissionModel.id))
+            .filter(SubmissionModel.assignment_id == assignment.id)
+            .filter(SubmissionModel.student_id == student.id)
+        )
+        
+    """ The number of submissions the student has made to each assignment, keyed by assignment id. """
+    async def get_submission_attempts_by_assignment(
+        self,
+        student: StudentModel
+    ) -> Dict[int, int]:
+        attempts = (await self.session.execute(
+            select(SubmissionModel.assignment_id, func.count(SubmissionModel.id))
             .filter(SubmissionModel.student_id == student.id)
-        return student_submissions.count()
+            .group_by(SubmissionModel.assignment_id)
+        )).all()
+        return { assignment_id: count for (assignment_id, count) in attempts }
         
     async def get_submission_schema(self, submission: SubmissionModel) -> SubmissionSchema:
         submission_schema = DatabaseSubmissionSchema.from_orm(submission).dict()
-        submission_schema["active"] = await self.get_active_submission(submission.student, submission.assignment) == submission
+        submission_schema["active"] = await self.get_active_submission(
+            await submission.awaitable_attrs.student,
+            await submission.awaitable_attrs.assignment
+        ) == submission
         
         return SubmissionSchema(**submission_schema)
+
+    """
+    Builds schemas for many submissions without querying the active submission of each one.
+    `submissions` must contain every submission of each student to each assignment involved,
+    since a submission is active when it's the latest one made by `moment`.
+    """
+    async def get_submission_schemas(
+        self,
+        submissions: List[SubmissionModel],
+        moment: datetime | None = None
+    ) -> List[SubmissionSchema]:
+        if moment is None: moment = get_now_with_tzinfo()
+
+        active_submissions = {}
+        for submission in submissions:
+            if submission.submission_time > moment: continue
+            key = (submission.student_id, submission.assignment_id)
+            active = active_submissions.get(key)
+            if active is None or (submission.submission_time, submission.id) > (active.submission_time, active.id):
+                active_submissions[key] = submission
+
+        return [
+            SubmissionSchema(
+                **DatabaseSubmissionSchema.from_orm(submission).dict(),
+                active=active_submissions.get((submission.student_id, submission.assignment_id)) == submission
+            )
+            for submission in submissions
+        ]
+
+    """ Lists the submissions of every student to the assignment, newest first, keyed by the student's onyen. """
+    async def list_submission_schemas_by_student(
+        self,
+        assignment: AssignmentModel
+    ) -> Dict[str, List[SubmissionSchema]]:
+        from app.services import StudentService
+
+        students = await StudentService(self.session).list_students()
+        submissions = (await self.session.scalars(
+            select(SubmissionModel)
+            .filter_by(assignment_id=assignment.id)
+            .order_by(desc(SubmissionModel.submission_time))
+        )).all()
+        submission_schemas = await self.get_submission_schemas(submissions)
+
+        onyens = { student.id: student.onyen for student in students }
+        submissions_by_student = { student.onyen: [] for student in students }
+        for submission, submission_schema in zip(submissions, submission_schemas):
+            submissions_by_student[onyens[submission.student_id]].append(submission_schema)
+
+        return submissions_by_student
@@ -1,4 +1,5 @@
 from typing import List
+from sqlalchemy import select
 from app.events import dispatch
 from app.models import InstructorModel
 from app.events import CreateUserCrudEvent
@@ -8,7 +9,7 @@ from .user_service import UserService
 
 class InstructorService(UserService):
     async def list_instructors(self) -> List[InstructorModel]:
-        return self.session.query(InstructorModel).all()
+        return (await self.session.scalars(select(InstructorModel))).all()
 
     async def create_instructor(
         self,
@@ -37,7 +38,7 @@ class InstructorService(UserService):
             role=instructor_role
         )
         self.session.add(instructor)
-        self.session.commit()
+        await self.session.commit()
 
         cleanup_service = CleanupService.User(self.session, instructor)
 
@@ -1,4 +1,5 @@
 from typing import List
+from sqlalchemy import select, func
 from app.events import dispatch
 from app.models import StudentModel
 from app.events import CreateUserCrudEvent
@@ -10,7 +11,7 @@ class StudentService(UserService):
     async def list_students(
         self,
     ) -> List[StudentModel]:
-        return self.session.query(StudentModel).all()
+        return (await self.session.scalars(select(StudentModel))).all()
 
     async def create_student(
         self,
@@ -39,7 +40,7 @@ class StudentService(UserService):
             role=student_role
         )
         self.session.add(student)
-        self.session.commit()
+        await self.session.commit()
 
         cleanup_service = CleanupService.User(self.session, student)
 
@@ -80,7 +81,7 @@ class StudentService(UserService):
                 owner=onyen,
                 new_name=student_repo_name
             )
-            self.session.commit()
+            await self.session.commit()
 
         except Exception as e:
             await cleanup_service.undo_create_user(delete_database_user=True, delete_password_secret=True, delete_gitea_user=True)
@@ -96,7 +97,7 @@ class StudentService(UserService):
     
     async def set_fork_cloned(self, student: StudentModel) -> None:
         student.fork_cloned = True
-        self.session.commit()
+        await self.session.commit()
 
     async def get_total_students(self) -> int:
-        return self.session.query(StudentModel).count()
+        return await self.session.scalar(select(func.count()).select_from(StudentModel))
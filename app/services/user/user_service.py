@@ -1,4 +1,5 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.events import dispatch
 from app.models import UserModel, AutoPasswordAuthModel
 from app.events import DeleteUserCrudEvent
@@ -14,23 +15,23 @@ from app.core.exceptions import (
 )
 
 class UserService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
     async def get_user_by_id(self, id: int) -> UserModel:
-        user = self.session.query(UserModel).filter_by(id=id).first()
+        user = await self.session.scalar(select(UserModel).filter_by(id=id))
         if user is None:
             raise UserNotFoundException()
         return user
 
     async def get_user_by_onyen(self, onyen: str) -> UserModel:
-        user = self.session.query(UserModel).filter_by(onyen=onyen).first()
+        user = await self.session.scalar(select(UserModel).filter_by(onyen=onyen))
         if user is None:
             raise UserNotFoundException()
         return user
 
     async def get_user_by_email(self, email: str) -> UserModel:
-        user = self.session.query(UserModel).filter_by(email=email).first()
+        user = await self.session.scalar(select(UserModel).filter_by(email=email))
         if user is None:
             raise UserNotFoundException()
         return user
@@ -45,8 +46,8 @@ class UserService:
         return response
 
     async def login(self, onyen: str, autogen_password: str) -> RefreshTokenSchema:
-        user = self.session.query(UserModel).filter_by(onyen=onyen).first()
-        user_auth = self.session.query(AutoPasswordAuthModel).filter_by(onyen=onyen).first()
+        user = await self.session.scalar(select(UserModel).filter_by(onyen=onyen))
+        user_auth = await self.session.scalar(select(AutoPasswordAuthModel).filter_by(onyen=onyen))
         if not user or not user_auth:
             raise UserNotFoundException()
         if not PasswordHelper.verify_password(autogen_password, user_auth.autogen_password_hash):
@@ -65,7 +66,7 @@ class UserService:
             autogen_password_hash=autogen_password_hash
         )
         self.session.add(user_auth)
-        self.session.commit()
+        await self.session.commit()
 
         course = await CourseService(self.session).get_course()
         user = await self.get_user_by_onyen(onyen)
@@ -97,7 +98,7 @@ class UserService:
             await cleanup_service.undo_delete_user(create_password_secret=True)
             raise e
 
-        self.session.delete(user)
-        self.session.commit()
+        await self.session.delete(user)
+        await self.session.commit()
 
         dispatch(DeleteUserCrudEvent(user=user))
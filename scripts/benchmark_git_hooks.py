@@ -0,0 +1,115 @@
+"""
+Measures how long the master repository's pre-receive hook takes to check a push, as the number of
+assignments and the number of files in the push grow. The push modifies every file in the repository
+and adds as many new files, with every assignment open, so that both sub-hooks check every file.
+"""
+
+import asyncio
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from dateutil import tz
+from app.models import AssignmentModel
+from app.services import GiteaService
+
+def make_assignments(assignment_count: int) -> list[AssignmentModel]:
+    opened_date = datetime.now(tz.UTC) - timedelta(days=1)
+    return [
+        AssignmentModel(
+            name=f"hw{ i }",
+            directory_path=f"hw{ i }",
+            master_notebook_path=f"hw{ i }.ipynb",
+            manual_grading=False,
+            available_date=opened_date,
+            due_date=opened_date + timedelta(days=7),
+            created_date=opened_date
+        )
+        for i in range(assignment_count)
+    ]
+
+def git(repo: Path, *args: str, **kwargs) -> str:
+    return subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, text=True, **kwargs).stdout.strip()
+
+def make_push(repo: Path, assignment_count: int, file_count: int) -> str:
+    git(repo, "init", "-q")
+    git(repo, "config", "user.name", "benchmark")
+    git(repo, "config", "user.email", "benchmark@localhost")
+    # Spread the files evenly over the assignments, with a few overwritable and protected files among them.
+    names = ["README.md", "grades.csv"] + [f"file{ i }.py" for i in range(max(0, file_count // assignment_count - 2))]
+    paths = [
+        Path(f"hw{ i }") / "src" / name
+        for i in range(assignment_count) for name in names
+    ][:file_count]
+    for path in paths:
+        (repo / path).parent.mkdir(parents=True, exist_ok=True)
+        (repo / path).write_text("old\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "old")
+    oldrev = git(repo, "rev-parse", "HEAD")
+
+    for path in paths:
+        (repo / path).write_text("new\n")
+        (repo / path).with_suffix(".new").write_text("new\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "new")
+    newrev = git(repo, "rev-parse", "HEAD")
+
+    return f"{ oldrev } { newrev } refs/heads/main\n"
+
+async def benchmark(assignment_counts: list[int], file_counts: list[int], repeat: int):
+    gitea_service = GiteaService(session=None)
+    print(f"{ 'assignments':>12} { 'files':>8} { 'hook size':>10} { 'seconds':>8}")
+    for assignment_count in assignment_counts:
+        assignments = make_assignments(assignment_count)
+        hook_content = gitea_service._create_combined_hook_script({
+            "reject_protected": await gitea_service.get_reject_protected_files_hook(assignments),
+            "merge_control": await gitea_service.get_merge_control_hook(assignments)
+        })
+        for file_count in file_counts:
+            with tempfile.TemporaryDirectory() as repo:
+                repo = Path(repo)
+                push = make_push(repo, assignment_count, file_count)
+                hook_path = repo / ".git" / "hooks" / "pre-receive"
+                hook_path.write_text(hook_content)
+
+                durations = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    subprocess.run(["bash", hook_path], cwd=repo, input=push, capture_output=True, text=True)
+                    durations.append(time.perf_counter() - start)
+                print(f"{ assignment_count:>12} { file_count:>8} { len(hook_content):>10} { min(durations):>8.3f}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser("Benchmark the master repository's pre-receive hook")
+    parser.add_argument(
+        "--assignments",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="Numbers of assignments to benchmark"
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000],
+        help="Numbers of files in the repository to benchmark (the push modifies all of them and adds as many)"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Runs per measurement, of which the fastest is reported"
+    )
+
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(
+        assignment_counts=args.assignments,
+        file_counts=args.files,
+        repeat=args.repeat
+    ))
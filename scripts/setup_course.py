@@ -1,17 +1,17 @@
 import asyncio
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal
 from app.services import CourseService
 from app.core.exceptions import CourseAlreadyExistsException
 
 async def create_course(name: str):
-    session = SessionLocal()
+    session = AsyncSessionLocal()
     course_service = CourseService(session)
 
     await course_service.create_course(
         course_name=name
     )
 
-    session.close()
+    await session.close()
 
 if __name__ == "__main__":
     import argparse
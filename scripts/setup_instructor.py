@@ -1,17 +1,17 @@
 import asyncio
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal
 from app.services import InstructorService
 from app.core.exceptions import UserAlreadyExistsException
 
 async def create_instructor(onyen: str, first_name: str, last_name: str, email: str):
-    session = SessionLocal()
+    session = AsyncSessionLocal()
     await InstructorService(session).create_instructor(
         onyen=onyen,
         first_name=first_name,
         last_name=last_name,
         email=email
     )
-    session.close()
+    await session.close()
 
 if __name__ == "__main__":
     import argparse
@@ -1,11 +1,11 @@
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal
 from app.services import CourseService
 from app.services import InstructorService
 from app.core.config import settings
 from scripts import setup_course, setup_instructor
 
 async def setup_wizard_has_ran() -> bool:
-    with SessionLocal() as session:
+    async with AsyncSessionLocal() as session:
         try:
             await CourseService(session).get_course()
             return True
@@ -1,12 +1,9 @@
 import os
 import glob
 import uvicorn
-import asyncio
 from dotenv import load_dotenv
 from alembic.config import Config
 from alembic import command
-from app.services import LmsSyncService
-from app.database import SessionLocal
 
 def positive_int(value):
     ivalue = int(value)
@@ -48,14 +45,7 @@ def main(host: str, port: int, reload: bool, workers: int | None=None):
     alembic_cfg = Config("alembic.ini")
     command.upgrade(alembic_cfg, "head")
 
-
-    # Run setup wizard, if required.
-    try:
-        with SessionLocal() as session:
-            lms_sync_service = LmsSyncService(session)
-            asyncio.run(lms_sync_service.downsync())
-    except ValueError as e:
-        print(str(e))
+    # The LMS is synced (including the initial course setup) in the background once the app starts.
 
     # Start the application
     uvicorn.run("app.main:app", host=host, port=port, reload=reload, workers=workers)
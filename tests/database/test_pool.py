@@ -0,0 +1,29 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+from app.database.pool import InstrumentedAsyncQueuePool
+
+class TestInstrumentedAsyncQueuePool(unittest.TestCase):
+    def setUp(self):
+        def creator():
+            time.sleep(0.05)
+            return MagicMock()
+        self.pool = InstrumentedAsyncQueuePool(creator, pool_size=2, max_overflow=0)
+
+    def tearDown(self):
+        self.pool.dispose()
+
+    def test_opening_connections_is_not_counted_as_waiting(self):
+        connections = [self.pool.connect() for _ in range(2)]
+        metrics = self.pool.get_metrics()
+        self.assertEqual((metrics.checkouts, metrics.connects), (2, 2))
+        self.assertGreaterEqual(metrics.average_connect_seconds, 0.05)
+        self.assertLess(metrics.max_wait_seconds, 0.05)
+        for connection in connections: connection.close()
+
+    def test_reusing_connections_does_not_connect(self):
+        self.pool.connect().close()
+        self.pool.connect().close()
+        metrics = self.pool.get_metrics()
+        self.assertEqual((metrics.checkouts, metrics.connects), (2, 1))
+        self.assertEqual(metrics.idle, 1)
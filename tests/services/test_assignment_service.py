@@ -1,8 +1,8 @@
 from datetime import datetime, timedelta, date
 import json
 import unittest
-from unittest.mock import MagicMock, patch
-from sqlalchemy.orm import Session
+from unittest.mock import MagicMock, AsyncMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services import AssignmentService
 from app.models import AssignmentModel
 from app.schemas import UpdateAssignmentSchema
@@ -32,17 +32,20 @@ class TestAssignmentService(unittest.IsolatedAsyncioTestCase):
             "available": available_assignment,
         }
         
-        self.mock_session = MagicMock()
+        self.mock_session = MagicMock(spec=AsyncSession)
+        self.mock_session.scalar = AsyncMock()
+        self.mock_session.scalars = AsyncMock(return_value=MagicMock())
+        self.mock_session.commit = AsyncMock()
         self.assignment_service = AssignmentService(session=self.mock_session)
 
     async def test_get_assignment_by_id_success(self):
         mock_assignment = self.assignment_data["unavialable"]
         mock_assignment_2 = self.assignment_data["available"]
 
-        self.mock_session.query().filter_by().first.return_value = mock_assignment
+        self.mock_session.scalar.return_value = mock_assignment
         result_1 = await self.assignment_service.get_assignment_by_id(id=1)
 
-        self.mock_session.query().filter_by().first.return_value = mock_assignment_2
+        self.mock_session.scalar.return_value = mock_assignment_2
         result_2 = await self.assignment_service.get_assignment_by_id(id=2)
         
         self.assertEqual(result_1, mock_assignment)
@@ -50,7 +53,7 @@ class TestAssignmentService(unittest.IsolatedAsyncioTestCase):
 
 
     async def test_get_assignment_by_id_not_found(self):
-        self.mock_session.query().filter_by().first.return_value = None
+        self.mock_session.scalar.return_value = None
 
         with self.assertRaises(AssignmentNotFoundException):
             await self.assignment_service.get_assignment_by_id(id=1)
@@ -60,7 +63,7 @@ class TestAssignmentService(unittest.IsolatedAsyncioTestCase):
             self.assignment_data["available"],
             self.assignment_data["unavialable"]
         ]
-        self.mock_session.query().all.return_value = mock_assignments
+        self.mock_session.scalars.return_value.all.return_value = mock_assignments
 
         result = await self.assignment_service.get_assignments()
         
@@ -70,14 +73,14 @@ class TestAssignmentService(unittest.IsolatedAsyncioTestCase):
 
     async def test_get_assignment_by_name_success(self):
         mock_assignment = self.assignment_data["available"]
-        self.mock_session.query().filter_by().first.return_value = mock_assignment
+        self.mock_session.scalar.return_value = mock_assignment
 
         result = await self.assignment_service.get_assignment_by_name(name="available")
         
         self.assertEqual(result.name, mock_assignment.name)
 
     async def test_get_assignment_by_name_not_found(self):
-        self.mock_session.query().filter_by().first.return_value = None
+        self.mock_session.scalar.return_value = None
 
         with self.assertRaises(AssignmentNotFoundException):
             await self.assignment_service.get_assignment_by_name(name="available")
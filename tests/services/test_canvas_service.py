@@ -0,0 +1,248 @@
+import asyncio
+import unittest
+from contextlib import aclosing
+import httpx
+from unittest.mock import patch, PropertyMock
+from app.core.config import settings
+from app.core.exceptions import LMSBackendException, LMSUserNotFoundException
+from app.services import CanvasService
+from app.services.canvas_service import CanvasRequestScheduler, UserType, _roster_cache
+
+BASE_URL = "https://canvas.test/api/v1/"
+
+def page_links(*links: tuple[str, int | str]) -> dict[str, str]:
+    return { "Link": ", ".join(f'<{ BASE_URL }items?page={ page }&per_page=100>; rel="{ rel }"' for rel, page in links) }
+
+class CanvasServiceTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests: list[httpx.Request] = []
+        self.responses = []
+        self.scheduler = CanvasRequestScheduler()
+        self.scheduler_patch = patch("app.services.canvas_service._request_scheduler", self.scheduler)
+        self.scheduler_patch.start()
+        self.retry_delay_patch = patch.object(CanvasService, "_get_retry_delay", return_value=0)
+        self.retry_delay_patch.start()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return await self.respond(request)
+
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=BASE_URL)
+        self.client_patch = patch.object(CanvasService, "client", new_callable=PropertyMock, return_value=self.client)
+        self.client_patch.start()
+        self.canvas_service = CanvasService(db=None)
+
+    async def asyncTearDown(self):
+        self.client_patch.stop()
+        self.retry_delay_patch.stop()
+        self.scheduler_patch.stop()
+        await self.client.aclose()
+
+    async def respond(self, request: httpx.Request) -> httpx.Response:
+        return self.responses.pop(0)
+
+class TestCanvasPagination(CanvasServiceTestCase):
+    def test_numbered_page_urls(self):
+        res = httpx.Response(200, headers=page_links(("current", 1), ("next", 2), ("last", 4)))
+        self.assertEqual(CanvasService._get_numbered_page_urls(res), [
+            f"{ BASE_URL }items?page={ page }&per_page=100" for page in (2, 3, 4)
+        ])
+
+    def test_numbered_page_urls_without_last_page(self):
+        res = httpx.Response(200, headers=page_links(("current", 1), ("next", 2)))
+        self.assertIsNone(CanvasService._get_numbered_page_urls(res))
+
+    def test_numbered_page_urls_with_bookmarks(self):
+        res = httpx.Response(200, headers=page_links(("current", "first"), ("next", "bookmark:abc"), ("last", "bookmark:xyz")))
+        self.assertIsNone(CanvasService._get_numbered_page_urls(res))
+
+    def test_numbered_page_urls_on_last_page(self):
+        res = httpx.Response(200, headers=page_links(("current", 4), ("last", 4)))
+        self.assertIsNone(CanvasService._get_numbered_page_urls(res))
+
+    @patch.object(settings, "CANVAS_PAGINATION_CONCURRENCY", 2)
+    async def test_numbered_pages_are_prefetched_and_yielded_in_order(self):
+        in_flight = 0
+        max_in_flight = 0
+        async def respond(request: httpx.Request) -> httpx.Response:
+            nonlocal in_flight, max_in_flight
+            page = int(request.url.params.get("page", 1))
+            if page == 1:
+                return httpx.Response(200, json=[1], headers=page_links(("next", 2), ("last", 5)))
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            # Later pages come back out of order.
+            await asyncio.sleep(0.01 * (6 - page))
+            in_flight -= 1
+            return httpx.Response(200, json=[page])
+        self.respond = respond
+
+        self.assertEqual(await self.canvas_service._get_all("items"), [1, 2, 3, 4, 5])
+        self.assertEqual(len(self.requests), 5)
+        self.assertEqual(max_in_flight, 2)
+
+    async def test_bookmark_pages_are_followed_one_at_a_time(self):
+        self.responses = [
+            httpx.Response(200, json=[1], headers=page_links(("next", "bookmark:b"))),
+            httpx.Response(200, json=[2], headers=page_links(("next", "bookmark:c"))),
+            httpx.Response(200, json=[3])
+        ]
+        self.assertEqual(await self.canvas_service._get_all("items"), [1, 2, 3])
+        self.assertEqual([request.url.params["page"] for request in self.requests[1:]], ["bookmark:b", "bookmark:c"])
+
+    @patch.object(settings, "CANVAS_PAGINATION_CONCURRENCY", 3)
+    async def test_prefetches_are_finished_after_early_exit(self):
+        tasks_before = asyncio.all_tasks()
+        async def respond(request: httpx.Request) -> httpx.Response:
+            page = int(request.url.params.get("page", 1))
+            if page == 1:
+                return httpx.Response(200, json=[1], headers=page_links(("next", 2), ("last", 10)))
+            if page == 3:
+                return httpx.Response(404)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json=[page])
+        self.respond = respond
+
+        async with aclosing(self.canvas_service._get_paginated("items")) as pages:
+            async for page in pages:
+                if page == [2]: break
+        self.assertEqual(asyncio.all_tasks() - tasks_before, set())
+
+        # Page 3 fails while pages after it are still being fetched.
+        with self.assertRaises(LMSBackendException):
+            await self.canvas_service._get_all("items")
+        self.assertEqual(asyncio.all_tasks() - tasks_before, set())
+
+class TestCanvasRequestScheduler(CanvasServiceTestCase):
+    @patch.object(settings, "CANVAS_MAX_CONCURRENCY", 8)
+    @patch.object(settings, "CANVAS_RATE_LIMIT_LOW_WATERMARK", 200)
+    def test_concurrency_is_raised_additively_and_lowered_multiplicatively(self):
+        scheduler = CanvasRequestScheduler()
+        scheduler.concurrency_limit = 4
+
+        scheduler.record_response(httpx.Response(200, headers={ "X-Rate-Limit-Remaining": "500" }))
+        self.assertEqual(scheduler.concurrency_limit, 5)
+        for _ in range(10):
+            scheduler.record_response(httpx.Response(200, headers={ "X-Rate-Limit-Remaining": "500" }))
+        self.assertEqual(scheduler.concurrency_limit, 8)
+
+        scheduler.record_response(httpx.Response(200, headers={ "X-Rate-Limit-Remaining": "150", "X-Request-Cost": "2.5" }))
+        self.assertEqual(scheduler.concurrency_limit, 4)
+        self.assertEqual(scheduler.remaining_quota, 150)
+        self.assertEqual(scheduler.last_request_cost, 2.5)
+
+        for _ in range(5):
+            scheduler.record_throttle()
+        self.assertEqual(scheduler.concurrency_limit, 1)
+
+    def test_responses_without_quota_leave_concurrency_alone(self):
+        scheduler = CanvasRequestScheduler()
+        scheduler.concurrency_limit = 3
+        scheduler.record_response(httpx.Response(200))
+        self.assertEqual(scheduler.concurrency_limit, 3)
+
+    async def test_slot_limits_requests_in_flight(self):
+        scheduler = CanvasRequestScheduler()
+        scheduler.concurrency_limit = 2
+        in_flight = 0
+        max_in_flight = 0
+        async def request():
+            nonlocal in_flight, max_in_flight
+            async with scheduler.slot():
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+                await asyncio.sleep(0.01)
+                in_flight -= 1
+        await asyncio.gather(*[request() for _ in range(6)])
+        self.assertEqual(max_in_flight, 2)
+
+    async def test_429_is_retried(self):
+        self.responses = [httpx.Response(429), httpx.Response(200, json={ "id": 1 })]
+        self.assertEqual(await self.canvas_service._make_request("POST", "items"), { "id": 1 })
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual((self.scheduler.throttled, self.scheduler.retries), (1, 1))
+
+    async def test_403_rate_limit_exceeded_is_retried(self):
+        self.responses = [httpx.Response(403, text="403 Forbidden (Rate Limit Exceeded)"), httpx.Response(200, json={ "id": 1 })]
+        self.assertEqual(await self.canvas_service._make_request("GET", "items"), { "id": 1 })
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.scheduler.throttled, 1)
+
+    async def test_other_403_is_not_retried(self):
+        self.responses = [httpx.Response(403, text="unauthorized")]
+        with self.assertRaises(LMSBackendException):
+            await self.canvas_service._make_request("GET", "items")
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.scheduler.throttled, 0)
+
+    async def test_server_errors_are_only_retried_for_idempotent_methods(self):
+        self.responses = [httpx.Response(500), httpx.Response(200, json={})]
+        await self.canvas_service._make_request("GET", "items")
+        self.assertEqual(len(self.requests), 2)
+
+        self.requests.clear()
+        self.responses = [httpx.Response(500), httpx.Response(200, json={})]
+        with self.assertRaises(LMSBackendException):
+            await self.canvas_service._make_request("POST", "items")
+        self.assertEqual(len(self.requests), 1)
+
+    @patch.object(settings, "CANVAS_MAX_RETRIES", 2)
+    async def test_gives_up_after_max_retries(self):
+        self.responses = [httpx.Response(429) for _ in range(3)]
+        with self.assertRaises(LMSBackendException):
+            await self.canvas_service._make_request("GET", "items")
+        self.assertEqual(len(self.requests), 3)
+
+@patch.dict("app.services.canvas_service._roster_cache", clear=True)
+@patch.dict("app.services.canvas_service._roster_locks", clear=True)
+class TestCanvasRoster(CanvasServiceTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.students = [{ "id": 1, "sis_user_id": "111" }]
+        self.respond = self.respond_with_students
+
+    def age_roster(self, seconds: float):
+        _roster_cache[UserType.STUDENT].fetched_at -= seconds
+
+    async def respond_with_students(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=self.students)
+
+    async def test_known_pid_uses_cached_roster(self):
+        await self.canvas_service.get_student_by_pid("111")
+        await self.canvas_service.get_student_by_pid("111")
+        self.assertEqual(len(self.requests), 1)
+
+    @patch.object(settings, "CANVAS_ROSTER_REFRESH_SECONDS", 30)
+    async def test_unknown_pid_refetches_at_most_once_per_refresh_window(self):
+        await self.canvas_service.get_student_by_pid("111")
+        # The roster was just fetched, so it isn't fetched again.
+        with self.assertRaises(LMSUserNotFoundException):
+            await self.canvas_service.get_student_by_pid("222")
+        self.assertEqual(len(self.requests), 1)
+
+        self.age_roster(31)
+        self.students.append({ "id": 2, "sis_user_id": "222" })
+        with self.assertRaises(LMSUserNotFoundException):
+            await self.canvas_service.get_student_by_pid("333")
+        self.assertEqual(len(self.requests), 2)
+        # The roster fetched for the miss picked up the new student.
+        self.assertEqual((await self.canvas_service.get_student_by_pid("222"))["id"], 2)
+        self.assertEqual(len(self.requests), 2)
+
+    @patch.object(settings, "CANVAS_ROSTER_REFRESH_SECONDS", 30)
+    async def test_missing_pid_is_remembered_until_roster_expires(self):
+        await self.canvas_service.get_student_by_pid("111")
+        self.age_roster(31)
+        for _ in range(3):
+            with self.assertRaises(LMSUserNotFoundException):
+                await self.canvas_service.get_student_by_pid("222")
+        self.assertEqual(len(self.requests), 2)
+
+        self.age_roster(settings.CANVAS_ROSTER_CACHE_TTL_SECONDS + 1)
+        self.students.append({ "id": 2, "sis_user_id": "222" })
+        self.assertEqual((await self.canvas_service.get_student_by_pid("222"))["id"], 2)
+        self.assertEqual(len(self.requests), 3)
+
+    async def test_concurrent_lookups_share_a_fetch(self):
+        await asyncio.gather(*[self.canvas_service.get_student_by_pid("111") for _ in range(5)])
+        self.assertEqual(len(self.requests), 1)
@@ -0,0 +1,132 @@
+import asyncio
+import subprocess
+import tempfile
+import unittest
+import httpx
+import shlex
+from unittest.mock import patch, PropertyMock
+from app.core.utils.disk_cache import DiskLRUCache
+from app.services import GiteaService
+
+COMMIT_ID = "a" * 40
+
+class TestGiteaServiceArchives(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = DiskLRUCache(self.directory.name, max_size_bytes=1024 * 1024)
+        self.cache_patch = patch("app.services.gitea_service.archive_cache", self.cache)
+        self.cache_patch.start()
+        self.upstream_finished = asyncio.Event()
+        self.release_last_chunk = asyncio.Event()
+        self.requests = 0
+        self.fail_midway = False
+
+        async def body():
+            yield b"first"
+            await self.release_last_chunk.wait()
+            if self.fail_midway:
+                raise httpx.ReadError("connection reset")
+            yield b"last"
+            self.upstream_finished.set()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests += 1
+            return httpx.Response(200, content=body())
+
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://gitea")
+        self.client_patch = patch.object(GiteaService, "client", new_callable=PropertyMock, return_value=self.client)
+        self.client_patch.start()
+        self.gitea_service = GiteaService(session=None)
+
+    async def asyncTearDown(self):
+        self.client_patch.stop()
+        self.cache_patch.stop()
+        await self.client.aclose()
+        self.directory.cleanup()
+
+    async def test_cache_miss_forwards_chunks_before_the_archive_is_fetched(self):
+        (chunks, size) = await self.gitea_service.stream_repository_archive("repo", "owner", COMMIT_ID)
+        self.assertIsNone(size)
+
+        self.assertEqual(await chunks.__anext__(), b"first")
+        self.assertFalse(self.upstream_finished.is_set())
+        # Nothing is cached until the whole archive has been forwarded.
+        self.assertIsNone(self.cache.get(DiskLRUCache.make_key("owner", "repo", COMMIT_ID, "")))
+
+        self.release_last_chunk.set()
+        self.assertEqual([chunk async for chunk in chunks], [b"last"])
+        self.assertEqual(self.cache.get(DiskLRUCache.make_key("owner", "repo", COMMIT_ID, "")), b"firstlast")
+
+        # The next download is served from the cache.
+        (chunks, size) = await self.gitea_service.stream_repository_archive("repo", "owner", COMMIT_ID)
+        self.assertEqual(b"".join([chunk async for chunk in chunks]), b"firstlast")
+        self.assertEqual(size, len(b"firstlast"))
+        self.assertEqual(self.requests, 1)
+
+    async def test_interrupted_stream_is_not_cached(self):
+        self.fail_midway = True
+        self.release_last_chunk.set()
+        (chunks, _) = await self.gitea_service.stream_repository_archive("repo", "owner", COMMIT_ID)
+        with self.assertRaises(httpx.ReadError):
+            async for _ in chunks: pass
+        self.assertIsNone(self.cache.get(DiskLRUCache.make_key("owner", "repo", COMMIT_ID, "")))
+
+    async def test_abandoned_stream_is_not_cached(self):
+        (chunks, _) = await self.gitea_service.stream_repository_archive("repo", "owner", COMMIT_ID)
+        self.assertEqual(await chunks.__anext__(), b"first")
+        await chunks.aclose()
+        self.assertIsNone(self.cache.get(DiskLRUCache.make_key("owner", "repo", COMMIT_ID, "")))
+
+    async def test_non_commit_treeish_is_forwarded_without_caching(self):
+        self.release_last_chunk.set()
+        (chunks, size) = await self.gitea_service.stream_repository_archive("repo", "owner", "main")
+        self.assertEqual(b"".join([chunk async for chunk in chunks]), b"firstlast")
+        self.assertIsNone(size)
+        self.assertEqual(list(self.cache.directory.iterdir()) if self.cache.directory.exists() else [], [])
+
+    async def test_download_closes_temporary_file_on_error(self):
+        self.fail_midway = True
+        self.release_last_chunk.set()
+        opened_files = []
+        original_temporary_file = tempfile.TemporaryFile
+        def temporary_file(*args, **kwargs):
+            f = original_temporary_file(*args, **kwargs)
+            opened_files.append(f)
+            return f
+
+        with patch("app.services.gitea_service.tempfile.TemporaryFile", temporary_file):
+            with self.assertRaises(httpx.ReadError):
+                await self.gitea_service.download_repository("repo", "owner", "main")
+        self.assertEqual(len(opened_files), 1)
+        self.assertTrue(opened_files[0].closed)
+
+class TestGiteaServiceHookGlobs(unittest.TestCase):
+    def _matches(self, globs: list[str], paths: list[str]) -> dict[str, bool]:
+        matchers = GiteaService._create_assignment_glob_matchers("ids", "is_match", { "hw1": globs })
+        checks = "\n".join([f"is_match_0 { shlex.quote(path) } && echo 1 || echo 0" for path in paths])
+        output = subprocess.run(["bash", "-c", matchers + "\n" + checks], capture_output=True, text=True, check=True).stdout
+        return dict(zip(paths, [line == "1" for line in output.splitlines()]))
+
+    def test_wildcards(self):
+        self.assertEqual(self._matches(["*.py", "q?.ipynb"], ["a.py", "dir/a.py", "q1.ipynb", "q10.ipynb", "a.txt"]), {
+            "a.py": True, "dir/a.py": True, "q1.ipynb": True, "q10.ipynb": False, "a.txt": False
+        })
+
+    def test_bracket_expressions(self):
+        self.assertEqual(self._matches(
+            ["data/[a-z]*.csv", "[!0-9]x", "[[:digit:]] y"],
+            ["data/b1.csv", "data/B1.csv", "ax", "1x", "2 y", "[a-z]x"]
+        ), {
+            "data/b1.csv": True, "data/B1.csv": False, "ax": True, "1x": False, "2 y": True,
+            # The bracket expression isn't matched literally.
+            "[a-z]x": False
+        })
+
+    def test_shell_characters_are_not_interpreted(self):
+        self.assertEqual(self._matches(
+            ["a[;'b]c", "$(echo x).txt", "[abc"],
+            ["a;c", "a'c", "abc", "x.txt", "$(echo x).txt", "[abc", "a"]
+        ), {
+            "a;c": True, "a'c": True, "abc": True, "x.txt": False, "$(echo x).txt": True, "[abc": True, "a": False
+        })
+
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core.config import settings
+from app.services import GradingJobService
+
+class TestGradingJobService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.mock_session = MagicMock()
+        self.mock_session.scalars = AsyncMock()
+        session_local = MagicMock()
+        session_local.return_value.__aenter__ = AsyncMock(return_value=self.mock_session)
+        session_local.return_value.__aexit__ = AsyncMock(return_value=None)
+        self.session_local_patch = patch("app.services.grading_job_service.AsyncSessionLocal", session_local)
+        self.session_local_patch.start()
+
+    async def asyncTearDown(self):
+        self.session_local_patch.stop()
+
+    @patch.object(settings, "GRADING_JOB_HEARTBEAT_SECONDS", 0.01)
+    @patch.object(GradingJobService, "start_grading_job")
+    async def test_resume_job_after_restart_within_stale_window(self, mock_start_grading_job):
+        # The worker restarted before the job it was running went stale, so the job isn't claimable
+        # on the first pass. Once its heartbeat goes stale, a later pass resumes it.
+        self.mock_session.scalars.side_effect = [MagicMock(all=MagicMock(return_value=ids)) for ids in ([], [], [1])] \
+            + [MagicMock(all=MagicMock(return_value=[]))] * 100
+
+        GradingJobService.start_periodic_resume()
+        await asyncio.sleep(0.2)
+        await GradingJobService.stop_periodic_resume()
+
+        mock_start_grading_job.assert_called_once_with(1)
+        query = str(self.mock_session.scalars.call_args_list[0].args[0])
+        self.assertIn("grading_job.last_updated_date <", query)
+
+    @patch.object(GradingJobService, "_fail_grading_job")
+    @patch.object(GradingJobService, "_execute_grading_job")
+    @patch.object(GradingJobService, "get_grading_job_by_id")
+    @patch.object(GradingJobService, "_claim_grading_job")
+    async def test_failed_job_is_marked_failed_in_a_fresh_session(
+        self, mock_claim_grading_job, mock_get_grading_job_by_id, mock_execute_grading_job, mock_fail_grading_job
+    ):
+        mock_claim_grading_job.return_value = True
+        mock_get_grading_job_by_id.return_value = MagicMock(id=3)
+        mock_execute_grading_job.side_effect = Exception("connection lost")
+
+        await GradingJobService._run_grading_job(3)
+
+        mock_fail_grading_job.assert_awaited_once_with(3, "connection lost")
+        # The job's own session is left alone, since it may be what failed.
+        self.mock_session.commit.assert_not_called()
+
+    @patch.object(settings, "GRADING_JOB_HEARTBEAT_SECONDS", 0.01)
+    @patch.object(GradingJobService, "start_grading_job")
+    async def test_periodic_resume_survives_errors(self, mock_start_grading_job):
+        self.mock_session.scalars.side_effect = [Exception("database unavailable"), MagicMock(all=MagicMock(return_value=[2]))] \
+            + [MagicMock(all=MagicMock(return_value=[]))] * 100
+
+        GradingJobService.start_periodic_resume()
+        await asyncio.sleep(0.2)
+        await GradingJobService.stop_periodic_resume()
+
+        mock_start_grading_job.assert_called_once_with(2)
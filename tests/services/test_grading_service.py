@@ -0,0 +1,38 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+from app.models import AssignmentModel, SubmissionGradeResultModel
+from app.services.grading_service import GradingService
+
+class TestGradingService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.mock_session = MagicMock()
+        self.grading_service = GradingService(self.mock_session)
+        self.assignment = AssignmentModel(id=1, directory_path="hw1", master_notebook_path="hw1.ipynb", manual_grading=False)
+
+    def test_grading_hash_depends_on_what_is_graded(self):
+        grading_hash = GradingService.get_grading_hash("config", self.assignment)
+        other_assignment = AssignmentModel(id=2, directory_path="hw1", master_notebook_path="hw1.ipynb", manual_grading=False)
+        renamed_assignment = AssignmentModel(id=1, directory_path="hw1-renamed", master_notebook_path="hw1.ipynb", manual_grading=False)
+        other_notebook = AssignmentModel(id=1, directory_path="hw1", master_notebook_path="main.ipynb", manual_grading=False)
+
+        self.assertEqual(grading_hash, GradingService.get_grading_hash("config", self.assignment))
+        for other_hash in (
+            GradingService.get_grading_hash("other config", self.assignment),
+            GradingService.get_grading_hash("config", other_assignment),
+            GradingService.get_grading_hash("config", renamed_assignment),
+            GradingService.get_grading_hash("config", other_notebook)
+        ):
+            self.assertNotEqual(grading_hash, other_hash)
+
+    async def test_stored_grades_match_commit_and_grading_hash(self):
+        submission = MagicMock(commit_id="abc", graded=False)
+        other_submission = MagicMock(commit_id="abc", graded=False)
+        self.mock_session.scalars = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=[
+            SubmissionGradeResultModel(commit_id="abc", config_hash="hash-1", score=1, total_points=2, comments="")
+        ])))
+
+        # Both submissions are of the same commit, but only one was graded the same way.
+        stored_grades = await self.grading_service.get_stored_submission_grades({ submission: "hash-1", other_submission: "hash-2" })
+
+        self.assertEqual(list(stored_grades.keys()), [submission])
+        self.assertEqual((stored_grades[submission].score, stored_grades[submission].total_points), (1, 2))
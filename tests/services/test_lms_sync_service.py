@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock, patch
+from app.models.user import UserType
+from app.services.lms_sync_service import LmsSyncService, PENDING_ENROLLMENT_REASON
+
+class TestLmsSyncService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.mock_session = MagicMock()
+        self.lms_sync_service = LmsSyncService(self.mock_session)
+        self.lms_sync_service.canvas_service = MagicMock()
+        self.lms_sync_service.student_service = MagicMock()
+        self.lms_sync_service.ldap_service = MagicMock()
+        self.lms_sync_service.canvas_service.associate_pids_to_users = AsyncMock(return_value=[])
+        self.lms_sync_service.student_service.delete_user = AsyncMock()
+        self.lms_sync_service.ldap_service.get_users_info = AsyncMock(return_value={})
+
+    @patch.object(LmsSyncService, "_store_fingerprints", new_callable=AsyncMock)
+    @patch.object(LmsSyncService, "_get_lms_users", new_callable=AsyncMock)
+    async def test_enrolled_user_missing_email_is_not_deleted(self, mock_get_lms_users, mock_store_fingerprints):
+        mock_get_lms_users.return_value = [
+            { "sis_user_id": "111", "name": "Alice", "email": None },
+            { "sis_user_id": "222", "name": "Bob", "email": None }
+        ]
+        self.lms_sync_service.canvas_service.get_pids_by_onyen = AsyncMock(return_value={ "alice": "111" })
+        alice = MagicMock(onyen="alice")
+        alice.name = "Alice"
+        self.mock_session.scalars = AsyncMock(side_effect=[[alice], []])
+
+        report = await self.lms_sync_service.sync_students(refresh_roster=False)
+
+        self.lms_sync_service.student_service.delete_user.assert_not_awaited()
+        self.assertEqual(report.deleted, [])
+        self.assertEqual(report.existing, ["alice"])
+        # Bob can't be created without an email, so he's skipped until his enrollment is complete.
+        self.assertEqual([(issue.pid, issue.reason) for issue in report.skipped], [("222", PENDING_ENROLLMENT_REASON)])
+        self.lms_sync_service.ldap_service.get_users_info.assert_awaited_once_with([])
+
+    @patch.object(LmsSyncService, "_store_fingerprints", new_callable=AsyncMock)
+    @patch.object(LmsSyncService, "_get_lms_users", new_callable=AsyncMock)
+    async def test_user_who_left_is_deleted(self, mock_get_lms_users, mock_store_fingerprints):
+        mock_get_lms_users.return_value = [{ "sis_user_id": None, "name": "Pending", "email": None }]
+        self.lms_sync_service.canvas_service.get_pids_by_onyen = AsyncMock(return_value={ "alice": "111" })
+        self.lms_sync_service.canvas_service.unassociate_pid_from_user = AsyncMock()
+        alice = MagicMock(onyen="alice")
+        self.mock_session.scalars = AsyncMock(side_effect=[[alice], []])
+
+        report = await self.lms_sync_service.sync_students(refresh_roster=False)
+
+        self.lms_sync_service.student_service.delete_user.assert_awaited_once_with("alice")
+        self.assertEqual(report.deleted, ["alice"])
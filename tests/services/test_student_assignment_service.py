@@ -1,120 +1,117 @@
 import datetime
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock
 from app.models.course import CourseModel
 from app.services import StudentAssignmentService
 from app.models import AssignmentModel, StudentModel, ExtraTimeModel
+from app.enums.assignment_status import AssignmentStatus
 from app.core.exceptions import (
     AssignmentNotOpenException,
-    AssignmentNotCreatedException,
+    AssignmentNotPublishedException,
     AssignmentClosedException
 )
 
 class TestStudentAssignmentService(unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
         self.mock_session = MagicMock()
+        self.mock_session.scalar = AsyncMock(return_value=None)
         self.mock_student = MagicMock(spec=StudentModel)
-        self.mock_assignment = MagicMock(spec=AssignmentModel)
+        # AssignmentModel can't be used as a mock spec, since its hybrid properties are evaluated against the class.
+        self.mock_assignment = AssignmentModel(id=1, name="hw1", max_attempts=None)
         self.mock_course = MagicMock(spec=CourseModel)
         self.mock_extra_time_model = MagicMock(spec=ExtraTimeModel)
-    
-    def test_get_adjusted_available_date_without_extra_time(self):
-        self.mock_assignment.available_date = datetime.datetime(2022, 1, 1)
-        self.mock_session.query().filter().first.return_value = None
 
-        student_assignment_service = StudentAssignmentService(
+    def _make_service(self, **kwargs) -> StudentAssignmentService:
+        return StudentAssignmentService(
             session=self.mock_session,
             student_model=self.mock_student,
             assignment_model=self.mock_assignment,
-            course_model=self.mock_course
+            course_model=self.mock_course,
+            **kwargs
         )
-        result = student_assignment_service.get_adjusted_available_date()
+    
+    async def test_get_adjusted_available_date_without_extra_time(self):
+        self.mock_assignment.available_date = datetime.datetime(2022, 1, 1)
+        # The extra time isn't passed in, so it's queried.
+        self.mock_session.scalar.return_value = None
+
+        student_assignment_service = self._make_service()
+        result = await student_assignment_service.get_adjusted_available_date()
 
         self.assertEqual(result, datetime.datetime(2022, 1, 1))
+        self.mock_session.scalar.assert_awaited_once()
 
-    def test_get_adjusted_available_date_with_extra_time(self):
+    async def test_get_adjusted_available_date_with_extra_time(self):
         self.mock_assignment.available_date = datetime.datetime(2022, 1, 1)
         self.mock_extra_time_model.deferred_time = datetime.timedelta(days=1)
-        self.mock_session.query().filter().first.return_value = self.mock_extra_time_model
+        self.mock_session.scalar.return_value = self.mock_extra_time_model
 
-        student_assignment_service = StudentAssignmentService(
-            session=self.mock_session,
-            student_model=self.mock_student,
-            assignment_model=self.mock_assignment,
-            course_model=self.mock_course
-        )
-        result = student_assignment_service.get_adjusted_available_date()
+        student_assignment_service = self._make_service()
+        result = await student_assignment_service.get_adjusted_available_date()
 
         expected_date = datetime.datetime(2022, 1, 2)
         self.assertEqual(result, expected_date)
 
     async def test_get_adjusted_due_date_without_due_date(self):
         self.mock_assignment.due_date = None
+        self.mock_course.end_at = None
 
-        student_assignment_service = StudentAssignmentService(
-            session=self.mock_session,
-            student_model=self.mock_student,
-            assignment_model=self.mock_assignment,
-            course_model=self.mock_course
-        )
-        result = student_assignment_service.get_adjusted_due_date()
+        student_assignment_service = self._make_service()
+        result = await student_assignment_service.get_adjusted_due_date()
 
         self.assertEqual(result, None)
+        self.mock_session.scalar.assert_not_awaited()
 
-    def test_get_adjusted_due_date_with_extra_time(self):
+    async def test_get_adjusted_due_date_with_extra_time(self):
         self.mock_assignment.due_date = datetime.datetime(2023, 1, 1)
         self.mock_extra_time_model.deferred_time = datetime.timedelta(days=1)
         self.mock_extra_time_model.extra_time = datetime.timedelta(days=1)
         self.mock_student.base_extra_time = datetime.timedelta(days=1)
-        self.mock_session.query().filter().first.return_value = self.mock_extra_time_model
 
-        student_assignment_service = StudentAssignmentService(
-            session=self.mock_session,
-            student_model=self.mock_student,
-            assignment_model=self.mock_assignment,
-            course_model=self.mock_course
-        )
-        result = student_assignment_service.get_adjusted_due_date()
+        # Extra time that was loaded in bulk is used as is.
+        student_assignment_service = self._make_service(extra_time_model=self.mock_extra_time_model)
+        result = await student_assignment_service.get_adjusted_due_date()
 
         expected_date = datetime.datetime(2023, 1, 4)
         self.assertEqual(result, expected_date)
+        self.mock_session.scalar.assert_not_awaited()
 
-    def test_get_adjusted_due_date_without_extra_time(self):
+    async def test_get_adjusted_due_date_without_extra_time(self):
         self.mock_assignment.due_date = datetime.datetime(2023, 1, 1)
         self.mock_student.base_extra_time = datetime.timedelta(days=1)
-        self.mock_session.query().filter().first.return_value = None
 
-        student_assignment_service = StudentAssignmentService(
-            session=self.mock_session,
-            student_model=self.mock_student,
-            assignment_model=self.mock_assignment,
-            course_model=self.mock_course
-        )
-        result = student_assignment_service.get_adjusted_due_date()
+        # Passing None means the student is known to have no extra time.
+        student_assignment_service = self._make_service(extra_time_model=None)
+        result = await student_assignment_service.get_adjusted_due_date()
 
         expected_date = datetime.datetime(2023, 1, 2)
         self.assertEqual(result, expected_date)
+        self.mock_session.scalar.assert_not_awaited()
 
-    #Testing get_is_available & get_is_closed when assignment is not created
-    def test_assignment_not_created(self):
-        self.mock_assignment.is_published = False
+    async def test_extra_time_is_queried_once(self):
+        self.mock_assignment.available_date = datetime.datetime(2022, 1, 1)
+        self.mock_assignment.due_date = datetime.datetime(2023, 1, 1)
+        self.mock_student.base_extra_time = datetime.timedelta(0)
+        self.mock_session.scalar.return_value = None
 
-        student_assignment_service = StudentAssignmentService(
-            session=self.mock_session,
-            student_model=self.mock_student,
-            assignment_model=self.mock_assignment,
-            course_model=self.mock_course
-        )
+        student_assignment_service = self._make_service()
+        await student_assignment_service.get_adjusted_available_date()
+        await student_assignment_service.get_adjusted_due_date()
 
-        result_is_available = student_assignment_service._get_is_available()
-        result_is_closed = student_assignment_service._get_is_closed()
+        self.mock_session.scalar.assert_awaited_once()
 
-        self.assertEqual(result_is_available, False)
-        self.assertEqual(result_is_closed, False)
+    #Testing get_assignment_status when assignment is not published
+    async def test_assignment_not_published(self):
+        self.mock_assignment.is_published = False
+
+        student_assignment_service = self._make_service()
+        result = await student_assignment_service.get_assignment_status()
 
-    def test_get_is_available(self):
+        self.assertEqual(result, AssignmentStatus.UNPUBLISHED)
+        self.mock_session.scalar.assert_not_awaited()
+
+    async def test_get_is_available(self):
         self.mock_assignment.is_published = True
-        self.mock_session.query().filter().first.return_value = None
         self.mock_student.base_extra_time = datetime.timedelta(days=0)
         
         # available_date is in the past, the due_date is in the future, and the scalar is in the middle
@@ -123,25 +120,25 @@ class TestStudentAssignmentService(unittest.IsolatedAsyncioTestCase):
         self.mock_assignment.due_date = datetime.datetime(2024, 1, 2)
         self.mock_session.scalar.return_value = datetime.datetime(2023, 1, 2)
 
-        student_assignment_service = StudentAssignmentService(
-            session=self.mock_session,
-            student_model=self.mock_student,
-            assignment_model=self.mock_assignment,
-            course_model=self.mock_course
-        )
-        result_get_is_available = student_assignment_service._get_is_available()
-        result_get_is_closed = student_assignment_service._get_is_closed()
+        student_assignment_service = self._make_service(extra_time_model=None)
+        result_get_is_available = await student_assignment_service._get_is_available()
+        result_get_is_closed = await student_assignment_service._get_is_closed()
 
         self.assertEqual(result_get_is_available, True)
         self.assertEqual(result_get_is_closed, False)
+        # The database clock is only read once.
+        self.mock_session.scalar.assert_awaited_once()
 
-        # available_date is in the future, the due_date is in the past, and the scalar is in the middle
+        # available_date is in the future, the due_date is in the past, and the current timestamp is in the middle
         self.mock_assignment.available_date = datetime.datetime(2024, 1, 1)
         self.mock_assignment.due_date = datetime.datetime(2022, 1, 2)
-        self.mock_session.scalar.return_value = datetime.datetime(2023, 1, 2)
 
-        result_get_is_available = student_assignment_service._get_is_available()
-        result_get_is_closed = student_assignment_service._get_is_closed()
+        student_assignment_service = self._make_service(
+            extra_time_model=None,
+            current_timestamp=datetime.datetime(2023, 1, 2)
+        )
+        result_get_is_available = await student_assignment_service._get_is_available()
+        result_get_is_closed = await student_assignment_service._get_is_closed()
 
         self.assertEqual(result_get_is_available, False)
         self.assertEqual(result_get_is_closed, True)
@@ -149,31 +146,23 @@ class TestStudentAssignmentService(unittest.IsolatedAsyncioTestCase):
     async def test_validate_student_can_submit(self):
         self.mock_assignment.is_published = False
 
-        student_assignment_service = StudentAssignmentService(
-            session=self.mock_session,
-            student_model=self.mock_student,
-            assignment_model=self.mock_assignment,
-            course_model=self.mock_course
-        )
+        student_assignment_service = self._make_service()
 
-        with self.assertRaises(AssignmentNotCreatedException):
+        with self.assertRaises(AssignmentNotPublishedException):
             await student_assignment_service.validate_student_can_submit()
 
     async def test_validate_student_can_submit_not_open(self):
         self.mock_assignment.is_published = True
-        self.mock_session.query().filter().first.return_value = None
         self.mock_student.base_extra_time = datetime.timedelta(days=0)
         
-        # available_date is in the future, the due_date is in the past, and the scalar is in the middle
+        # available_date is in the future, the due_date is in the past, and the current timestamp is in the middle
         # allows us to test the get_is_available method & the get_adjusted_available_date method at once
         self.mock_assignment.available_date = datetime.datetime(2024, 1, 1)
-        self.mock_session.scalar.return_value = datetime.datetime(2023, 1, 2)
+        self.mock_assignment.due_date = datetime.datetime(2022, 6, 2)
 
-        student_assignment_service = StudentAssignmentService(
-            session=self.mock_session,
-            student_model=self.mock_student,
-            assignment_model=self.mock_assignment,
-            course_model=self.mock_course
+        student_assignment_service = self._make_service(
+            extra_time_model=None,
+            current_timestamp=datetime.datetime(2023, 1, 2)
         )
 
         with self.assertRaises(AssignmentNotOpenException):
@@ -181,25 +170,36 @@ class TestStudentAssignmentService(unittest.IsolatedAsyncioTestCase):
 
     async def test_validate_student_can_submit_closed(self):
         self.mock_assignment.is_published = True
-        self.mock_session.query().filter().first.return_value = None
         self.mock_student.base_extra_time = datetime.timedelta(days=0)
         
-        # available_date is in the past, the due_date is in the past, and the scalar is in the future
+        # available_date is in the past, the due_date is in the past, and the current timestamp is in the future
         # allows us to test the get_is_closed method & the get_adjusted_due_date method at once
         self.mock_assignment.available_date = datetime.datetime(2022, 1, 1)
         self.mock_assignment.due_date = datetime.datetime(2022, 6, 2)
-        self.mock_session.scalar.return_value = datetime.datetime(2023, 1, 2)
 
-        student_assignment_service = StudentAssignmentService(
-            session=self.mock_session,
-            student_model=self.mock_student,
-            assignment_model=self.mock_assignment,
-            course_model=self.mock_course
+        student_assignment_service = self._make_service(
+            extra_time_model=None,
+            current_timestamp=datetime.datetime(2023, 1, 2)
         )
 
         with self.assertRaises(AssignmentClosedException):
             await student_assignment_service.validate_student_can_submit()
 
+    async def test_validate_student_can_submit_uses_passed_attempts(self):
+        self.mock_assignment.is_published = True
+        self.mock_assignment.max_attempts = 2
+        self.mock_student.base_extra_time = datetime.timedelta(days=0)
+        self.mock_assignment.available_date = datetime.datetime(2022, 1, 1)
+        self.mock_assignment.due_date = datetime.datetime(2024, 1, 1)
+
+        student_assignment_service = self._make_service(
+            extra_time_model=None,
+            current_timestamp=datetime.datetime(2023, 1, 2),
+            current_attempts=1
+        )
+        await student_assignment_service.validate_student_can_submit()
+        self.mock_session.scalar.assert_not_awaited()
+
 
 suite = unittest.TestLoader().loadTestsFromTestCase(TestStudentAssignmentService)
 unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,50 @@
+import asyncio
+import unittest
+from app.core.utils.debounce import DebouncedJob
+
+class TestDebouncedJob(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.runs = 0
+        self.running = asyncio.Event()
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def job(self):
+        self.runs += 1
+        self.running.set()
+        await self.release.wait()
+
+    async def test_burst_of_triggers_runs_job_once(self):
+        debounced = DebouncedJob(self.job, delay_seconds=0.05)
+        for _ in range(5):
+            debounced.trigger()
+            await asyncio.sleep(0.01)
+        # Still within the delay of the last trigger.
+        self.assertEqual(self.runs, 0)
+        await debounced._task
+        self.assertEqual(self.runs, 1)
+
+    async def test_trigger_during_run_runs_job_once_more(self):
+        debounced = DebouncedJob(self.job, delay_seconds=0.01)
+        self.release.clear()
+        debounced.trigger()
+        await self.running.wait()
+        # Several triggers while the job is running only cause one more run.
+        for _ in range(3):
+            debounced.trigger()
+        self.release.set()
+        await debounced._task
+        self.assertEqual(self.runs, 2)
+
+    async def test_failing_job_is_logged_and_next_trigger_runs_again(self):
+        async def job():
+            self.runs += 1
+            raise ValueError("boom")
+        debounced = DebouncedJob(job, delay_seconds=0)
+        with self.assertLogs("app.core.utils.debounce", level="ERROR") as logs:
+            debounced.trigger()
+            await debounced._task
+        self.assertIn("boom", logs.output[0])
+        debounced.trigger()
+        await debounced._task
+        self.assertEqual(self.runs, 2)
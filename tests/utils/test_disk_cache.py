@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from app.core.utils.disk_cache import DiskLRUCache
+
+class TestDiskLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = DiskLRUCache(self.directory.name, max_size_bytes=100)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _set_mtime(self, key: str, mtime: float):
+        os.utime(Path(self.directory.name) / key, (mtime, mtime))
+
+    def test_make_key_is_stable(self):
+        self.assertEqual(DiskLRUCache.make_key("repo", b"abc"), DiskLRUCache.make_key("repo", b"abc"))
+        # str and bytes parts are interchangeable.
+        self.assertEqual(DiskLRUCache.make_key("repo", "abc"), DiskLRUCache.make_key(b"repo", b"abc"))
+        self.assertNotEqual(DiskLRUCache.make_key("repo", "abc"), DiskLRUCache.make_key("repo", "abd"))
+
+    def test_make_key_separates_parts(self):
+        self.assertNotEqual(DiskLRUCache.make_key("ab", "c"), DiskLRUCache.make_key("a", "bc"))
+        self.assertNotEqual(DiskLRUCache.make_key("abc"), DiskLRUCache.make_key("abc", ""))
+
+    def test_get_set_round_trip(self):
+        self.assertIsNone(self.cache.get("missing"))
+        self.cache.set("key", b"value")
+        self.assertEqual(self.cache.get("key"), b"value")
+        self.cache.set("key", b"new value")
+        self.assertEqual(self.cache.get("key"), b"new value")
+
+    def test_set_skips_values_larger_than_the_cache(self):
+        self.cache.set("key", b"x" * 101)
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_evicts_least_recently_used_entries_past_the_budget(self):
+        self.cache.set("old", b"x" * 40)
+        self.cache.set("used", b"x" * 40)
+        self._set_mtime("old", 1000)
+        self._set_mtime("used", 2000)
+        # Reading an entry marks it as recently used.
+        self.assertIsNotNone(self.cache.get("old"))
+
+        self.cache.set("new", b"x" * 40)
+
+        self.assertIsNotNone(self.cache.get("old"))
+        self.assertIsNone(self.cache.get("used"))
+        self.assertIsNotNone(self.cache.get("new"))
+
+    def test_aborted_writer_leaves_no_entry(self):
+        with self.assertRaises(ValueError):
+            with self.cache.writer("key") as f:
+                f.write(b"partial")
+                raise ValueError()
+
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_writer_keeps_file_readable(self):
+        with self.cache.writer("key") as f:
+            f.write(b"value")
+        f.seek(0)
+        self.assertEqual(f.read(), b"value")
+        f.close()
+        self.assertEqual(self.cache.get("key"), b"value")
+
+    def test_oversized_writer_leaves_no_entry(self):
+        with self.cache.writer("key") as f:
+            f.write(b"x" * 101)
+        f.seek(0)
+        self.assertEqual(len(f.read()), 101)
+        f.close()
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(os.listdir(self.directory.name), [])
@@ -0,0 +1,35 @@
+import asyncio
+import time
+import unittest
+from app.core.utils.process_pool import KillableProcessPool
+
+def sleep_and_return(seconds: float, value: int) -> int:
+    time.sleep(seconds)
+    return value
+
+class TestKillableProcessPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pool = KillableProcessPool(max_workers=2)
+
+    async def asyncTearDown(self):
+        self.pool.close()
+
+    async def test_run_returns_result(self):
+        self.assertEqual(await self.pool.run(30, sleep_and_return, 0, 1), 1)
+
+    async def test_run_times_out_from_parent(self):
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            await self.pool.run(2, sleep_and_return, 60, 1)
+        self.assertLess(time.monotonic() - start, 30)
+        # The hung worker was terminated and the pool replaced, so it still takes calls.
+        self.assertEqual(await self.pool.run(30, sleep_and_return, 0, 2), 2)
+
+    async def test_timeout_resubmits_calls_on_terminated_workers(self):
+        results = await asyncio.gather(
+            self.pool.run(2, sleep_and_return, 60, 1),
+            self.pool.run(30, sleep_and_return, 3, 2),
+            return_exceptions=True
+        )
+        self.assertIsInstance(results[0], TimeoutError)
+        self.assertEqual(results[1], 2)
@@ -0,0 +1,46 @@
+import unittest
+from app.core.utils.reconcile import ReconcileDiff
+
+def is_name_changed(source_item: dict, target_item: dict) -> bool:
+    return source_item["name"] != target_item["name"]
+
+class TestReconcileDiff(unittest.TestCase):
+    def test_compute(self):
+        a, b = { "name": "a" }, { "name": "b" }
+        renamed_a = { "name": "a2" }
+        cases = [
+            # (description, source, target, is_changed, expected create, update, delete, unchanged)
+            ("both empty", {}, {}, is_name_changed, {}, {}, {}, {}),
+            ("only in source", { 1: a }, {}, is_name_changed, { 1: a }, {}, {}, {}),
+            ("only in target", {}, { 1: a }, is_name_changed, {}, {}, { 1: a }, {}),
+            ("in both, same", { 1: a }, { 1: a }, is_name_changed, {}, {}, {}, { 1: (a, a) }),
+            ("in both, changed", { 1: renamed_a }, { 1: a }, is_name_changed, {}, { 1: (renamed_a, a) }, {}, {}),
+            (
+                "every split at once",
+                { 1: a, 2: renamed_a, 3: b },
+                { 1: a, 2: a, 4: b },
+                is_name_changed,
+                { 3: b }, { 2: (renamed_a, a) }, { 4: b }, { 1: (a, a) }
+            ),
+            # Without is_changed, items in both are never considered changed.
+            ("default is_changed", { 1: renamed_a, 2: b }, { 1: a }, None, { 2: b }, {}, {}, { 1: (renamed_a, a) }),
+        ]
+        for description, source, target, is_changed, create, update, delete, unchanged in cases:
+            with self.subTest(description):
+                if is_changed is None:
+                    diff = ReconcileDiff.compute(source, target)
+                else:
+                    diff = ReconcileDiff.compute(source, target, is_changed)
+                self.assertEqual(diff.create, create)
+                self.assertEqual(diff.update, update)
+                self.assertEqual(diff.delete, delete)
+                self.assertEqual(diff.unchanged, unchanged)
+                self.assertEqual(diff.is_empty, len(create) == 0 and len(update) == 0 and len(delete) == 0)
+
+    def test_is_changed_is_called_for_items_in_both(self):
+        calls = []
+        def is_changed(source_item, target_item):
+            calls.append((source_item, target_item))
+            return source_item != target_item
+        ReconcileDiff.compute({ 1: "a", 2: "b", 3: "c" }, { 2: "b", 3: "x", 4: "d" }, is_changed)
+        self.assertEqual(sorted(calls), [("b", "b"), ("c", "x")])